@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ApiShopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api_shop"
+
+    def ready(self):
+        from . import signals  # noqa: F401
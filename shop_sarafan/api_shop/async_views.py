@@ -0,0 +1,256 @@
+from functools import update_wrapper
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from rest_framework import exceptions
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .cache import (aget_cached_shopping_cart_response, aget_category_tree,
+                    prefetch_catalogue_revision)
+from .catalogue_index import catalogue_index
+from .views import (CategoryViewSet, ProductViewSet, ShoppingCartViewSet,
+                    SubcategoryViewSet, catalogue_http_cache)
+
+async_catalogue_http_cache = (prefetch_catalogue_revision,
+                              *catalogue_http_cache)
+
+
+async def aiter_sync(iterator):
+    """Перебрать синхронный итератор, запрашивая элементы по одному.
+
+    Каждый элемент получается через sync_to_async в потоке вьюхи, где
+    открыто соединение с базой данных, поэтому поток ответа не
+    собирается в память целиком, как при отдаче синхронного итератора
+    из асинхронного обработчика Django.
+    """
+    get_next = sync_to_async(next)
+    done = object()
+    while (item := await get_next(iterator, done)) is not done:
+        yield item
+
+
+class AsyncAPIViewMixin:
+    """Примесь для асинхронной обработки запросов вьюсетом DRF.
+
+    DRF не поддерживает асинхронные вьюхи, поэтому dispatch повторяет
+    APIView.dispatch: аутентификация выполняется методом aauthenticate
+    аутентификатора, если он есть, асинхронные действия ожидаются в
+    цикле событий, а синхронные выполняются через sync_to_async.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self,
+                    request.method.lower(),
+                    self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(
+                    request,
+                    *args,
+                    **kwargs
+                )
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs
+        )
+        if self.response.streaming and not self.response.is_async:
+            self.response.streaming_content = aiter_sync(
+                self.response.streaming_content
+            )
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """Аутентифицировать запрос до синхронной части initial."""
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, "aauthenticate", None)
+            if authenticate is None:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def apaginate_queryset(self, queryset):
+        """Асинхронный вариант paginate_queryset."""
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset,
+            self.request,
+            view=self
+        )
+
+    async def aget_object(self):
+        """Асинхронный вариант get_object."""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError,
+                ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class AsyncValuesListMixin(AsyncAPIViewMixin):
+    """Примесь для асинхронного списка и детального просмотра."""
+
+    async def list(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_values(page))
+        return Response(
+            self.serialize_values([row async for row in queryset])
+        )
+
+    async def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(await self.aget_object()))
+
+
+@method_decorator(async_catalogue_http_cache, name="dispatch")
+class AsyncCategoryViewSet(AsyncValuesListMixin, CategoryViewSet):
+    """Асинхронный вьюсет для категорий."""
+
+    @action(methods=["GET"], detail=False)
+    async def tree(self, request):
+        """Вывести все категории с вложенными подкатегориями."""
+        return Response(
+            await aget_category_tree(request, self.get_serializer_class())
+        )
+
+
+@method_decorator(async_catalogue_http_cache, name="dispatch")
+class AsyncSubcategoryViewSet(AsyncValuesListMixin, SubcategoryViewSet):
+    """Асинхронный вьюсет для подкатегорий."""
+
+
+@method_decorator(async_catalogue_http_cache, name="dispatch")
+class AsyncProductViewSet(AsyncValuesListMixin, ProductViewSet):
+    """Асинхронный вьюсет для продуктов.
+
+    Потоковая выгрузка export строится синхронным действием, а ее
+    содержимое отдается асинхронным итератором из dispatch.
+    """
+
+    @action(methods=["GET"], detail=False)
+    async def search(self, request):
+        """Найти продукты и посчитать их количество по категориям."""
+        queryset, facet_querysets = self.get_search_querysets(request)
+        facets = {
+            name: [row async for row in facet_queryset]
+            for name, facet_queryset in facet_querysets.items()
+        }
+        page = await self.apaginate_queryset(queryset)
+        return self.get_search_response(page, facets)
+
+
+class AsyncShoppingCartViewSet(AsyncAPIViewMixin, ShoppingCartViewSet):
+    """Асинхронный вьюсет для продуктовой корзины.
+
+    Асинхронный ORM не поддерживает транзакции, поэтому каждое
+    изменение корзины выполняется синхронной функцией в транзакции
+    через sync_to_async, а кэш корзины сбрасывается после ее фиксации.
+    Пакетное изменение batch остается синхронным действием.
+    """
+
+    async def list(self, request, *args, **kwargs):
+        """Вывести состав корзины из кэша или с проверкой ETag."""
+        return await aget_cached_shopping_cart_response(
+            request,
+            self.get_list_response
+        )
+
+    async def get_list_response(self):
+        """Построить ответ с составом корзины."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.serialize(page, many=True)
+            )
+        return Response(
+            self.serialize([obj async for obj in queryset], many=True)
+        )
+
+    @action(methods=["GET"], detail=False)
+    async def show_total_info(self, request):
+        """Вывести общую стоимость и количество продуктов в корзине."""
+        return await aget_cached_shopping_cart_response(
+            request,
+            self.aget_total_info_response
+        )
+
+    async def aget_total_info_response(self):
+        """Посчитать итоги корзины по ценам из индекса каталога."""
+        return self.make_total_info_response(
+            await catalogue_index.aget_totals(
+                [line async for line in self.get_totals_queryset()]
+            )
+        )
+
+    @action(methods=["POST"], detail=False)
+    async def add_product(self, request):
+        """Добавить продукт в корзину или увеличить его количество."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return await sync_to_async(self.perform_add_product)(
+            serializer.validated_data["product"],
+            serializer.validated_data["amount"]
+        )
+
+    @action(methods=["POST"], detail=False)
+    async def remove_product(self, request):
+        """Удалить продукт из корзины или уменьшить его количество."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return await sync_to_async(self.perform_remove_product)(
+            serializer.validated_data["product"],
+            serializer.validated_data["amount"]
+        )
+
+    @action(methods=["POST"], detail=False)
+    async def clear_shopping_cart(self, request):
+        """Очистить продуктовую корзину."""
+        return await sync_to_async(self.perform_clear_shopping_cart)()
@@ -0,0 +1,228 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (TokenAuthentication,
+                                           get_authorization_header)
+from rest_framework.authtoken.models import Token
+
+TOKEN_CACHE_KEY = "auth_token:{digest}"
+TOKEN_CACHE_SIZE = getattr(settings, "TOKEN_CACHE_SIZE", 10000)
+TOKEN_CACHE_TIMEOUT = getattr(settings, "TOKEN_CACHE_TIMEOUT", 60)
+TOKEN_CACHE_SHARED = getattr(settings, "TOKEN_CACHE_SHARED", False)
+TOKEN_USER_FIELDS = ("id", "username", "email", "is_active", "is_staff")
+
+
+class LocalTokenCache:
+    """Ограниченный LRU-кэш с временем жизни записей в памяти процесса."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, digest):
+        """Получить значение, если оно есть и не устарело."""
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return value
+
+    def set(self, digest, value):
+        """Сохранить значение и вытеснить давние записи сверх размера."""
+        with self.lock:
+            self.entries[digest] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(digest)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, digests):
+        """Удалить записи."""
+        with self.lock:
+            for digest in digests:
+                self.entries.pop(digest, None)
+
+    def clear(self):
+        """Удалить все записи."""
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = LocalTokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TIMEOUT)
+
+
+def get_token_digest(key):
+    """Получить хеш токена, чтобы не хранить сам токен в ключах кэша."""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(keys):
+    """Удалить токены из кэша процесса и из общего кэша.
+
+    В других процессах запись из их собственного кэша остается
+    действительной не дольше TOKEN_CACHE_TIMEOUT.
+    """
+    digests = [get_token_digest(key) for key in keys]
+    if not digests:
+        return
+    token_cache.delete_many(digests)
+    if TOKEN_CACHE_SHARED:
+        cache.delete_many(
+            [TOKEN_CACHE_KEY.format(digest=digest) for digest in digests]
+        )
+
+
+def invalidate_user_tokens(user_id):
+    """Удалить из кэша все токены пользователя."""
+    invalidate_tokens(
+        Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием пользователя.
+
+    Пара (пользователь, токен) ищется в LRU-кэше процесса, затем, если
+    включен TOKEN_CACHE_SHARED, в общем кэше, и только потом в базе
+    данных. У пользователя загружаются только поля TOKEN_USER_FIELDS,
+    поэтому хеш пароля и права суперпользователя не попадают в кэш;
+    остальные поля догружаются из базы при обращении к ним. Записи
+    удаляются из кэша при удалении токена, например при выходе через
+    djoser, и при изменении или удалении пользователя. Каждый запрос
+    получает свою копию пользователя из кэша процесса. Для асинхронных
+    вьюх есть aauthenticate с асинхронным ORM.
+    """
+
+    def get_key(self, request):
+        """Получить токен из заголовка Authorization или None.
+
+        Ключевое слово и сообщения об ошибках разбора те же, что в
+        TokenAuthentication.authenticate.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(
+                _("Invalid token header. No credentials provided.")
+            )
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(
+                _("Invalid token header. "
+                  "Token string should not contain spaces.")
+            )
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _("Invalid token header. "
+                  "Token string should not contain invalid characters.")
+            )
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    def get_token_queryset(self):
+        """Получить queryset токенов с пользователями без лишних полей."""
+        return self.get_model().objects.select_related("user").only(
+            "key",
+            "user_id",
+            "created",
+            *(f"user__{field}" for field in TOKEN_USER_FIELDS)
+        )
+
+    def check_token(self, token):
+        """Вернуть пару (пользователь, токен) активного пользователя."""
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return token.user, token
+
+    def load_credentials(self, key):
+        """Найти токен с пользователем в базе данных."""
+        try:
+            token = self.get_token_queryset().get(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        return self.check_token(token)
+
+    def get_cached_credentials(self, digest):
+        """Получить пару (пользователь, токен) из кэша процесса."""
+        credentials = token_cache.get(digest)
+        if credentials is None:
+            return None
+        user, token = credentials
+        return copy.copy(user), token
+
+    def store_credentials(self, digest, credentials):
+        """Сохранить пару (пользователь, токен) в кэш процесса.
+
+        Запрос получает копию пользователя, а не сохраненный экземпляр,
+        как и при чтении из кэша.
+        """
+        token_cache.set(digest, credentials)
+        user, token = credentials
+        return copy.copy(user), token
+
+    def authenticate_credentials(self, key):
+        digest = get_token_digest(key)
+        credentials = self.get_cached_credentials(digest)
+        if credentials is not None:
+            return credentials
+
+        shared_key = TOKEN_CACHE_KEY.format(digest=digest)
+        if TOKEN_CACHE_SHARED:
+            credentials = cache.get(shared_key)
+        if credentials is None:
+            credentials = self.load_credentials(key)
+            if TOKEN_CACHE_SHARED:
+                cache.set(shared_key, credentials, timeout=TOKEN_CACHE_TIMEOUT)
+        return self.store_credentials(digest, credentials)
+
+    async def aauthenticate(self, request):
+        """Асинхронный вариант authenticate."""
+        key = self.get_key(request)
+        if key is None:
+            return None
+        digest = get_token_digest(key)
+        credentials = self.get_cached_credentials(digest)
+        if credentials is not None:
+            return credentials
+
+        shared_key = TOKEN_CACHE_KEY.format(digest=digest)
+        if TOKEN_CACHE_SHARED:
+            credentials = await cache.aget(shared_key)
+        if credentials is None:
+            credentials = await self.aauthenticate_credentials(key)
+            if TOKEN_CACHE_SHARED:
+                await cache.aset(
+                    shared_key,
+                    credentials,
+                    timeout=TOKEN_CACHE_TIMEOUT
+                )
+        return self.store_credentials(digest, credentials)
+
+    async def aauthenticate_credentials(self, key):
+        """Асинхронный вариант load_credentials."""
+        try:
+            token = await self.get_token_queryset().aget(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+        return self.check_token(token)
@@ -0,0 +1,682 @@
+import asyncio
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, namedtuple
+from time import perf_counter
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from api_shop.metrics import DB_QUERIES, metrics_view
+from products.catalogue import CatalogueImporter
+from products.models import (Category, Product, ProductListing, ShoppingCart,
+                             ShoppingCartProduct, Subcategory)
+from products.search import get_search_backend
+
+User = get_user_model()
+
+BENCHMARK_PREFIX = "bench-"
+BENCHMARK_WORDS = (
+    "яблоко", "груша", "молоко", "сыр", "хлеб", "чай", "кофе", "рис",
+)
+WORKLOADS = ("catalogue", "search", "cart", "add", "total")
+SERVERS = ("client", "wsgi", "asgi")
+PERCENTILES = (50, 95, 99)
+METRICS_MIDDLEWARE = "api_shop.middleware.MetricsMiddleware"
+BENCHMARK_HOST = "testserver"
+SERVER_HOST = "127.0.0.1"
+NO_BODY_STATUSES = (204, 304)
+METRICS_VIEW = f"{metrics_view.__module__}.{metrics_view.__qualname__}"
+METRICS_LINE_PATTERN = re.compile(
+    rf'^{DB_QUERIES.name}_(?P<kind>sum|count)\{{view="(?P<view>[^"]*)"'
+    r'[^}]*\} (?P<value>\S+)$',
+    re.MULTILINE
+)
+
+# Значения SQLite и Django по умолчанию для сравнения с прагмами из
+# SQLITE_PRAGMAS; busy_timeout равен тайм-ауту модуля sqlite3.
+SQLITE_DEFAULTS = {
+    "SQLITE_JOURNAL_MODE": "DELETE",
+    "SQLITE_SYNCHRONOUS": "FULL",
+    "SQLITE_CACHE_SIZE": "-2000",
+    "SQLITE_MMAP_SIZE": "0",
+    "SQLITE_BUSY_TIMEOUT": "5000",
+    "SQLITE_TRANSACTION_MODE": "DEFERRED",
+}
+SQLITE_PROFILES = {"default": SQLITE_DEFAULTS, "tuned": {}}
+SQLITE_PRAGMA_VARIABLES = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "cache_size": "SQLITE_CACHE_SIZE",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+}
+
+BenchmarkData = namedtuple(
+    "BenchmarkData",
+    ("category_ids", "subcategory_ids", "product_ids", "tokens")
+)
+BenchmarkRequest = namedtuple(
+    "BenchmarkRequest",
+    ("method", "path", "data", "token")
+)
+
+
+def clear_data():
+    """Удалить данные, созданные для замера."""
+    with transaction.atomic():
+        User.objects.filter(username__startswith=BENCHMARK_PREFIX).delete()
+        Category.objects.filter(slug__startswith=BENCHMARK_PREFIX).delete()
+        ProductListing.rebuild()
+        get_search_backend().rebuild()
+
+
+def seed_data(categories, subcategories, products, users, cart_size, rng):
+    """Создать синтетический каталог и пользователей с корзинами.
+
+    subcategories и products задаются на одного родителя. Каталог
+    загружается через CatalogueImporter, как при импорте из файла.
+    """
+    clear_data()
+    importer = CatalogueImporter()
+    for category in range(categories):
+        category_slug = f"{BENCHMARK_PREFIX}category-{category}"
+        importer.add({
+            "type": "category",
+            "slug": category_slug,
+            "name": f"Категория {category}",
+        })
+        for subcategory in range(subcategories):
+            subcategory_slug = (
+                f"{BENCHMARK_PREFIX}subcategory-{category}-{subcategory}"
+            )
+            importer.add({
+                "type": "subcategory",
+                "slug": subcategory_slug,
+                "name": f"Подкатегория {category}-{subcategory}",
+                "parent": category_slug,
+            })
+            for product in range(products):
+                importer.add({
+                    "type": "product",
+                    "slug": f"{BENCHMARK_PREFIX}product-"
+                            f"{category}-{subcategory}-{product}",
+                    "name": f"{rng.choice(BENCHMARK_WORDS).capitalize()} "
+                            f"{category}-{subcategory}-{product}",
+                    "parent": subcategory_slug,
+                    "price": f"{rng.randint(100, 100000) / 100:.2f}",
+                })
+    importer.finish()
+    with transaction.atomic():
+        ProductListing.rebuild()
+        get_search_backend().rebuild()
+
+    product_ids = list(
+        Product.objects.filter(
+            slug__startswith=BENCHMARK_PREFIX
+        ).order_by("pk").values_list("pk", flat=True)
+    )
+    password = make_password(None)
+    with transaction.atomic():
+        created_users = User.objects.bulk_create(
+            User(
+                username=f"{BENCHMARK_PREFIX}user-{number}",
+                email=f"{BENCHMARK_PREFIX}user-{number}@example.com",
+                password=password
+            )
+            for number in range(users)
+        )
+        tokens = Token.objects.bulk_create(
+            Token(key=Token.generate_key(), user=user)
+            for user in created_users
+        )
+        shopping_carts = ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user) for user in created_users
+        )
+        ShoppingCartProduct.objects.bulk_create(
+            ShoppingCartProduct(
+                shopping_cart=shopping_cart,
+                product_id=product_id,
+                amount=rng.randint(1, 5)
+            )
+            for shopping_cart in shopping_carts
+            for product_id in rng.sample(
+                product_ids,
+                min(cart_size, len(product_ids))
+            )
+        )
+    return BenchmarkData(
+        category_ids=list(
+            Category.objects.filter(
+                slug__startswith=BENCHMARK_PREFIX
+            ).order_by("pk").values_list("pk", flat=True)
+        ),
+        subcategory_ids=list(
+            Subcategory.objects.filter(
+                slug__startswith=BENCHMARK_PREFIX
+            ).order_by("pk").values_list("pk", flat=True)
+        ),
+        product_ids=product_ids,
+        tokens=[token.key for token in tokens]
+    )
+
+
+def build_requests(workload, data, count, rng):
+    """Построить воспроизводимый список запросов для нагрузки."""
+    if workload == "catalogue":
+        pages = max(len(data.product_ids) // 10, 1)
+        subcategory_pages = max(len(data.subcategory_ids) // 10, 1)
+        paths = (
+            lambda: reverse("category-list"),
+            lambda: reverse("category-tree"),
+            lambda: reverse("subcategory-list")
+            + f"?page={rng.randint(1, subcategory_pages)}",
+            lambda: reverse("productlisting-list")
+            + f"?page={rng.randint(1, pages)}",
+            lambda: reverse("productlisting-list")
+            + f"?pagination=cursor&limit={rng.choice((10, 50))}",
+            lambda: reverse(
+                "productlisting-detail",
+                args=(rng.choice(data.product_ids),)
+            ),
+            lambda: reverse("productlisting-search") + "?" + urlencode({
+                "q": rng.choice(BENCHMARK_WORDS),
+                "subcategory": rng.choice(data.subcategory_ids),
+            }),
+        )
+        return [
+            BenchmarkRequest("GET", rng.choice(paths)(), None, None)
+            for _ in range(count)
+        ]
+    if workload == "search":
+        params = (
+            lambda: {},
+            lambda: {"category": rng.choice(data.category_ids)},
+            lambda: {"subcategory": rng.choice(data.subcategory_ids)},
+            lambda: {"price_min": rng.randint(1, 500), "price_max": 1000},
+            lambda: {"q": rng.choice(BENCHMARK_WORDS)},
+            lambda: {
+                "q": rng.choice(BENCHMARK_WORDS),
+                "category": rng.choice(data.category_ids),
+            },
+        )
+        return [
+            BenchmarkRequest(
+                "GET",
+                reverse("productlisting-search") + "?"
+                + urlencode(rng.choice(params)()),
+                None,
+                None
+            )
+            for _ in range(count)
+        ]
+    if workload == "cart":
+        requests = []
+        for number in range(count):
+            view = (
+                "shoppingcartproduct-add-product" if number % 2 == 0
+                else "shoppingcartproduct-remove-product"
+            )
+            if number % 2 == 0:
+                token = rng.choice(data.tokens)
+                product_id = rng.choice(data.product_ids)
+            requests.append(
+                BenchmarkRequest(
+                    "POST",
+                    reverse(view),
+                    {"product": product_id, "amount": 1},
+                    token
+                )
+            )
+        return requests
+    if workload == "add":
+        return [
+            BenchmarkRequest(
+                "POST",
+                reverse("shoppingcartproduct-add-product"),
+                {"product": rng.choice(data.product_ids), "amount": 1},
+                rng.choice(data.tokens)
+            )
+            for _ in range(count)
+        ]
+    if workload == "total":
+        return [
+            BenchmarkRequest(
+                "GET",
+                reverse("shoppingcartproduct-show-total-info"),
+                None,
+                rng.choice(data.tokens)
+            )
+            for _ in range(count)
+        ]
+    raise ValueError(f"Неизвестная нагрузка: {workload}.")
+
+
+def get_headers(request):
+    """Получить заголовки запроса."""
+    headers = {}
+    if request.token:
+        headers["Authorization"] = f"Token {request.token}"
+    return headers
+
+
+class ClientRunner:
+    """Последовательные запросы через тестовый клиент Django.
+
+    sqlite_profile - переменные окружения SQLITE_* из SQLITE_PROFILES,
+    которые заменяют прагмы и режим транзакций SQLite на время замера.
+    Соединения с базой данных закрываются до и после замера, чтобы
+    прагмы применились к новым соединениям.
+    """
+    name = "client"
+
+    def __init__(self, concurrency, async_views=False, sqlite_profile=None):
+        self.concurrency = 1
+        self.client = Client()
+        self.sqlite_profile = sqlite_profile or {}
+        self.settings = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, BENCHMARK_HOST],
+            SQLITE_PRAGMAS={
+                name: self.sqlite_profile.get(
+                    SQLITE_PRAGMA_VARIABLES.get(name),
+                    value
+                )
+                for name, value in settings.SQLITE_PRAGMAS.items()
+            },
+            SQLITE_TRANSACTION_MODE=self.sqlite_profile.get(
+                "SQLITE_TRANSACTION_MODE",
+                settings.SQLITE_TRANSACTION_MODE
+            )
+        )
+
+    def __enter__(self):
+        connections.close_all()
+        self.settings.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.settings.disable()
+        connections.close_all()
+
+    def send(self, request):
+        """Выполнить запрос и вернуть его код ответа."""
+        return self.client.generic(
+            request.method,
+            request.path,
+            json.dumps(request.data) if request.data else "",
+            content_type="application/json",
+            headers=get_headers(request)
+        ).status_code
+
+    def run(self, requests):
+        """Выполнить запросы и вернуть время и код ответа каждого."""
+        results = []
+        for request in requests:
+            started = perf_counter()
+            status = self.send(request)
+            results.append((perf_counter() - started, status))
+        return results
+
+    def get_query_totals(self):
+        """Получить сумму и количество наблюдений метрики запросов к БД."""
+        if METRICS_MIDDLEWARE not in settings.MIDDLEWARE:
+            return None
+        return DB_QUERIES.totals()
+
+
+class KeepAliveConnection:
+    """Асинхронное HTTP/1.1-соединение с повторным использованием."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Открыть соединение, если оно еще не открыто."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host,
+                self.port
+            )
+
+    def close(self):
+        """Закрыть соединение."""
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    def encode(self, request):
+        """Получить байты HTTP-запроса."""
+        body = json.dumps(request.data).encode() if request.data else b""
+        lines = [
+            f"{request.method} {request.path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            f"Content-Length: {len(body)}",
+        ]
+        if body:
+            lines.append("Content-Type: application/json")
+        lines.extend(
+            f"{name}: {value}"
+            for name, value in get_headers(request).items()
+        )
+        return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+    async def read_response(self):
+        """Прочитать ответ и вернуть его код и признак keep-alive."""
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Сервер закрыл соединение.")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = headers.get("connection") != "close"
+        if headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    return status, keep_alive
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+            return status, keep_alive
+        if status in NO_BODY_STATUSES:
+            return status, keep_alive
+        await self.reader.read()
+        return status, False
+
+    async def send(self, request):
+        """Выполнить запрос и вернуть его код ответа.
+
+        Если сервер закрыл простаивавшее соединение, запрос повторяется
+        один раз в новом соединении.
+        """
+        data = self.encode(request)
+        for attempt in range(2):
+            await self.connect()
+            try:
+                self.writer.write(data)
+                await self.writer.drain()
+                status, keep_alive = await self.read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if not keep_alive:
+                self.close()
+            return status
+
+
+class ServerRunner(ClientRunner, ABC):
+    """Запросы по HTTP к серверу, запущенному отдельным процессом.
+
+    Сервер слушает свободный порт на 127.0.0.1. Запросы отправляются
+    из одного цикла событий через concurrency постоянных соединений,
+    которые открываются заранее и в замер не входят. Число запросов к
+    базе данных берется из метрик сервера на /metrics/.
+    """
+    startup_timeout = 30
+
+    def __init__(self, concurrency, async_views=False, sqlite_profile=None):
+        super().__init__(concurrency, sqlite_profile=sqlite_profile)
+        self.concurrency = concurrency
+        self.async_views = async_views
+
+    @abstractmethod
+    def get_command(self, port):
+        """Получить команду запуска сервера на порту."""
+
+    def get_environment(self):
+        """Получить переменные окружения процесса сервера."""
+        return {
+            **os.environ,
+            "DEBUG": "False",
+            "ALLOWED_HOSTS": SERVER_HOST,
+            "METRICS_ALLOWED_IPS": SERVER_HOST,
+            "API_ASYNC_VIEWS": str(self.async_views),
+            **self.sqlite_profile,
+        }
+
+    def __enter__(self):
+        connections.close_all()
+        with socket.socket() as sock:
+            sock.bind((SERVER_HOST, 0))
+            self.port = sock.getsockname()[1]
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            self.get_command(self.port),
+            cwd=settings.BASE_DIR,
+            env=self.get_environment(),
+            stdout=subprocess.DEVNULL,
+            stderr=self.log
+        )
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.wait_for_server()
+            self.connections = [
+                KeepAliveConnection(SERVER_HOST, self.port)
+                for _ in range(self.concurrency)
+            ]
+            for connection in self.connections:
+                self.loop.run_until_complete(connection.connect())
+        except BaseException:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *args):
+        for connection in getattr(self, "connections", ()):
+            connection.close()
+        self.loop.close()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+    def wait_for_server(self):
+        """Дождаться, пока сервер начнет принимать соединения."""
+        deadline = perf_counter() + self.startup_timeout
+        while perf_counter() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                socket.create_connection((SERVER_HOST, self.port)).close()
+            except OSError:
+                time.sleep(0.1)
+            else:
+                return
+        self.log.seek(0)
+        output = self.log.read().decode(errors="replace")[-2000:]
+        raise RuntimeError(
+            f"Сервер {self.name} не запустился на порту {self.port}.\n"
+            f"{output}"
+        )
+
+    async def timed(self, connection, requests, results):
+        """Выполнять запросы по соединению и сохранять время и коды."""
+        for request in requests:
+            started = perf_counter()
+            try:
+                status = await connection.send(request)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                status = 0
+            results.append((perf_counter() - started, status))
+
+    async def run_async(self, requests):
+        results = []
+        requests = iter(requests)
+        await asyncio.gather(
+            *(
+                self.timed(connection, requests, results)
+                for connection in self.connections
+            )
+        )
+        return results
+
+    def run(self, requests):
+        return self.loop.run_until_complete(self.run_async(requests))
+
+    def get_query_totals(self):
+        """Получить сумму и количество наблюдений метрики запросов к БД."""
+        url = f"http://{SERVER_HOST}:{self.port}{reverse('metrics')}"
+        try:
+            with urlopen(url, timeout=10) as response:
+                text = response.read().decode()
+        except OSError:
+            return None
+        totals = {"sum": 0.0, "count": 0.0}
+        for match in METRICS_LINE_PATTERN.finditer(text):
+            if match["view"] != METRICS_VIEW:
+                totals[match["kind"]] += float(match["value"])
+        return totals["sum"], totals["count"]
+
+
+class WSGIRunner(ServerRunner):
+    """Запросы к многопоточному WSGI-серверу Django runserver."""
+    name = "wsgi"
+
+    def get_command(self, port):
+        return [
+            sys.executable, "manage.py", "runserver", "--noreload",
+            "--skip-checks", f"{SERVER_HOST}:{port}",
+        ]
+
+
+class ASGIRunner(ServerRunner):
+    """Запросы к ASGI-серверу uvicorn.
+
+    Постоянные соединения с базой данных под ASGI отключаются.
+    """
+    name = "asgi"
+
+    def get_environment(self):
+        return {**super().get_environment(), "DB_CONN_MAX_AGE": "0"}
+
+    def get_command(self, port):
+        return [
+            sys.executable, "-m", "uvicorn", "shop_sarafan.asgi:application",
+            "--host", SERVER_HOST, "--port", str(port), "--no-access-log",
+            "--log-level", "warning",
+        ]
+
+
+RUNNERS = {runner.name: runner for runner in (
+    ClientRunner, WSGIRunner, ASGIRunner
+)}
+
+
+def get_percentile(values, percentile):
+    """Получить перцентиль отсортированного списка методом ближайшего ранга."""
+    if not values:
+        return None
+    return values[max(math.ceil(percentile / 100 * len(values)) - 1, 0)]
+
+
+def run_workload(runner, requests, warmup=()):
+    """Выполнить нагрузку и посчитать задержки, RPS и запросы к БД.
+
+    Запросы из warmup выполняются заранее и в замер не входят.
+    """
+    if warmup:
+        runner.run(warmup)
+    totals_before = runner.get_query_totals()
+    started = perf_counter()
+    results = runner.run(requests)
+    elapsed = perf_counter() - started
+    totals_after = runner.get_query_totals()
+
+    latencies = sorted(latency for latency, status in results)
+    statuses = Counter(str(status) for latency, status in results)
+    queries = observed = 0
+    if totals_before is not None and totals_after is not None:
+        queries = totals_after[0] - totals_before[0]
+        observed = totals_after[1] - totals_before[1]
+    return {
+        "requests": len(results),
+        "concurrency": runner.concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "latency_ms": {
+            **{
+                f"p{percentile}": round(
+                    get_percentile(latencies, percentile) * 1000, 3
+                )
+                for percentile in PERCENTILES
+            },
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "queries_per_request": (
+            round(queries / observed, 2) if observed else None
+        ),
+        "statuses": dict(sorted(statuses.items())),
+        "errors": sum(
+            count for status, count in statuses.items()
+            if status == "0" or status.startswith("5")
+        ),
+    }
+
+
+def get_result_key(result):
+    """Получить сервер, нагрузку и профиль прагм SQLite результата."""
+    return (
+        result["server"],
+        result["workload"],
+        result.get("sqlite_pragmas")
+    )
+
+
+def compare_results(results, baseline):
+    """Сравнить результаты с прошлым запуском по p95 и RPS.
+
+    Возвращает строки с изменением в процентах для совпадающих
+    сервера, нагрузки и профиля прагм SQLite.
+    """
+    previous = {
+        get_result_key(result): result
+        for result in baseline.get("results", ())
+    }
+    lines = []
+    for result in results:
+        key = get_result_key(result)
+        if key not in previous:
+            continue
+        old = previous[key]
+        changes = []
+        for title, new_value, old_value in (
+            ("p95", result["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            ("rps", result["requests_per_second"],
+             old["requests_per_second"]),
+        ):
+            if old_value:
+                changes.append(
+                    f"{title} {(new_value - old_value) / old_value:+.1%}"
+                )
+        lines.append("/".join(filter(None, key)) + ": " + ", ".join(changes))
+    return lines
@@ -0,0 +1,326 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from products.models import Category, CatalogueRevision
+from .metrics import measure_serialization
+
+CATEGORY_TREE_KEY = "category_tree:{revision}:{base_url}"
+CATEGORY_TREE_TIMEOUT = getattr(
+    settings, "CATEGORY_TREE_CACHE_TIMEOUT", 60 * 60 * 24
+)
+
+CATALOGUE_CACHE_MAX_AGE = getattr(settings, "CATALOGUE_CACHE_MAX_AGE", 60)
+
+SHOPPING_CART_VERSION_KEY = "shopping_cart:{user_id}:version"
+SHOPPING_CART_KEY = "shopping_cart:{user_id}:{version}:{path}"
+SHOPPING_CART_REVISION_KEY = "shopping_cart:catalogue_revision"
+SHOPPING_CART_TIMEOUT = getattr(
+    settings, "SHOPPING_CART_CACHE_TIMEOUT", 60 * 5
+)
+SHOPPING_CART_REVISION_TIMEOUT = getattr(
+    settings, "SHOPPING_CART_REVISION_TIMEOUT", 5
+)
+
+_local_tree = {"revision": None, "trees": {}}
+
+
+def get_versions(*keys, timeout=None):
+    """Получить текущие версии по ключам одним обращением к кэшу.
+
+    Отсутствующая версия создается из текущего времени, чтобы после
+    вытеснения из кэша она не совпала ни с одной из прежних.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=timeout)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(key, timeout=None):
+    """Сменить версию, сделав устаревшим весь кэш под ней."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=timeout)
+
+
+def get_catalogue_revision(request):
+    """Получить номер и время последнего изменения каталога.
+
+    Оба значения читаются одним запросом по первичному ключу из
+    счетчика CatalogueRevision, который триггеры базы данных
+    увеличивают при любом изменении каталога в любом процессе, и
+    запоминаются в запросе.
+    """
+    revision = getattr(request, "_catalogue_revision", None)
+    if revision is None:
+        revision = CatalogueRevision.get_current()
+        request._catalogue_revision = revision
+    return revision
+
+
+async def aget_catalogue_revision(request):
+    """Асинхронный вариант get_catalogue_revision."""
+    revision = getattr(request, "_catalogue_revision", None)
+    if revision is None:
+        revision = await CatalogueRevision.aget_current()
+        request._catalogue_revision = revision
+    return revision
+
+
+def prefetch_catalogue_revision(view_func):
+    """Декоратор асинхронной вьюхи, заранее читающий ревизию каталога.
+
+    Синхронные функции ETag и Last-Modified декоратора condition
+    потом берут ее из запроса без обращений к базе данных.
+    """
+    @wraps(view_func)
+    async def _view_wrapper(request, *args, **kwargs):
+        await aget_catalogue_revision(request)
+        return await view_func(request, *args, **kwargs)
+
+    return _view_wrapper
+
+
+def get_catalogue_etag(request, *args, **kwargs):
+    """Получить сильный ETag ответа каталога для условного GET."""
+    revision, _ = get_catalogue_revision(request)
+    accept = request.META.get("HTTP_ACCEPT", "")
+    return '"{}"'.format(
+        hashlib.md5(
+            f"{revision}:{request.get_full_path()}:{accept}".encode()
+        ).hexdigest()
+    )
+
+
+def get_catalogue_last_modified(request, *args, **kwargs):
+    """Получить время последнего изменения каталога для условного GET."""
+    return get_catalogue_revision(request)[1]
+
+
+def is_shopping_cart_cache_enabled():
+    """Проверить, включен ли кэш ответов по корзине."""
+    return getattr(settings, "SHOPPING_CART_CACHE", False)
+
+
+def get_cached_shopping_cart_version(user_id):
+    """Получить версию корзины и ревизию каталога одним обращением к кэшу.
+
+    От ревизии каталога зависят цены и названия продуктов в корзине.
+    Возвращает версию корзины и ревизию каталога или None, если ее нет
+    в кэше.
+    """
+    cart_key = SHOPPING_CART_VERSION_KEY.format(user_id=user_id)
+    versions = cache.get_many((cart_key, SHOPPING_CART_REVISION_KEY))
+    if cart_key not in versions:
+        versions[cart_key], = get_versions(
+            cart_key,
+            timeout=SHOPPING_CART_TIMEOUT
+        )
+    return versions[cart_key], versions.get(SHOPPING_CART_REVISION_KEY)
+
+
+def store_shopping_cart_revision(revision):
+    """Запомнить ревизию каталога для версий корзин.
+
+    Ревизия хранится в кэше SHOPPING_CART_REVISION_TIMEOUT секунд,
+    поэтому условный GET корзины не обращается к базе данных, а
+    изменение цен попадает в ответы по корзине не позже чем через это
+    время.
+    """
+    cache.set(
+        SHOPPING_CART_REVISION_KEY,
+        revision,
+        timeout=SHOPPING_CART_REVISION_TIMEOUT
+    )
+    return revision
+
+
+def get_shopping_cart_version(request):
+    """Получить версию корзины текущего пользователя."""
+    cart_version, revision = get_cached_shopping_cart_version(
+        request.user.id
+    )
+    if revision is None:
+        revision = store_shopping_cart_revision(
+            get_catalogue_revision(request)[0]
+        )
+    return f"{cart_version}-{revision}"
+
+
+async def aget_shopping_cart_version(request):
+    """Асинхронный вариант get_shopping_cart_version."""
+    cart_version, revision = get_cached_shopping_cart_version(
+        request.user.id
+    )
+    if revision is None:
+        revision = store_shopping_cart_revision(
+            (await aget_catalogue_revision(request))[0]
+        )
+    return f"{cart_version}-{revision}"
+
+
+def bump_shopping_cart_version(user_id):
+    """Сменить версию корзины пользователя после ее изменения."""
+    if not is_shopping_cart_cache_enabled():
+        return
+    bump_version(
+        SHOPPING_CART_VERSION_KEY.format(user_id=user_id),
+        timeout=SHOPPING_CART_TIMEOUT
+    )
+
+
+def get_cached_shopping_cart_response(request, build_response):
+    """Получить ответ по корзине из кэша или с проверкой ETag.
+
+    Если клиент прислал актуальный ETag, возвращается 304 без обращений
+    к базе данных: версия корзины и ревизия каталога берутся из кэша.
+    Иначе ответ берется из кэша или строится
+    функцией build_response и сохраняется под текущей версией корзины.
+
+    Версия корзины хранится в кэше, поэтому кэш ответов включается
+    настройкой SHOPPING_CART_CACHE только с общим для всех процессов
+    бэкендом кэша. Без нее ответ строится при каждом запросе.
+    """
+    if not is_shopping_cart_cache_enabled():
+        return build_response()
+    etag, key = get_shopping_cart_cache_keys(
+        request,
+        get_shopping_cart_version(request)
+    )
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        return not_modified
+
+    cached = cache.get(key)
+    if cached is None:
+        cached = store_shopping_cart_response(key, build_response())
+    return make_shopping_cart_response(cached, etag)
+
+
+async def aget_cached_shopping_cart_response(request, build_response):
+    """Асинхронный вариант get_cached_shopping_cart_response.
+
+    build_response - корутинная функция.
+    """
+    if not is_shopping_cart_cache_enabled():
+        return await build_response()
+    etag, key = get_shopping_cart_cache_keys(
+        request,
+        await aget_shopping_cart_version(request)
+    )
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified["ETag"] = etag
+        return not_modified
+
+    cached = cache.get(key)
+    if cached is None:
+        cached = store_shopping_cart_response(key, await build_response())
+    return make_shopping_cart_response(cached, etag)
+
+
+def get_shopping_cart_cache_keys(request, version):
+    """Получить ETag и ключ кэша ответа по корзине текущего пользователя."""
+    user_id = request.user.id
+    path = request.get_full_path()
+    etag = '"{}"'.format(
+        hashlib.md5(f"{user_id}:{version}:{path}".encode()).hexdigest()
+    )
+    key = SHOPPING_CART_KEY.format(user_id=user_id, version=version, path=path)
+    return etag, key
+
+
+def store_shopping_cart_response(key, response):
+    """Сохранить данные и код ответа по корзине в кэш."""
+    cached = (response.data, response.status_code)
+    cache.set(key, cached, timeout=SHOPPING_CART_TIMEOUT)
+    return cached
+
+
+def make_shopping_cart_response(cached, etag):
+    """Собрать ответ по корзине из закэшированных данных."""
+    data, status_code = cached
+    response = Response(data, status=status_code)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def get_category_tree(request, serializer_class):
+    """Получить сериализованное дерево категорий с подкатегориями.
+
+    Дерево хранится в памяти процесса и в общем кэше под ревизией
+    каталога из базы данных, которую условный GET уже прочитал, поэтому
+    при неизменном каталоге запрос стоит одного обращения к кэшу.
+    """
+    revision, _ = get_catalogue_revision(request)
+    base_url, tree = get_cached_category_tree(request, revision)
+    if tree is None:
+        with measure_serialization(request):
+            tree = list(serializer_class(
+                Category.objects.prefetch_related("subcategories"),
+                many=True,
+                context={"request": request}
+            ).data)
+        store_category_tree(revision, base_url, tree)
+    return tree
+
+
+async def aget_category_tree(request, serializer_class):
+    """Асинхронный вариант get_category_tree."""
+    revision, _ = await aget_catalogue_revision(request)
+    base_url, tree = get_cached_category_tree(request, revision)
+    if tree is None:
+        categories = [
+            category async for category in
+            Category.objects.prefetch_related("subcategories")
+        ]
+        with measure_serialization(request):
+            tree = list(serializer_class(
+                categories,
+                many=True,
+                context={"request": request}
+            ).data)
+        store_category_tree(revision, base_url, tree)
+    return tree
+
+
+def get_cached_category_tree(request, revision):
+    """Найти дерево категорий ревизии каталога в памяти или в кэше.
+
+    Возвращает базовый URL и дерево или None.
+    """
+    base_url = request.build_absolute_uri("/")
+
+    if _local_tree["revision"] != revision:
+        _local_tree["revision"] = revision
+        _local_tree["trees"] = {}
+    tree = _local_tree["trees"].get(base_url)
+    if tree is None:
+        tree = cache.get(
+            CATEGORY_TREE_KEY.format(revision=revision, base_url=base_url)
+        )
+        if tree is not None:
+            _local_tree["trees"][base_url] = tree
+    return base_url, tree
+
+
+def store_category_tree(revision, base_url, tree):
+    """Сохранить дерево категорий в общий кэш и в память процесса."""
+    cache.set(
+        CATEGORY_TREE_KEY.format(revision=revision, base_url=base_url),
+        tree,
+        timeout=CATEGORY_TREE_TIMEOUT
+    )
+    if _local_tree["revision"] == revision:
+        _local_tree["trees"][base_url] = tree
@@ -0,0 +1,221 @@
+import operator
+import threading
+from array import array
+from collections import namedtuple
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+
+from products.models import (CatalogueChange, CatalogueRevision, Product,
+                             Subcategory)
+
+CATALOGUE_INDEX_CHUNK_SIZE = 10000
+PRICE_PLACES = Product._meta.get_field("price").decimal_places
+PRICE_SCALE = 10 ** PRICE_PLACES
+MISSING = -1
+
+
+def iter_id_chunks(ids):
+    """Разбить список id на части для запросов с id__in."""
+    for start in range(0, len(ids), CATALOGUE_INDEX_CHUNK_SIZE):
+        yield ids[start:start + CATALOGUE_INDEX_CHUNK_SIZE]
+
+
+CatalogueState = namedtuple(
+    "CatalogueState",
+    ("prices", "subcategories", "subcategory_categories", "revision")
+)
+
+
+def store_product(prices, subcategories, product_id, price, subcategory_id):
+    """Записать цену и подкатегорию продукта в массивы индекса."""
+    size = len(prices)
+    if product_id >= size:
+        missing = array("q", [MISSING]) * (product_id + 1 - size)
+        prices.extend(missing)
+        subcategories.extend(missing)
+    prices[product_id] = int(price * PRICE_SCALE)
+    subcategories[product_id] = subcategory_id
+
+
+class CatalogueIndex:
+    """Индекс каталога в памяти процесса.
+
+    Для каждого продукта хранит цену в минимальных единицах и id
+    подкатегории в массивах array, где индексом служит id продукта,
+    поэтому миллион продуктов занимает около 16 МБ. Категория
+    определяется через словарь подкатегорий.
+
+    Индекс помнит ревизию каталога, до которой он прочитан. Расчет
+    итогов получает текущую ревизию тем же запросом, что и строки
+    корзины, и если она новее, индекс дочитывает из журнала
+    CatalogueChange объекты, измененные после его ревизии. Журнал ведут
+    триггеры базы данных, поэтому учитываются и QuerySet.update, и
+    сырой SQL, и изменения, сделанные другими процессами.
+
+    Массивы, словарь и ревизия хранятся в одном кортеже state. Загрузка
+    и дочитывание строят новые копии и подменяют кортеж одним
+    присваиванием, поэтому потоки, читающие индекс без блокировки,
+    видят либо прежнее, либо новое состояние целиком.
+    """
+
+    def __init__(self):
+        self.state = CatalogueState(array("q"), array("q"), {}, None)
+        self.lock = threading.Lock()
+
+    def is_current(self, revision):
+        """Проверить, прочитан ли индекс не раньше ревизии revision."""
+        current = self.state.revision
+        return current is not None and current >= revision
+
+    def refresh(self, revision):
+        """Загрузить индекс или дочитать изменения до ревизии revision."""
+        if self.is_current(revision):
+            return
+        with self.lock:
+            if self.is_current(revision):
+                return
+            if self.state.revision is None:
+                self.load()
+            else:
+                self.update()
+
+    def clear(self):
+        """Забыть прочитанный каталог, чтобы загрузить его заново."""
+        with self.lock:
+            self.state = CatalogueState(array("q"), array("q"), {}, None)
+
+    def load(self):
+        """Загрузить весь каталог.
+
+        Ревизия читается раньше данных: изменения, зафиксированные во
+        время загрузки, имеют большую ревизию и будут дочитаны еще раз.
+        """
+        revision, _ = CatalogueRevision.get_current()
+        prices = array("q")
+        subcategories = array("q")
+        subcategory_categories = dict(
+            Subcategory.objects.values_list("id", "category_id")
+        )
+        for pk, price, subcategory_id in Product.objects.order_by(
+        ).values_list("id", "price", "subcategory_id").iterator(
+            chunk_size=CATALOGUE_INDEX_CHUNK_SIZE
+        ):
+            store_product(prices, subcategories, pk, price, subcategory_id)
+        self.state = CatalogueState(
+            prices,
+            subcategories,
+            subcategory_categories,
+            revision
+        )
+
+    def update(self):
+        """Дочитать подкатегории и продукты, измененные после ревизии.
+
+        Если изменилась большая часть продуктов, например после
+        импорта, каталог загружается заново целиком.
+        """
+        state = self.state
+        changed = {
+            CatalogueChange.SUBCATEGORY: [],
+            CatalogueChange.PRODUCT: [],
+        }
+        revision = state.revision
+        for model, object_id, change_revision in (
+            CatalogueChange.objects.filter(
+                revision__gt=state.revision,
+                model__in=changed
+            ).values_list("model", "object_id", "revision")
+        ):
+            changed[model].append(object_id)
+            revision = max(revision, change_revision)
+
+        product_ids = changed[CatalogueChange.PRODUCT]
+        if len(product_ids) > len(state.prices) // 2:
+            self.load()
+            return
+        prices = state.prices[:]
+        subcategories = state.subcategories[:]
+        subcategory_categories = dict(state.subcategory_categories)
+        for ids in iter_id_chunks(changed[CatalogueChange.SUBCATEGORY]):
+            categories = dict(
+                Subcategory.objects.filter(id__in=ids).values_list(
+                    "id",
+                    "category_id"
+                )
+            )
+            for pk in ids:
+                if pk in categories:
+                    subcategory_categories[pk] = categories[pk]
+                else:
+                    subcategory_categories.pop(pk, None)
+        for ids in iter_id_chunks(product_ids):
+            products = {
+                pk: (price, subcategory_id)
+                for pk, price, subcategory_id in Product.objects.filter(
+                    id__in=ids
+                ).values_list("id", "price", "subcategory_id")
+            }
+            for pk in ids:
+                if pk in products:
+                    store_product(prices, subcategories, pk, *products[pk])
+                elif pk < len(prices):
+                    prices[pk] = MISSING
+                    subcategories[pk] = MISSING
+        self.state = CatalogueState(
+            prices,
+            subcategories,
+            subcategory_categories,
+            revision
+        )
+
+    def get_totals(self, lines):
+        """Посчитать итоги корзины по строкам из get_totals_queryset.
+
+        Строки - тройки (id продукта, количество, ревизия каталога).
+        Индекс дочитывается до ревизии, прочитанной вместе со строками,
+        после чего цены выбираются из массива по id продуктов и
+        умножаются на количества. Для пустой корзины итоги равны None,
+        как у агрегатов SQL.
+        """
+        lines = list(lines)
+        if lines:
+            self.refresh(lines[0][2])
+        return self.sum_lines(lines)
+
+    async def aget_totals(self, lines):
+        """Асинхронный вариант get_totals для списка строк.
+
+        База данных читается в потоке, только если индекс устарел.
+        """
+        if lines and not self.is_current(lines[0][2]):
+            await sync_to_async(self.refresh)(lines[0][2])
+        return self.sum_lines(lines)
+
+    def sum_lines(self, lines):
+        """Сложить количества и стоимости строк корзины.
+
+        Строки продуктов, которых нет в индексе, то есть удаленных после
+        чтения строк корзины, не учитываются.
+        """
+        prices = self.state.prices
+        size = len(prices)
+        lines = [
+            (product_id, amount) for product_id, amount, _ in lines
+            if product_id < size and prices[product_id] != MISSING
+        ]
+        if not lines:
+            return {"total_amount": None, "total_price": None}
+        product_ids, amounts = zip(*lines)
+        total_price = sum(map(
+            operator.mul,
+            map(prices.__getitem__, product_ids),
+            amounts
+        ))
+        return {
+            "total_amount": sum(amounts),
+            "total_price": Decimal(total_price).scaleb(-PRICE_PLACES),
+        }
+
+
+catalogue_index = CatalogueIndex()
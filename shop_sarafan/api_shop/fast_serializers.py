@@ -0,0 +1,121 @@
+from abc import ABC, abstractmethod
+
+from django.core.files.storage import default_storage
+
+from products.images import get_image_set
+from products.models import Category, Product, Subcategory
+
+
+class ValuesSerializer(ABC):
+    """Базовый сериализатор строк .values() без механизма полей DRF.
+
+    Набор колонок задается заранее, а каждая строка превращается
+    в словарь одним выражением, без создания экземпляров моделей.
+    """
+    fields = ()
+
+    def __init__(self, request=None):
+        self.request = request
+
+    def get_image_url(self, name):
+        """Получить URL изображения так же, как ImageField в DRF."""
+        if not name:
+            return None
+        url = default_storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    @abstractmethod
+    def serialize(self, rows):
+        """Преобразовать строки в список словарей для ответа."""
+
+
+class CategoryValuesSerializer(ValuesSerializer):
+    """Быстрый сериализатор для списка категорий."""
+    fields = ("id", "name", "slug", "image", "image_variants")
+
+    def serialize(self, rows):
+        image_url = self.get_image_url
+        images = get_image_set
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "slug": row["slug"],
+                "image": image_url(row["image"]),
+                "images": images(
+                    Category,
+                    row["id"],
+                    row["image"],
+                    row["image_variants"]
+                ),
+            }
+            for row in rows
+        ]
+
+
+class SubcategoryValuesSerializer(ValuesSerializer):
+    """Быстрый сериализатор для списка подкатегорий."""
+    fields = (
+        "id",
+        "name",
+        "slug",
+        "category__name",
+        "image",
+        "image_variants"
+    )
+
+    def serialize(self, rows):
+        image_url = self.get_image_url
+        images = get_image_set
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "slug": row["slug"],
+                "category": row["category__name"],
+                "image": image_url(row["image"]),
+                "images": images(
+                    Subcategory,
+                    row["id"],
+                    row["image"],
+                    row["image_variants"]
+                ),
+            }
+            for row in rows
+        ]
+
+
+class ProductValuesSerializer(ValuesSerializer):
+    """Быстрый сериализатор для списка продуктов из витрины."""
+    fields = (
+        "product_id",
+        "name",
+        "slug",
+        "category_name",
+        "subcategory_name",
+        "price",
+        "image",
+        "image_variants"
+    )
+
+    def serialize(self, rows):
+        images = get_image_set
+        return [
+            {
+                "id": row["product_id"],
+                "name": row["name"],
+                "slug": row["slug"],
+                "category": row["category_name"],
+                "subcategory": row["subcategory_name"],
+                "price": str(row["price"]),
+                "images": images(
+                    Product,
+                    row["product_id"],
+                    row["image"],
+                    row["image_variants"]
+                ),
+            }
+            for row in rows
+        ]
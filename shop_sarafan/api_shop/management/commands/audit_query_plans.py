@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api_shop.query_plans import QUERY_PLANS, audit_query_plans
+
+
+class Command(BaseCommand):
+    """Команда для проверки планов выполнения основных запросов API."""
+    help = (
+        "Выполнить EXPLAIN для каждого запроса из реестра "
+        "api_shop.query_plans и завершиться ошибкой, если какой-либо "
+        "из них читает таблицу сканированием, кроме ограниченных "
+        "сканирований из ALLOWED_SCANS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            metavar="name",
+            help="Проверить только запросы с этими именами."
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - set(QUERY_PLANS)
+        if unknown:
+            raise CommandError(
+                f"Неизвестные запросы: {', '.join(sorted(unknown))}. "
+                f"Доступны: {', '.join(QUERY_PLANS)}."
+            )
+        failed = []
+        for name, plan, full_scans, allowed_scans in audit_query_plans(
+            options["names"]
+        ):
+            if full_scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f"{name}: полное сканирование {', '.join(full_scans)}"
+                ))
+            elif allowed_scans:
+                self.stdout.write(f"{name}: OK, " + ", ".join(
+                    f"сканирование {table} ({reason})"
+                    for table, reason in allowed_scans.items()
+                ))
+            else:
+                self.stdout.write(f"{name}: OK")
+            if full_scans or options["verbosity"] > 1:
+                self.stdout.write(f"{plan}\n")
+
+        if failed:
+            raise CommandError(
+                f"Полное сканирование в запросах: {', '.join(failed)}."
+            )
+        self.stdout.write(
+            self.style.SUCCESS("Все запросы используют индексы.")
+        )
@@ -0,0 +1,252 @@
+import argparse
+import importlib.util
+import json
+import platform
+import random
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api_shop.benchmark import (RUNNERS, SERVERS, SQLITE_PROFILES, WORKLOADS,
+                                build_requests, clear_data, compare_results,
+                                run_workload, seed_data)
+
+
+class Command(BaseCommand):
+    """Команда для нагрузочного замера API магазина."""
+    help = (
+        "Создать синтетический каталог с пользователями и корзинами, "
+        "прогнать нагрузки просмотра каталога, поиска, изменения корзины "
+        "и show_total_info через тестовый клиент, WSGI-сервер runserver "
+        "и ASGI-сервер uvicorn и вывести p50/p95/p99, RPS и число "
+        "запросов к базе данных в JSON. Данные замера создаются в текущей "
+        "базе данных со слагами и именами с префиксом bench- и удаляются "
+        "после замера."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--categories",
+            type=int,
+            default=10,
+            help="Количество категорий."
+        )
+        parser.add_argument(
+            "--subcategories",
+            type=int,
+            default=10,
+            help="Количество подкатегорий в каждой категории."
+        )
+        parser.add_argument(
+            "--products",
+            type=int,
+            default=100,
+            help="Количество продуктов в каждой подкатегории."
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=100,
+            help="Количество пользователей с корзинами."
+        )
+        parser.add_argument(
+            "--cart-size",
+            type=int,
+            default=10,
+            help="Количество продуктов в корзине каждого пользователя."
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Количество запросов в каждой нагрузке."
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Количество прогревочных запросов, не входящих в замер."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Количество постоянных соединений с сервером wsgi и asgi."
+        )
+        parser.add_argument(
+            "--async-views",
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help="Использовать асинхронные вьюсеты на сервере asgi."
+        )
+        parser.add_argument(
+            "--server",
+            action="append",
+            choices=SERVERS,
+            help="Способ отправки запросов, можно указать несколько раз. "
+                 "По умолчанию все."
+        )
+        parser.add_argument(
+            "--workload",
+            action="append",
+            choices=WORKLOADS,
+            help="Нагрузка, можно указать несколько раз. По умолчанию все."
+        )
+        parser.add_argument(
+            "--compare-sqlite-pragmas",
+            action="store_true",
+            help="Прогнать нагрузки со значениями SQLite по умолчанию "
+                 "(DELETE, synchronous FULL, транзакции DEFERRED) и с "
+                 "прагмами из SQLITE_PRAGMAS. Без --workload - только add."
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Начальное значение генератора случайных чисел."
+        )
+        parser.add_argument(
+            "--label",
+            help="Метка запуска в результатах, например хеш коммита."
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Файл для результатов в JSON, - для stdout."
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Файл с результатами прошлого запуска для сравнения."
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Не удалять данные замера после завершения."
+        )
+
+    def handle(self, *args, **options):
+        servers = options["server"] or SERVERS
+        if "asgi" in servers and importlib.util.find_spec("uvicorn") is None:
+            raise CommandError(
+                "Для замера asgi нужен uvicorn: pip install uvicorn."
+            )
+        options["server"] = servers
+        if options["compare_sqlite_pragmas"]:
+            if connection.vendor != "sqlite":
+                raise CommandError(
+                    "Прагмы сравниваются только на SQLite."
+                )
+            options["workload"] = options["workload"] or ["add"]
+
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(
+                    f"Не удалось прочитать {options['baseline']}: {error}"
+                )
+
+        rng = random.Random(options["seed"])
+        scale = {
+            key: options[key] for key in (
+                "categories", "subcategories", "products", "users",
+                "cart_size"
+            )
+        }
+        self.stderr.write("Создание данных для замера...")
+        data = seed_data(rng=rng, **scale)
+        try:
+            results = self.run_benchmarks(data, rng, options)
+        finally:
+            if not options["keep_data"]:
+                clear_data()
+
+        report = {
+            "label": options["label"],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "async_views": options["async_views"],
+                "sqlite_pragmas_compared": options["compare_sqlite_pragmas"],
+            },
+            "scale": scale,
+            "seed": options["seed"],
+            "results": results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(output)
+        else:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+        if baseline is not None:
+            for line in compare_results(results, baseline):
+                self.stderr.write(line)
+
+    def run_benchmarks(self, data, rng, options):
+        """Прогнать каждую нагрузку через каждый способ отправки.
+
+        При сравнении прагм SQLite все прогоны повторяются для каждого
+        профиля из SQLITE_PROFILES.
+        """
+        profiles = (
+            SQLITE_PROFILES if options["compare_sqlite_pragmas"]
+            else {None: None}
+        )
+        return [
+            result
+            for profile, sqlite_profile in profiles.items()
+            for server in options["server"]
+            for result in self.run_server(
+                server,
+                profile,
+                sqlite_profile,
+                data,
+                rng,
+                options
+            )
+        ]
+
+    def run_server(self, server, profile, sqlite_profile, data, rng,
+                   options):
+        """Прогнать каждую нагрузку через один способ отправки."""
+        results = []
+        runner = RUNNERS[server](
+            options["concurrency"],
+            async_views=options["async_views"] and server == "asgi",
+            sqlite_profile=sqlite_profile
+        )
+        with runner:
+            for workload in options["workload"] or WORKLOADS:
+                requests = build_requests(
+                    workload,
+                    data,
+                    options["warmup"] + options["requests"],
+                    rng
+                )
+                result = {
+                    "server": server,
+                    "workload": workload,
+                    **({"sqlite_pragmas": profile} if profile else {}),
+                    **run_workload(
+                        runner,
+                        requests[options["warmup"]:],
+                        requests[:options["warmup"]]
+                    ),
+                }
+                results.append(result)
+                self.stderr.write(
+                    "/".join(filter(None, (server, workload, profile)))
+                    + f": {result['requests_per_second']} rps, "
+                    f"p50 {result['latency_ms']['p50']} мс, "
+                    f"p95 {result['latency_ms']['p95']} мс, "
+                    f"p99 {result['latency_ms']['p99']} мс, "
+                    f"запросов к БД {result['queries_per_request']}"
+                )
+        return results
@@ -0,0 +1,139 @@
+from decimal import Decimal
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api_shop.fast_serializers import ProductValuesSerializer
+from api_shop.renderers import FastJSONRenderer
+from api_shop.serializers import ProductSerializer
+from products.models import Category, Product, ProductListing, Subcategory
+
+BENCHMARK_IMAGE = "products/images/products/original/benchmark.jpg"
+BENCHMARK_IMAGE_VARIANTS = {
+    "original": BENCHMARK_IMAGE,
+    "hash": "0" * 20,
+    "src": "/media/products/images/variants/00/1280w.jpg",
+    "width": 1280,
+    "height": 960,
+    "sources": [
+        {
+            "type": f"image/{extension}",
+            "srcset": ", ".join(
+                f"/media/products/images/variants/00/{width}w.{extension} "
+                f"{width}w"
+                for width in (320, 640, 1280)
+            ),
+        }
+        for extension in ("avif", "webp", "jpeg")
+    ],
+}
+
+
+class Command(BaseCommand):
+    """Команда для сравнения скорости сериализации списка продуктов."""
+    help = (
+        "Сравнить ProductSerializer с быстрым сериализатором витрины "
+        "на странице из заданного числа продуктов. Тестовые данные "
+        "создаются в транзакции и откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items",
+            type=int,
+            default=1000,
+            help="Количество продуктов на странице."
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Количество повторов каждого замера."
+        )
+
+    def measure(self, func, repeat):
+        """Получить лучшее время выполнения функции из repeat запусков."""
+        best = None
+        for _ in range(repeat):
+            started = perf_counter()
+            func()
+            elapsed = perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def seed(self, items):
+        """Создать категорию, подкатегорию и продукты для замера."""
+        category = Category.objects.create(
+            name="benchmark-category",
+            slug="benchmark-category",
+            image="benchmark.jpg"
+        )
+        subcategory = Subcategory.objects.create(
+            name="benchmark-subcategory",
+            slug="benchmark-subcategory",
+            image="benchmark.jpg",
+            category=category
+        )
+        products = Product.objects.bulk_create(
+            Product(
+                name=f"benchmark-product-{number}",
+                slug=f"benchmark-product-{number}",
+                subcategory=subcategory,
+                image=BENCHMARK_IMAGE,
+                image_variants=BENCHMARK_IMAGE_VARIANTS,
+                price=Decimal(number % 1000) + Decimal("0.99")
+            )
+            for number in range(items)
+        )
+        ProductListing.objects.bulk_create(
+            ProductListing(
+                product=product,
+                **ProductListing.get_defaults(product)
+            )
+            for product in products
+        )
+        return subcategory
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get("/api/v1/products/"))
+
+        with transaction.atomic():
+            subcategory = self.seed(options["items"])
+
+            def serialize_models():
+                products = Product.objects.select_related(
+                    "subcategory"
+                ).prefetch_related(
+                    "subcategory__category"
+                ).filter(subcategory=subcategory)
+                data = ProductSerializer(
+                    products,
+                    many=True,
+                    context={"request": request}
+                ).data
+                return JSONRenderer().render(data)
+
+            def serialize_values():
+                rows = ProductListing.objects.filter(
+                    subcategory=subcategory
+                ).values(*ProductValuesSerializer.fields)
+                data = ProductValuesSerializer(request).serialize(rows)
+                return FastJSONRenderer().render(data)
+
+            if serialize_models() != serialize_values():
+                self.stderr.write("Результаты сериализации не совпадают.")
+
+            model_time = self.measure(serialize_models, options["repeat"])
+            values_time = self.measure(serialize_values, options["repeat"])
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Продуктов на странице: {options['items']}\n"
+            f"ProductSerializer: {model_time * 1000:.2f} мс\n"
+            f"ProductValuesSerializer: {values_time * 1000:.2f} мс\n"
+            f"Ускорение: {model_time / values_time:.1f}x"
+        )
@@ -0,0 +1,190 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METRICS_ALLOWED_IPS = getattr(settings, "METRICS_ALLOWED_IPS", ("*",))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label(value):
+    """Экранировать значение метки для текстового формата Prometheus."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_labels(names, values, extra=""):
+    """Собрать метки вида {name="value",...}."""
+    labels = [
+        f'{name}="{escape_label(value)}"'
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Counter:
+    """Счетчик с метками, хранящийся в памяти процесса."""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        """Увеличить счетчик для набора значений меток."""
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self):
+        """Получить строки метрики в формате Prometheus."""
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in sorted(values):
+            yield f"{self.name}{format_labels(self.labels, labels)} {value}"
+
+
+class Histogram(Counter):
+    """Гистограмма с фиксированными границами корзин.
+
+    Для каждого набора меток хранятся счетчики попаданий в корзины,
+    сумма и количество наблюдений; накопительные значения le
+    считаются только при выводе.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels, buckets):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        """Добавить наблюдение для набора значений меток."""
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def totals(self):
+        """Получить сумму и количество наблюдений по всем меткам."""
+        with self.lock:
+            states = list(self.values.values())
+        return (
+            sum(state[1] for state in states),
+            sum(state[2] for state in states)
+        )
+
+    def collect(self):
+        with self.lock:
+            values = [
+                (labels, (list(counts), total, count))
+                for labels, (counts, total, count) in self.values.items()
+            ]
+        for labels, (counts, total, count) in sorted(values):
+            cumulative = 0
+            for bound, hits in zip(self.buckets + ("+Inf",), counts):
+                cumulative += hits
+                label_text = format_labels(
+                    self.labels, labels, 'le="%s"' % bound
+                )
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {total}"
+            yield f"{self.name}_count{label_text} {count}"
+
+
+REQUEST_LABELS = ("view", "method")
+
+REQUESTS = Counter(
+    "shop_http_requests_total",
+    "Количество обработанных запросов.",
+    REQUEST_LABELS + ("status",)
+)
+REQUEST_DURATION = Histogram(
+    "shop_http_request_duration_seconds",
+    "Время обработки запроса.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS
+)
+DB_QUERIES = Histogram(
+    "shop_http_request_db_queries",
+    "Количество запросов к базе данных за один HTTP-запрос.",
+    REQUEST_LABELS,
+    QUERY_COUNT_BUCKETS
+)
+DB_DURATION = Histogram(
+    "shop_http_request_db_duration_seconds",
+    "Время выполнения запросов к базе данных за один HTTP-запрос.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS
+)
+RENDER_DURATION = Histogram(
+    "shop_http_response_render_duration_seconds",
+    "Время рендеринга ответа после вьюхи, без работы сериализаторов.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS
+)
+SERIALIZE_DURATION = Histogram(
+    "shop_http_serialize_duration_seconds",
+    "Время работы сериализаторов за один HTTP-запрос.",
+    REQUEST_LABELS,
+    LATENCY_BUCKETS
+)
+METRICS = (REQUESTS, REQUEST_DURATION, DB_QUERIES, DB_DURATION,
+           RENDER_DURATION, SERIALIZE_DURATION)
+
+
+@contextmanager
+def measure_serialization(request):
+    """Добавить время работы блока ко времени сериализации запроса.
+
+    Время копится в исходном HttpRequest, откуда его забирает
+    MetricsMiddleware, в том числе если передан Request из DRF.
+    """
+    request = getattr(request, "_request", request)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        request._metrics_serialize_duration = getattr(
+            request, "_metrics_serialize_duration", 0.0
+        ) + perf_counter() - started
+
+
+def render_metrics():
+    """Получить все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Отдать метрики процесса в формате Prometheus."""
+    if "*" not in METRICS_ALLOWED_IPS and (
+        request.META.get("REMOTE_ADDR") not in METRICS_ALLOWED_IPS
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
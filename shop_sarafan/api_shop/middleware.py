@@ -0,0 +1,189 @@
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api_shop.metrics import (DB_DURATION, DB_QUERIES, RENDER_DURATION,
+                              REQUEST_DURATION, REQUESTS,
+                              SERIALIZE_DURATION)
+
+logger = logging.getLogger("api_shop.metrics")
+
+SLOW_REQUEST_THRESHOLD = getattr(
+    settings, "METRICS_SLOW_REQUEST_THRESHOLD", None
+)
+UNRESOLVED_VIEW = "unresolved"
+
+
+def get_view_name(request):
+    """Получить имя вьюхи и действия, например ProductViewSet.list."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNRESOLVED_VIEW
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(
+        func, "view_class", None
+    )
+    if view_class is None:
+        return f"{func.__module__}.{func.__qualname__}"
+    actions = getattr(func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+class QueryCollector:
+    """Счетчик количества и времени запросов к базе данных."""
+
+    def __init__(self, capture_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = [] if capture_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.queries is not None:
+                self.queries.append((elapsed, sql))
+
+
+current_collector = ContextVar("current_collector", default=None)
+
+
+def collect_queries(execute, sql, params, many, context):
+    """Передать запрос счетчику текущего HTTP-запроса, если он есть.
+
+    Счетчик хранится в переменной контекста, поэтому запросы
+    асинхронного ORM, выполняемые в отдельном потоке, и запросы
+    одновременных HTTP-запросов на общем соединении не смешиваются.
+    """
+    collector = current_collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+def install_query_collector(connection):
+    """Добавить collect_queries в обертки выполнения соединения."""
+    if collect_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(collect_queries)
+
+
+@receiver(connection_created)
+def install_query_collector_on_connect(sender, connection, **kwargs):
+    """Подключить счетчик запросов к каждому новому соединению."""
+    install_query_collector(connection)
+
+
+class MetricsMiddleware:
+    """Промежуточный слой для сбора метрик по каждой вьюхе и действию.
+
+    Записывает время обработки запроса, количество и время запросов к
+    базе данных, время работы сериализаторов, которое вьюхи замеряют
+    через measure_serialization, и время рендеринга ответа рендерером
+    DRF. Если
+    задан порог METRICS_SLOW_REQUEST_THRESHOLD, медленные запросы
+    пишутся в лог вместе с выполненным SQL. Работает и в синхронном, и
+    в асинхронном режиме.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            self.process_template_response = self.aprocess_template_response
+        for connection in connections.all(initialized_only=True):
+            install_query_collector(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        collector, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_collector.reset(token)
+        self.finish(request, response, collector, started)
+        return response
+
+    async def __acall__(self, request):
+        collector, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_collector.reset(token)
+        self.finish(request, response, collector, started)
+        return response
+
+    def start(self, request):
+        """Начать замер запроса."""
+        collector = QueryCollector(
+            capture_sql=SLOW_REQUEST_THRESHOLD is not None
+        )
+        request._metrics_render_duration = 0.0
+        request._metrics_serialize_duration = 0.0
+        return collector, current_collector.set(collector), perf_counter()
+
+    def finish(self, request, response, collector, started):
+        """Записать метрики запроса и, если он медленный, SQL в лог."""
+        duration = perf_counter() - started
+        labels = (get_view_name(request), request.method)
+        REQUESTS.inc(labels + (str(response.status_code),))
+        REQUEST_DURATION.observe(labels, duration)
+        DB_QUERIES.observe(labels, collector.count)
+        DB_DURATION.observe(labels, collector.duration)
+        RENDER_DURATION.observe(labels, request._metrics_render_duration)
+        SERIALIZE_DURATION.observe(
+            labels,
+            request._metrics_serialize_duration
+        )
+
+        if (
+            SLOW_REQUEST_THRESHOLD is not None
+            and duration >= SLOW_REQUEST_THRESHOLD
+        ):
+            logger.warning(
+                "Медленный запрос %s %s (%s): %.3f с, запросов к БД: %d "
+                "за %.3f с\n%s",
+                request.method,
+                request.get_full_path(),
+                labels[0],
+                duration,
+                collector.count,
+                collector.duration,
+                "\n".join(
+                    f"{elapsed:.4f} {sql}"
+                    for elapsed, sql in collector.queries
+                )
+            )
+
+    def process_template_response(self, request, response):
+        """Замерить рендеринг ответа DRF, который выполняется после вьюхи."""
+        return self.measure_render(request, response)
+
+    async def aprocess_template_response(self, request, response):
+        """Асинхронный вариант process_template_response."""
+        return self.measure_render(request, response)
+
+    @staticmethod
+    def measure_render(request, response):
+        """Добавить к ответу замер времени его рендеринга."""
+        started = perf_counter()
+
+        def finish(response):
+            request._metrics_render_duration = perf_counter() - started
+
+        response.add_post_render_callback(finish)
+        return response
@@ -1,6 +1,103 @@
-from rest_framework.pagination import PageNumberPagination
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Курсорный пагинатор по ключу сортировки без подсчета записей.
+
+    Порядок берется из атрибута keyset_ordering вьюсета.
+    """
+    ordering = ("name", "id")
+    page_size_query_param = "limit"
+
+    def get_ordering(self, request, queryset, view):
+        """Получить поля сортировки для курсора."""
+        return getattr(view, "keyset_ordering", self.ordering)
 
 
 class CustomPagination(PageNumberPagination):
-    """Кастомный пагинатор."""
+    """Кастомный пагинатор.
+
+    По умолчанию постраничный. С параметром pagination=cursor или при
+    наличии курсора в запросе переключается на курсорный пагинатор.
+    """
     page_size_query_param = "limit"
+    mode_query_param = "pagination"
+    keyset_mode = "cursor"
+    keyset_paginator = None
+
+    def is_keyset(self, request):
+        """Проверить, запрошена ли курсорная пагинация."""
+        return (
+            request.query_params.get(self.mode_query_param)
+            == self.keyset_mode
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_keyset(request):
+            self.keyset_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset_paginator = KeysetPagination()
+        page = self.keyset_paginator.paginate_queryset(
+            queryset,
+            request,
+            view
+        )
+        self.display_page_controls = (
+            self.keyset_paginator.display_page_controls
+        )
+        return page
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset.
+
+        В постраничном режиме записи считаются и читаются асинхронным
+        ORM. Курсорный пагинатор DRF читает страницу синхронно, поэтому
+        вызывается через sync_to_async.
+        """
+        if self.is_keyset(request):
+            return await sync_to_async(self.paginate_queryset)(
+                queryset,
+                request,
+                view
+            )
+
+        self.keyset_paginator = None
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number,
+                    message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.page.object_list = [
+            row async for row in self.page.object_list
+        ]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.to_html()
+        return super().to_html()
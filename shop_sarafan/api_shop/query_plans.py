@@ -0,0 +1,275 @@
+import re
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from products.carts import get_expired_carts, get_expired_lines
+from products.models import (CatalogueRevision, ProductListing, ShoppingCart,
+                             ShoppingCartProduct, Subcategory)
+from .views import (CategoryViewSet, ProductViewSet, ShoppingCartViewSet,
+                    SubcategoryViewSet)
+
+User = get_user_model()
+
+SAMPLE_ID = 1
+PAGE_SIZE = settings.REST_FRAMEWORK["PAGE_SIZE"]
+SQLITE_FULL_SCAN_PATTERN = re.compile(
+    r"\bSCAN (?!CONSTANT ROW)(?P<table>\S+)(?=\s|$)(?! VIRTUAL TABLE\b)"
+)
+POSTGRESQL_FULL_SCAN_PATTERN = re.compile(r"\bSeq Scan on (?P<table>\S+)")
+
+
+# Сканирования, которые читают ограниченное число строк: по индексу в
+# порядке сортировки до LIMIT страницы или по таблице размером с число
+# подкатегорий. Любое другое сканирование, в том числе SCAN ... USING
+# INDEX без LIMIT, считается полным.
+ALLOWED_SCANS = {
+    "categories.list": {
+        "products_category": "индекс category_name_id_idx до LIMIT",
+    },
+    "subcategories.list": {
+        "products_subcategory": "индекс subcategory_name_id_idx до LIMIT",
+    },
+    "products.list": {
+        "products_productlisting": "индекс listing_name_product_idx до LIMIT",
+    },
+    "products.search.categories": {
+        "products_subcategory": "по строке на подкатегорию",
+        "products_subcategorylistingcount": "по строке на подкатегорию",
+    },
+    # COUNT(*) постраничного пагинатора по всему списку читает каждую
+    # строку, поэтому для больших списков есть курсорная пагинация без
+    # подсчета. Категорий и подкатегорий немного.
+    "categories.list.count": {
+        "products_category": "COUNT(*) по числу категорий",
+    },
+    "subcategories.list.count": {
+        "products_subcategory": "COUNT(*) по числу подкатегорий",
+    },
+    "products.list.count": {
+        "products_productlisting": (
+            "COUNT(*) всей витрины; без него - pagination=cursor"
+        ),
+    },
+}
+
+
+class PaginatorCount:
+    """Запрос COUNT(*), которым пагинатор считает записи queryset.
+
+    Поддерживает explain(), как QuerySet, поэтому входит в реестр
+    наравне с querysets. SQL перехватывается без выполнения самого
+    подсчета.
+    """
+
+    class Captured(Exception):
+        """Прерывание запроса после перехвата его SQL."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def capture(self, execute, sql, params, many, context):
+        """Запомнить SQL и параметры запроса и прервать его."""
+        self.sql, self.params = sql, params
+        raise self.Captured
+
+    def explain(self):
+        """Получить план выполнения запроса COUNT(*)."""
+        with connection.execute_wrapper(self.capture):
+            try:
+                self.queryset.count()
+            except self.Captured:
+                pass
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.explain_query_prefix()} {self.sql}",
+                self.params
+            )
+            return "\n".join(
+                " ".join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+
+def get_view(viewset_class, **params):
+    """Получить вьюсет с GET-запросом от пользователя SAMPLE_ID."""
+    request = Request(RequestFactory().get("/", params))
+    request.user = User(pk=SAMPLE_ID)
+    return viewset_class(request=request, format_kwarg=None, kwargs={})
+
+
+def get_page_queryset(viewset_class):
+    """Получить первую страницу списка вьюсета."""
+    return get_view(viewset_class).get_values_queryset()[:PAGE_SIZE]
+
+
+def get_keyset_queryset(viewset_class, position):
+    """Получить страницу списка вьюсета после курсора position."""
+    ordering = viewset_class.keyset_ordering
+    return get_view(viewset_class).get_values_queryset().filter(
+        **{f"{ordering[0]}__gt": position}
+    ).order_by(*ordering)[:PAGE_SIZE]
+
+
+def get_count(viewset_class):
+    """Получить подсчет записей списка вьюсета."""
+    return PaginatorCount(get_view(viewset_class).get_values_queryset())
+
+
+def get_search_queryset(name, **params):
+    """Получить queryset поиска продуктов или счетчика name."""
+    view = get_view(ProductViewSet, **params)
+    queryset, facet_querysets = view.get_search_querysets(view.request)
+    if name == "results":
+        return queryset[:PAGE_SIZE]
+    if name == "count":
+        return queryset
+    return facet_querysets[name]
+
+
+def get_cart_queryset():
+    """Получить продукты корзины пользователя SAMPLE_ID."""
+    return get_view(ShoppingCartViewSet).get_queryset()
+
+
+QUERY_PLANS = {
+    "categories.list": partial(get_page_queryset, CategoryViewSet),
+    "categories.list.count": partial(get_count, CategoryViewSet),
+    "categories.list.cursor": partial(
+        get_keyset_queryset,
+        CategoryViewSet,
+        "М"
+    ),
+    "categories.tree.subcategories": lambda: Subcategory.objects.filter(
+        category_id__in=(SAMPLE_ID, SAMPLE_ID + 1)
+    ),
+    "subcategories.list": partial(get_page_queryset, SubcategoryViewSet),
+    "subcategories.list.count": partial(get_count, SubcategoryViewSet),
+    "subcategories.list.cursor": partial(
+        get_keyset_queryset,
+        SubcategoryViewSet,
+        "М"
+    ),
+    "products.list": partial(get_page_queryset, ProductViewSet),
+    "products.list.count": partial(get_count, ProductViewSet),
+    "products.list.cursor": partial(
+        get_keyset_queryset,
+        ProductViewSet,
+        "М"
+    ),
+    "products.retrieve": lambda: ProductListing.objects.filter(
+        product_id=SAMPLE_ID
+    ),
+    "products.by_category": partial(
+        get_search_queryset,
+        "results",
+        category=SAMPLE_ID
+    ),
+    "products.by_category.count": lambda: PaginatorCount(
+        get_search_queryset("count", category=SAMPLE_ID)
+    ),
+    "products.by_subcategory": partial(
+        get_search_queryset,
+        "results",
+        subcategory=SAMPLE_ID
+    ),
+    "products.by_price": partial(
+        get_search_queryset,
+        "results",
+        price_min=10,
+        price_max=100
+    ),
+    "products.search": partial(get_search_queryset, "results", q="чай"),
+    "products.search.categories": partial(
+        get_search_queryset,
+        "categories"
+    ),
+    "products.search.subcategories": partial(
+        get_search_queryset,
+        "subcategories",
+        category=SAMPLE_ID
+    ),
+    "products.search.categories.filtered": partial(
+        get_search_queryset,
+        "categories",
+        q="чай"
+    ),
+    "products.search.subcategories.filtered": partial(
+        get_search_queryset,
+        "subcategories",
+        price_min=10,
+        price_max=100
+    ),
+    "catalogue.revision": CatalogueRevision.get_queryset,
+    "shoppingcart.list": lambda: get_cart_queryset()[:PAGE_SIZE],
+    "shoppingcart.list.count": lambda: PaginatorCount(get_cart_queryset()),
+    "shoppingcart.list.cursor": lambda: get_cart_queryset().filter(
+        product_id__gt=SAMPLE_ID
+    ).order_by(*ShoppingCartViewSet.keyset_ordering)[:PAGE_SIZE],
+    "shoppingcart.totals": lambda: get_view(
+        ShoppingCartViewSet
+    ).get_totals_queryset(),
+    "shoppingcart.product": lambda: ShoppingCartProduct.objects.filter(
+        shopping_cart__user=SAMPLE_ID,
+        product_id=SAMPLE_ID
+    ),
+    "shoppingcart.touch": lambda: ShoppingCart.get_stale(SAMPLE_ID),
+    "shoppingcart.expired": lambda: get_expired_carts(
+        timezone.now()
+    ).order_by().values_list("pk", flat=True)[:PAGE_SIZE],
+    "shoppingcart.expired.lines": lambda: get_expired_lines(
+        timezone.now()
+    ).order_by().values_list("pk", flat=True)[:PAGE_SIZE],
+}
+
+
+def explain(queryset):
+    """Получить план выполнения queryset.
+
+    На PostgreSQL последовательное сканирование запрещается, поэтому
+    Seq Scan в плане означает, что подходящего индекса нет, а не то,
+    что таблица мала.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+def get_full_scans(plan):
+    """Получить таблицы, которые план читает полным сканированием."""
+    pattern = (
+        POSTGRESQL_FULL_SCAN_PATTERN if connection.vendor == "postgresql"
+        else SQLITE_FULL_SCAN_PATTERN
+    )
+    return [match["table"] for match in pattern.finditer(plan)]
+
+
+def audit_query_plans(names=None):
+    """Получить план и сканирования для каждого запроса реестра.
+
+    Возвращает список кортежей (имя, план, таблицы с полным
+    сканированием, словарь разрешенных сканирований с причинами из
+    ALLOWED_SCANS).
+    """
+    results = []
+    for name, get_queryset in QUERY_PLANS.items():
+        if names and name not in names:
+            continue
+        plan = explain(get_queryset())
+        allowed = ALLOWED_SCANS.get(name, {})
+        full_scans, allowed_scans = [], {}
+        for table in get_full_scans(plan):
+            if table in allowed:
+                allowed_scans[table] = allowed[table]
+            else:
+                full_scans.append(table)
+        results.append((name, plan, full_scans, allowed_scans))
+    return results
@@ -0,0 +1,73 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from products.catalogue import iter_lines
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson с откатом на стандартный рендерер DRF.
+
+    orjson используется, если он установлен и клиент не запросил
+    форматирование с отступами.
+    """
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or "", renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self.encoder.default)
+
+
+class CatalogueRenderer(BaseRenderer):
+    """Рендерер построчных форматов выгрузки каталога.
+
+    Сама выгрузка отдается потоком в обход рендерера, а через render
+    проходят обычные ответы этих эндпоинтов, например ошибки валидации.
+    """
+    charset = "utf-8"
+    catalogue_format = None
+
+    def get_records(self, data):
+        """Получить список записей из данных ответа."""
+        return data if isinstance(data, list) else [data]
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        records = self.get_records(data)
+        fields = list(records[0]) if records else []
+        return "".join(
+            iter_lines(records, self.catalogue_format, fields)
+        ).encode()
+
+
+class NDJSONRenderer(CatalogueRenderer):
+    """Рендерер NDJSON: по одному JSON-объекту в строке."""
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    catalogue_format = "jsonl"
+
+
+class CSVRenderer(CatalogueRenderer):
+    """Рендерер CSV с заголовком из названий полей."""
+    media_type = "text/csv"
+    format = "csv"
+    catalogue_format = "csv"
+
+    def get_records(self, data):
+        """Получить записи, склеив списки значений в одну ячейку."""
+        return [
+            {
+                key: " ".join(map(str, value))
+                if isinstance(value, list) else value
+                for key, value in record.items()
+            }
+            for record in super().get_records(data)
+        ]
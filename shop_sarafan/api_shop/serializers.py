@@ -1,29 +1,68 @@
-from django.db.models import F, Sum
 from rest_framework import serializers
 
+from products.images import get_image_set
 from products.models import (MAX_AMOUNT_PRODUCT, MIN_AMOUNT_PRODUCT, MIN_PRICE,
-                             Category, Product, ShoppingCart,
+                             Category, Product, ProductListing,
                              ShoppingCartProduct, Subcategory)
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class ImageSetMixin:
+    """Примесь для вывода изображения с адаптивными вариантами."""
+
+    def get_image_set(self, instance):
+        """Получить описание изображения объекта для srcset."""
+        return get_image_set(
+            type(instance),
+            instance.pk,
+            instance.image.name,
+            instance.image_variants
+        )
+
+    def get_images(self, obj):
+        """Получить оригинал и варианты изображения."""
+        return self.get_image_set(obj)
+
+
+class CategorySerializer(ImageSetMixin, serializers.ModelSerializer):
     """Сериализатор для категорий."""
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Category
+        fields = ("id", "name", "slug", "image", "images")
+
+
+class CategorySubcategorySerializer(ImageSetMixin,
+                                    serializers.ModelSerializer):
+    """Сериализатор для подкатегорий внутри категории."""
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Subcategory
+        fields = ("id", "name", "slug", "image", "images")
+
+
+class CategoryTreeSerializer(ImageSetMixin, serializers.ModelSerializer):
+    """Сериализатор для категорий с вложенными подкатегориями."""
+    images = serializers.SerializerMethodField()
+    subcategories = CategorySubcategorySerializer(many=True, read_only=True)
 
     class Meta:
         model = Category
-        fields = ("id", "name", "slug", "image")
+        fields = ("id", "name", "slug", "image", "images", "subcategories")
 
 
-class SubcategorySerializer(serializers.ModelSerializer):
+class SubcategorySerializer(ImageSetMixin, serializers.ModelSerializer):
     """Сериализатор для подкатегорий."""
     category = serializers.SlugRelatedField(read_only=True, slug_field="name")
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Subcategory
-        fields = ("id", "name", "slug", "category", "image")
+        fields = ("id", "name", "slug", "category", "image", "images")
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(ImageSetMixin, serializers.ModelSerializer):
     """Сериализатор для продуктов."""
     category = serializers.SerializerMethodField()
     subcategory = serializers.SlugRelatedField(
@@ -55,17 +94,79 @@ class ProductSerializer(serializers.ModelSerializer):
         """Получить название категории продукта."""
         return obj.subcategory.category.name
 
-    @staticmethod
-    def get_images(obj):
-        """Получить список URL-адресов изображений продукта."""
-        return [obj.image_large.url, obj.image_medium.url, obj.image_small.url]
+
+class ProductListingSerializer(ImageSetMixin, serializers.Serializer):
+    """Сериализатор для продуктов из денормализованной витрины."""
+    id = serializers.IntegerField(source="product_id", read_only=True)
+    name = serializers.CharField(read_only=True)
+    slug = serializers.CharField(read_only=True)
+    category = serializers.CharField(source="category_name", read_only=True)
+    subcategory = serializers.CharField(
+        source="subcategory_name",
+        read_only=True
+    )
+    price = serializers.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        read_only=True
+    )
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        """Конфигурация сериализатора для витрины продуктов."""
+        model = ProductListing
+        fields = (
+            "product_id",
+            "name",
+            "slug",
+            "category_name",
+            "subcategory_name",
+            "price",
+            "image",
+            "image_variants"
+        )
+
+    def get_images(self, obj):
+        """Получить оригинал и варианты изображения продукта."""
+        return get_image_set(
+            Product,
+            obj["product_id"],
+            obj["image"],
+            obj["image_variants"]
+        )
+
+
+class ProductSearchSerializer(serializers.Serializer):
+    """Сериализатор параметров поиска продуктов."""
+    q = serializers.CharField(required=False, allow_blank=True)
+    category = serializers.IntegerField(required=False, min_value=1)
+    subcategory = serializers.IntegerField(required=False, min_value=1)
+    price_min = serializers.DecimalField(
+        required=False,
+        max_digits=10,
+        decimal_places=2
+    )
+    price_max = serializers.DecimalField(
+        required=False,
+        max_digits=10,
+        decimal_places=2
+    )
+
+
+class ProductExportSerializer(serializers.Serializer):
+    """Сериализатор параметров выгрузки каталога продуктов."""
+    updated_since = serializers.DateTimeField(required=False)
 
 
-class ShoppingCartProductSerializer(serializers.ModelSerializer):
+class ShoppingCartProductSerializer(ImageSetMixin,
+                                    serializers.ModelSerializer):
     """Сериализатор для отображения списка продуктов в корзине."""
     product = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(),
     )
+    name = serializers.CharField(source="product.name", read_only=True)
+    slug = serializers.CharField(source="product.slug", read_only=True)
+    images = serializers.SerializerMethodField()
     amount = serializers.IntegerField(
         max_value=MAX_AMOUNT_PRODUCT,
         min_value=MIN_AMOUNT_PRODUCT
@@ -75,37 +176,63 @@ class ShoppingCartProductSerializer(serializers.ModelSerializer):
     class Meta:
         """Конфигурация сериализатора для модели ShoppingCartProduct."""
         model = ShoppingCartProduct
-        fields = ("product", "amount", "total_price")
+        fields = ("product", "name", "slug", "images", "amount", "total_price")
+
+    def get_images(self, obj):
+        """Получить оригинал и варианты изображения продукта."""
+        return self.get_image_set(obj.product)
 
     @staticmethod
     def get_total_price(obj):
-        """Получить общую стоимость каждого продукта в корзине."""
+        """Получить общую стоимость каждого продукта в корзине.
+
+        Берется из аннотации line_total, если она посчитана в запросе.
+        """
+        line_total = getattr(obj, "line_total", None)
+        if line_total is not None:
+            return line_total
         return obj.product.price * obj.amount
 
 
-class ListShoppingCartSerializer(serializers.Serializer):
-    """Сериализатор для отображения общей стоимости и количества продуктов."""
-    total_amount = serializers.SerializerMethodField()
-    total_price = serializers.SerializerMethodField()
-
-    def get_total_amount(self, instance):
-        """Получить общее количество продуктов в корзине."""
-        request = self.context.get("request")
-        user = request.user
-        total_amount = ShoppingCart.objects.filter(user=user).aggregate(
-            total_amount=Sum("shopping_cart_products__amount")
-        )["total_amount"]
-        return total_amount
-
-    def get_total_price(self, instance):
-        """Получить общую стоимость продуктов в корзине."""
-        request = self.context.get("request")
-        user = request.user
-        total_price = ShoppingCart.objects.filter(user=user).annotate(
-            product_total_price=F(
-                "shopping_cart_products__product__price"
-            ) * F(
-                "shopping_cart_products__amount"
+class ShoppingCartActionSerializer(serializers.Serializer):
+    """Сериализатор для добавления и удаления продукта в корзине.
+
+    Существование продукта проверяется во время изменения корзины,
+    а не отдельным запросом при валидации.
+    """
+    product = serializers.IntegerField(min_value=1)
+    amount = serializers.IntegerField(
+        max_value=MAX_AMOUNT_PRODUCT,
+        min_value=MIN_AMOUNT_PRODUCT
+    )
+
+
+class ShoppingCartOperationSerializer(serializers.Serializer):
+    """Сериализатор для одной операции пакетного изменения корзины."""
+    ADD = "add"
+    REMOVE = "remove"
+    SET = "set"
+
+    product = serializers.IntegerField(min_value=1)
+    op = serializers.ChoiceField(choices=(ADD, REMOVE, SET))
+    amount = serializers.IntegerField(
+        max_value=MAX_AMOUNT_PRODUCT,
+        min_value=0
+    )
+
+    def validate(self, attrs):
+        """Запретить нулевое количество для добавления и удаления."""
+        if attrs["op"] != self.SET and attrs["amount"] < MIN_AMOUNT_PRODUCT:
+            raise serializers.ValidationError(
+                {"amount": f"Минимальное количество - {MIN_AMOUNT_PRODUCT}."}
             )
-        ).aggregate(total_price=Sum("product_total_price"))["total_price"]
-        return total_price
+        return attrs
+
+
+class ListShoppingCartSerializer(serializers.Serializer):
+    """Сериализатор для отображения общей стоимости и количества продуктов.
+
+    Принимает словарь с итогами корзины, посчитанными одним запросом.
+    """
+    total_amount = serializers.ReadOnlyField()
+    total_price = serializers.ReadOnlyField()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Удалить токен из кэша аутентификации, например после выхода."""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_changed_user_tokens(sender, instance, update_fields, **kwargs):
+    """Удалить токены пользователя из кэша при его изменении.
+
+    Так деактивированный пользователь сразу теряет доступ. Обновление
+    одного только last_login при входе кэш не сбрасывает.
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    invalidate_user_tokens(instance.pk)
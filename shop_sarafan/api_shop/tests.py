@@ -0,0 +1,804 @@
+import io
+import os
+import tempfile
+import threading
+from collections import Counter
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils.translation import gettext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from products.images import get_image_set
+from products.management.commands.import_catalogue import \
+    Command as ImportCatalogueCommand
+from products.models import (MAX_AMOUNT_PRODUCT, CatalogueRevision,
+                             Category, Product, ProductListing, ShoppingCart,
+                             ShoppingCartProduct, Subcategory)
+from .authentication import (TOKEN_CACHE_KEY, CachedTokenAuthentication,
+                             LocalTokenCache, get_token_digest, token_cache)
+from .cache import SHOPPING_CART_REVISION_KEY
+from .catalogue_index import CatalogueIndex, catalogue_index
+from .metrics import RENDER_DURATION, SERIALIZE_DURATION
+
+User = get_user_model()
+
+
+class ShoppingCartConcurrencyTestCase(TransactionTestCase):
+    """Одновременные изменения одной корзины из нескольких потоков."""
+    threads = 8
+    requests_per_thread = 10
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        self.product = Product.objects.create(
+            name="Продукт",
+            slug="product",
+            subcategory=subcategory,
+            price=10
+        )
+        self.user = User.objects.create_user("buyer", password="password")
+
+    def set_amount(self, amount):
+        """Положить продукт в корзину пользователя в количестве amount."""
+        shopping_cart, _ = ShoppingCart.objects.get_or_create(user=self.user)
+        ShoppingCartProduct.objects.update_or_create(
+            shopping_cart=shopping_cart,
+            product=self.product,
+            defaults={"amount": amount}
+        )
+
+    def get_amount(self):
+        """Получить количество продукта в корзине или None."""
+        return ShoppingCartProduct.objects.filter(
+            shopping_cart__user=self.user,
+            product=self.product
+        ).values_list("amount", flat=True).first()
+
+    def post_concurrently(self, actions):
+        """Отправить запросы одновременно, по списку действий на поток.
+
+        Каждое действие - пара (имя вьюхи, количество). Потоки стартуют
+        одновременно и закрывают свои соединения с базой данных.
+        Возвращает счетчик кодов ответа.
+        """
+        barrier = threading.Barrier(len(actions))
+        statuses = Counter()
+        errors = []
+        lock = threading.Lock()
+
+        def worker(thread_actions):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                for view, amount in thread_actions:
+                    response = client.post(
+                        reverse(view),
+                        {"product": self.product.pk, "amount": amount},
+                        format="json"
+                    )
+                    with lock:
+                        statuses[response.status_code] += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(thread_actions,))
+            for thread_actions in actions
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return statuses
+
+    def test_concurrent_add(self):
+        statuses = self.post_concurrently([
+            [("shoppingcartproduct-add-product", 1)]
+            * self.requests_per_thread
+        ] * self.threads)
+        total = self.threads * self.requests_per_thread
+        self.assertEqual(statuses, {200: total})
+        self.assertEqual(self.get_amount(), total)
+        self.assertEqual(
+            ShoppingCart.objects.filter(user=self.user).count(),
+            1
+        )
+
+    def test_concurrent_add_remove(self):
+        self.set_amount(100)
+        add = [("shoppingcartproduct-add-product", 2)]
+        remove = [("shoppingcartproduct-remove-product", 1)]
+        statuses = self.post_concurrently(
+            [add * self.requests_per_thread] * (self.threads // 2)
+            + [remove * self.requests_per_thread] * (self.threads // 2)
+        )
+        self.assertEqual(
+            statuses,
+            {200: self.threads * self.requests_per_thread}
+        )
+        self.assertEqual(
+            self.get_amount(),
+            100 + self.threads // 2 * self.requests_per_thread
+        )
+
+    def test_concurrent_add_respects_max_amount(self):
+        free = 5
+        self.set_amount(MAX_AMOUNT_PRODUCT - free)
+        statuses = self.post_concurrently([
+            [("shoppingcartproduct-add-product", 1)]
+            * self.requests_per_thread
+        ] * self.threads)
+        self.assertEqual(statuses[200], free)
+        self.assertEqual(
+            statuses[400],
+            self.threads * self.requests_per_thread - free
+        )
+        self.assertEqual(self.get_amount(), MAX_AMOUNT_PRODUCT)
+
+    def test_concurrent_remove_stops_at_zero(self):
+        amount = 20
+        self.set_amount(amount)
+        statuses = self.post_concurrently([
+            [("shoppingcartproduct-remove-product", 1)]
+            * self.requests_per_thread
+        ] * self.threads)
+        self.assertEqual(statuses[200], amount - 1)
+        self.assertEqual(statuses[204], 1)
+        self.assertEqual(
+            statuses[400],
+            self.threads * self.requests_per_thread - amount
+        )
+        self.assertIsNone(self.get_amount())
+
+
+class ShoppingCartAddProductTestCase(TestCase):
+    """Добавление продукта в корзину одним upsert."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        cls.product = Product.objects.create(
+            name="Продукт",
+            slug="product",
+            subcategory=subcategory,
+            price=10
+        )
+        cls.user = User.objects.create_user("buyer", password="password")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, product_id, amount=1):
+        """Добавить продукт в корзину через API."""
+        return self.client.post(
+            reverse("shoppingcartproduct-add-product"),
+            {"product": product_id, "amount": amount},
+            format="json"
+        )
+
+    def test_missing_product(self):
+        response = self.add(self.product.pk + 1)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, "Такого продукта нет.")
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+
+    def test_first_add_creates_cart(self):
+        response = self.add(self.product.pk, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            ShoppingCartProduct.objects.get(
+                shopping_cart__user=self.user
+            ).amount,
+            2
+        )
+
+    def test_add_to_existing_cart_is_one_write(self):
+        self.add(self.product.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add(self.product.pk, 3)
+        self.assertEqual(response.status_code, 200)
+        statements = [
+            query["sql"] for query in queries
+            if not query["sql"].startswith(("SAVEPOINT", "RELEASE"))
+        ]
+        self.assertEqual(
+            [sql.split()[0] for sql in statements],
+            ["UPDATE", "INSERT", "SELECT"]
+        )
+        self.assertEqual(
+            ShoppingCartProduct.objects.get(
+                shopping_cart__user=self.user
+            ).amount,
+            4
+        )
+
+    def test_max_amount(self):
+        self.add(self.product.pk, MAX_AMOUNT_PRODUCT)
+        response = self.add(self.product.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(f"В корзине - {MAX_AMOUNT_PRODUCT}.", response.data)
+
+
+class CatalogueIndexTestCase(TestCase):
+    """Дочитывание индекса каталога по журналу изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        cls.products = Product.objects.bulk_create(
+            Product(
+                name=f"Продукт {number}",
+                slug=f"product-{number}",
+                subcategory=subcategory,
+                price=10
+            )
+            for number in range(4)
+        )
+
+    def setUp(self):
+        self.index = CatalogueIndex()
+
+    def get_totals(self, amounts):
+        """Посчитать итоги для словаря {продукт: количество}."""
+        revision, _ = CatalogueRevision.get_current()
+        return self.index.get_totals(
+            (product.pk, amount, revision)
+            for product, amount in amounts.items()
+        )
+
+    def test_load(self):
+        totals = self.get_totals({self.products[0]: 2, self.products[1]: 1})
+        self.assertEqual(
+            totals,
+            {"total_amount": 3, "total_price": Decimal("30.00")}
+        )
+
+    def test_refresh_after_price_update(self):
+        self.get_totals({self.products[0]: 1})
+        loaded = self.index.state
+        Product.objects.filter(pk=self.products[0].pk).update(price="12.50")
+        with self.assertNumQueries(3):
+            totals = self.get_totals({self.products[0]: 2})
+        self.assertEqual(totals["total_price"], Decimal("25.00"))
+        self.assertGreater(self.index.state.revision, loaded.revision)
+        self.assertEqual(loaded.prices[self.products[0].pk], 1000)
+
+    def test_current_index_is_not_refreshed(self):
+        self.get_totals({self.products[0]: 1})
+        with self.assertNumQueries(1):
+            self.get_totals({self.products[1]: 1})
+
+    def test_deleted_product_is_skipped(self):
+        self.get_totals({self.products[0]: 1})
+        product = self.products[1]
+        product_id = product.pk
+        Product.objects.filter(pk=product_id).delete()
+        revision, _ = CatalogueRevision.get_current()
+        totals = self.index.get_totals([
+            (self.products[0].pk, 1, revision),
+            (product_id, 5, revision),
+        ])
+        self.assertEqual(
+            totals,
+            {"total_amount": 1, "total_price": Decimal("10.00")}
+        )
+
+    def test_reload_after_bulk_change(self):
+        self.get_totals({self.products[0]: 1})
+        loaded = self.index.state
+        Product.objects.update(price=20)
+        totals = self.get_totals({self.products[0]: 1, self.products[3]: 1})
+        self.assertEqual(totals["total_price"], Decimal("40.00"))
+        self.assertIsNot(self.index.state.prices, loaded.prices)
+        self.assertEqual(loaded.prices[self.products[3].pk], 1000)
+
+    def test_empty_cart(self):
+        self.assertEqual(
+            self.index.get_totals([]),
+            {"total_amount": None, "total_price": None}
+        )
+
+
+class ShoppingCartQueryCountTestCase(TestCase):
+    """Число запросов к базе данных при чтении корзины.
+
+    Не должно зависеть от количества продуктов в корзине. Кэш ответов
+    корзины по умолчанию выключен, индекс каталога загружается заранее.
+    """
+    cart_sizes = (1, 10, 100)
+    list_queries = 2
+    total_info_queries = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        cls.products = Product.objects.bulk_create(
+            Product(
+                name=f"Продукт {number}",
+                slug=f"product-{number}",
+                subcategory=subcategory,
+                price=number + 1
+            )
+            for number in range(max(cls.cart_sizes))
+        )
+
+    def setUp(self):
+        cache.clear()
+        catalogue_index.clear()
+        catalogue_index.refresh(CatalogueRevision.get_current()[0])
+        self.client = APIClient()
+
+    def create_cart(self, size):
+        """Создать пользователя с корзиной из size продуктов."""
+        user = User.objects.create_user(f"buyer-{size}", password="password")
+        shopping_cart = ShoppingCart.objects.create(user=user)
+        ShoppingCartProduct.objects.bulk_create(
+            ShoppingCartProduct(
+                shopping_cart=shopping_cart,
+                product=product,
+                amount=2
+            )
+            for product in self.products[:size]
+        )
+        self.client.force_authenticate(user)
+
+    def get(self, view, **params):
+        """Выполнить GET-запрос к вьюхе корзины."""
+        return self.client.get(reverse(view), params)
+
+    def test_list_queries(self):
+        for size in self.cart_sizes:
+            with self.subTest(size=size):
+                self.create_cart(size)
+                with self.assertNumQueries(self.list_queries):
+                    response = self.get(
+                        "shoppingcartproduct-list",
+                        limit=max(self.cart_sizes)
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), size)
+                line = response.data["results"][0]
+                self.assertEqual(line["name"], self.products[0].name)
+                self.assertEqual(line["total_price"], Decimal(2))
+
+    def test_list_cursor_queries(self):
+        for size in self.cart_sizes:
+            with self.subTest(size=size):
+                self.create_cart(size)
+                with self.assertNumQueries(self.list_queries - 1):
+                    response = self.get(
+                        "shoppingcartproduct-list",
+                        pagination="cursor",
+                        limit=max(self.cart_sizes)
+                    )
+                self.assertEqual(len(response.data["results"]), size)
+
+    def test_total_info_queries(self):
+        for size in self.cart_sizes:
+            with self.subTest(size=size):
+                self.create_cart(size)
+                with self.assertNumQueries(self.total_info_queries):
+                    response = self.get(
+                        "shoppingcartproduct-show-total-info"
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data["total_amount"], 2 * size)
+                self.assertEqual(
+                    response.data["total_price"],
+                    Decimal(size * (size + 1))
+                )
+
+
+@override_settings(
+    SHOPPING_CART_CACHE=True,
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+)
+class ShoppingCartCacheTestCase(TestCase):
+    """Кэш ответов по корзине и условный GET с ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        cls.products = Product.objects.bulk_create(
+            Product(
+                name=f"Продукт {number}",
+                slug=f"product-{number}",
+                subcategory=subcategory,
+                price=10
+            )
+            for number in range(2)
+        )
+        cls.user = User.objects.create_user("buyer", password="password")
+        shopping_cart = ShoppingCart.objects.create(user=cls.user)
+        ShoppingCartProduct.objects.create(
+            shopping_cart=shopping_cart,
+            product=cls.products[0],
+            amount=2
+        )
+
+    def setUp(self):
+        cache.clear()
+        catalogue_index.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, view="shoppingcartproduct-list", **headers):
+        """Выполнить GET-запрос к вьюхе корзины."""
+        return self.client.get(reverse(view), headers=headers)
+
+    def post(self, view, data):
+        """Изменить корзину, выполнив отложенный сброс ее кэша."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse(view), data, format="json")
+
+    def test_cache_hit(self):
+        for view in (
+            "shoppingcartproduct-list",
+            "shoppingcartproduct-show-total-info",
+        ):
+            with self.subTest(view=view):
+                response = self.get(view)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    cached = self.get(view)
+                self.assertEqual(cached.status_code, 200)
+                self.assertEqual(cached.data, response.data)
+                self.assertEqual(cached["ETag"], response["ETag"])
+
+    def test_not_modified(self):
+        etag = self.get()["ETag"]
+        with self.assertNumQueries(0):
+            response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def assert_invalidated(self, view, data):
+        """Проверить, что изменение корзины сбрасывает ее ETag и кэш."""
+        etag = self.get("shoppingcartproduct-show-total-info")["ETag"]
+        response = self.post(view, data)
+        self.assertLess(response.status_code, 300)
+        response = self.get(
+            "shoppingcartproduct-show-total-info",
+            if_none_match=etag
+        )
+        self.assertNotEqual(response.status_code, 304)
+        self.assertNotEqual(response["ETag"], etag)
+        return response
+
+    def test_add_product_invalidates(self):
+        response = self.assert_invalidated(
+            "shoppingcartproduct-add-product",
+            {"product": self.products[1].pk, "amount": 3}
+        )
+        self.assertEqual(response.data["total_amount"], 5)
+
+    def test_remove_product_invalidates(self):
+        response = self.assert_invalidated(
+            "shoppingcartproduct-remove-product",
+            {"product": self.products[0].pk, "amount": 1}
+        )
+        self.assertEqual(response.data["total_amount"], 1)
+
+    def test_clear_invalidates(self):
+        response = self.assert_invalidated(
+            "shoppingcartproduct-clear-shopping-cart",
+            {}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, "Продуктовая корзина пуста.")
+
+    def test_batch_invalidates(self):
+        response = self.assert_invalidated(
+            "shoppingcartproduct-batch",
+            [
+                {"product": self.products[0].pk, "op": "set", "amount": 4},
+                {"product": self.products[1].pk, "op": "add", "amount": 1},
+            ]
+        )
+        self.assertEqual(response.data["total_amount"], 5)
+
+    def test_catalogue_change_invalidates_after_timeout(self):
+        etag = self.get("shoppingcartproduct-show-total-info")["ETag"]
+        Product.objects.filter(pk=self.products[0].pk).update(price=20)
+        cache.delete(SHOPPING_CART_REVISION_KEY)
+        response = self.get(
+            "shoppingcartproduct-show-total-info",
+            if_none_match=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_price"], Decimal("40.00"))
+
+
+class SerializeMetricsTestCase(TestCase):
+    """Замер времени работы сериализаторов в метриках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Категория", slug="category")
+        subcategory = Subcategory.objects.create(
+            name="Подкатегория",
+            slug="subcategory",
+            category=category
+        )
+        cls.product = Product.objects.create(
+            name="Продукт",
+            slug="product",
+            subcategory=subcategory,
+            price=10
+        )
+
+    def get_count(self, histogram, view):
+        """Получить количество наблюдений гистограммы для вьюхи."""
+        state = histogram.values.get((view, "GET"))
+        return state[2] if state is not None else 0
+
+    def test_serialization_is_measured(self):
+        for action, url in (
+            ("list", reverse("productlisting-list")),
+            (
+                "retrieve",
+                reverse(
+                    "subcategory-detail",
+                    args=(self.product.subcategory_id,)
+                )
+            ),
+        ):
+            view = f"{resolve(url).func.cls.__name__}.{action}"
+            with self.subTest(view=view):
+                serialized = self.get_count(SERIALIZE_DURATION, view)
+                rendered = self.get_count(RENDER_DURATION, view)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    self.get_count(SERIALIZE_DURATION, view),
+                    serialized + 1
+                )
+                self.assertEqual(
+                    self.get_count(RENDER_DURATION, view),
+                    rendered + 1
+                )
+                state = SERIALIZE_DURATION.values[(view, "GET")]
+                self.assertGreater(state[1], 0)
+
+
+class LocalTokenCacheTestCase(SimpleTestCase):
+    """LRU-кэш токенов в памяти процесса."""
+
+    def test_lru_eviction(self):
+        token_cache = LocalTokenCache(size=2, timeout=60)
+        token_cache.set("a", 1)
+        token_cache.set("b", 2)
+        token_cache.get("a")
+        token_cache.set("c", 3)
+        self.assertEqual(token_cache.get("a"), 1)
+        self.assertIsNone(token_cache.get("b"))
+        self.assertEqual(token_cache.get("c"), 3)
+
+    def test_timeout(self):
+        token_cache = LocalTokenCache(size=2, timeout=60)
+        with mock.patch("api_shop.authentication.time.monotonic") as clock:
+            clock.return_value = 100
+            token_cache.set("a", 1)
+            clock.return_value = 159
+            self.assertEqual(token_cache.get("a"), 1)
+            clock.return_value = 160
+            self.assertIsNone(token_cache.get("a"))
+        self.assertNotIn("a", token_cache.entries)
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    """Аутентификация по токену через кэш процесса и общий кэш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "buyer",
+            email="buyer@example.com",
+            password="password"
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self, header=None):
+        """Аутентифицировать запрос с заголовком Authorization."""
+        if header is None:
+            header = f"Token {self.token.key}"
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=header)
+        return self.authentication.authenticate(request)
+
+    def test_cache_hit(self):
+        with self.assertNumQueries(1):
+            user, token = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.authenticate()
+        self.assertEqual(cached_user.pk, self.user.pk)
+        self.assertEqual(cached_token.key, self.token.key)
+        self.assertIsNot(cached_user, user)
+
+    def test_async_authenticate(self):
+        request = APIRequestFactory().get(
+            "/",
+            HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        user, token = async_to_sync(self.authentication.aauthenticate)(
+            request
+        )
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertIn("password", user.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def assert_fails(self, message, header=None):
+        """Проверить отказ в аутентификации с сообщением DRF."""
+        with self.assertRaisesMessage(AuthenticationFailed, gettext(message)):
+            self.authenticate(header)
+
+    def test_header_parsing(self):
+        self.assertIsNone(self.authenticate("Bearer token"))
+        for header, message in (
+            ("Token", "Invalid token header. No credentials provided."),
+            (
+                "Token a b",
+                "Invalid token header. "
+                "Token string should not contain spaces."
+            ),
+            ("Token missing", "Invalid token."),
+        ):
+            with self.subTest(header=header):
+                self.assert_fails(message, header)
+
+    def test_logout_invalidates(self):
+        self.authenticate()
+        self.token.delete()
+        self.assert_fails("Invalid token.")
+
+    def test_deactivation_invalidates(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        self.assert_fails("User inactive or deleted.")
+
+    @mock.patch("api_shop.authentication.TOKEN_CACHE_SHARED", True)
+    def test_shared_cache_stores_only_public_fields(self):
+        self.authenticate()
+        user, token = cache.get(
+            TOKEN_CACHE_KEY.format(digest=get_token_digest(self.token.key))
+        )
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+        self.assertIn("password", user.get_deferred_fields())
+        self.assertIn("is_superuser", user.get_deferred_fields())
+
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.email, self.user.email)
+
+
+class ImageSetTestCase(SimpleTestCase):
+    """Поле images с вариантами и прежними ключами размеров."""
+
+    @mock.patch("products.images.schedule_variants")
+    def test_legacy_sizes_before_variants(self, schedule_variants):
+        images = get_image_set(
+            Product,
+            1,
+            "large.jpg",
+            {"legacy": {"large": "large.jpg", "medium": "medium.jpg"}}
+        )
+        schedule_variants.assert_called_once_with(Product, 1)
+        self.assertEqual(images["src"], "/media/large.jpg")
+        self.assertEqual(images["medium"], "/media/medium.jpg")
+        self.assertEqual(images["small"], "/media/large.jpg")
+
+    def test_sizes_from_variants(self):
+        variants = {
+            "original": "large.jpg",
+            "src": "/media/1280w.jpg",
+            "width": 1280,
+            "height": 960,
+            "sources": [],
+            "sizes": {
+                "large": "/media/1280w.jpg",
+                "medium": "/media/640w.jpg",
+                "small": "/media/320w.jpg",
+            },
+        }
+        images = get_image_set(Product, 1, "large.jpg", variants)
+        self.assertEqual(images["medium"], "/media/640w.jpg")
+        self.assertEqual(images["width"], 1280)
+
+
+class ImportCatalogueTestCase(TestCase):
+    """Пересборка витрины после загрузки каталога."""
+
+    def import_lines(self, *lines):
+        """Загрузить каталог из временного файла JSONL."""
+        with tempfile.NamedTemporaryFile(
+            "w",
+            suffix=".jsonl",
+            encoding="utf-8",
+            delete=False
+        ) as file:
+            file.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, file.name)
+        call_command(
+            "import_catalogue",
+            file.name,
+            batch_size=1,
+            verbosity=0,
+            stdout=io.StringIO(),
+            stderr=io.StringIO()
+        )
+
+    def test_rebuild_after_import(self):
+        self.import_lines(
+            '{"type": "category", "slug": "c", "name": "C"}',
+            '{"type": "subcategory", "slug": "s", "name": "S", '
+            '"parent": "c"}',
+            '{"type": "product", "slug": "p", "name": "P", '
+            '"parent": "s", "price": "10"}'
+        )
+        self.assertTrue(ProductListing.objects.filter(slug="p").exists())
+
+    def test_no_rebuild_after_failed_import(self):
+        with mock.patch.object(ImportCatalogueCommand, "rebuild") as rebuild:
+            with self.assertRaises(CommandError):
+                self.import_lines(
+                    '{"type": "category", "slug": "c", "name": "C"}',
+                    "{"
+                )
+        rebuild.assert_not_called()
+        self.assertTrue(Category.objects.filter(slug="c").exists())
@@ -1,15 +1,26 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
+from .async_views import (AsyncCategoryViewSet, AsyncProductViewSet,
+                          AsyncShoppingCartViewSet, AsyncSubcategoryViewSet)
 from .views import (CategoryViewSet, ProductViewSet, ShoppingCartViewSet,
                     SubcategoryViewSet)
 
+VIEWSETS = {
+    "categories": (CategoryViewSet, AsyncCategoryViewSet),
+    "products": (ProductViewSet, AsyncProductViewSet),
+    "shoppingcart": (ShoppingCartViewSet, AsyncShoppingCartViewSet),
+    "subcategories": (SubcategoryViewSet, AsyncSubcategoryViewSet),
+}
+
 router = routers.DefaultRouter()
 
-router.register("categories", CategoryViewSet)
-router.register("products", ProductViewSet)
-router.register("shoppingcart", ShoppingCartViewSet)
-router.register("subcategories", SubcategoryViewSet)
+for prefix, (viewset, async_viewset) in VIEWSETS.items():
+    router.register(
+        prefix,
+        async_viewset if settings.API_ASYNC_VIEWS else viewset
+    )
 
 urlpatterns = [
     path("auth/", include("djoser.urls")),
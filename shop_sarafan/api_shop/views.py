@@ -1,188 +1,616 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.text import compress_sequence
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from products.models import (MAX_AMOUNT_PRODUCT, Category, Product,
-                             ShoppingCart, ShoppingCartProduct, Subcategory)
+from products.catalogue import (PRODUCT_EXPORT_FIELDS, iter_chunks,
+                                iter_lines, iter_products)
+from products.models import (MAX_AMOUNT_PRODUCT, CatalogueRevision,
+                             Category, Product, ProductListing,
+                             ShoppingCart, ShoppingCartProduct,
+                             Subcategory, SubcategoryListingCount)
+from products.search import get_search_backend
+from .cache import (CATALOGUE_CACHE_MAX_AGE, bump_shopping_cart_version,
+                    get_cached_shopping_cart_response,
+                    get_catalogue_etag, get_catalogue_last_modified,
+                    get_category_tree)
+from .catalogue_index import catalogue_index
+from .fast_serializers import (CategoryValuesSerializer,
+                               ProductValuesSerializer,
+                               SubcategoryValuesSerializer)
+from .metrics import measure_serialization
 from .paginations import CustomPagination
 from .permissions import IsOwnerOrAdmin
-from .serializers import (CategorySerializer, ListShoppingCartSerializer,
-                          ProductSerializer, ShoppingCartProductSerializer,
-                          SubcategorySerializer)
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (CategorySerializer, CategoryTreeSerializer,
+                          ListShoppingCartSerializer, ProductExportSerializer,
+                          ProductListingSerializer, ProductSearchSerializer,
+                          ShoppingCartActionSerializer,
+                          ShoppingCartOperationSerializer,
+                          ShoppingCartProductSerializer, SubcategorySerializer)
+
+GZIP_PATTERN = re.compile(r"\bgzip\b")
+EXPORT_CHUNK_SIZE = 2000
+SEARCH_FACET_LIMIT = getattr(settings, "SEARCH_FACET_LIMIT", 10000)
+
+catalogue_http_cache = (
+    vary_on_headers("Accept"),
+    cache_control(public=True, max_age=CATALOGUE_CACHE_MAX_AGE),
+    condition(
+        etag_func=get_catalogue_etag,
+        last_modified_func=get_catalogue_last_modified
+    ),
+)
+
+
+class SerializeMixin:
+    """Примесь, замеряющая время работы сериализаторов вьюсета."""
+
+    def serialize(self, *args, **kwargs):
+        """Получить данные сериализатора из get_serializer."""
+        with measure_serialization(self.request):
+            return self.get_serializer(*args, **kwargs).data
+
+
+class ValuesListMixin(SerializeMixin):
+    """Примесь для вывода списка из .values() быстрым сериализатором.
+
+    Список строится без экземпляров моделей и без ModelSerializer,
+    детальный просмотр по-прежнему использует serializer_class.
+    """
+    values_serializer_class = None
+
+    def get_values_queryset(self):
+        """Получить queryset словарей с колонками быстрого сериализатора."""
+        return self.filter_queryset(self.get_queryset()).values(
+            *self.values_serializer_class.fields
+        )
+
+    def serialize_values(self, rows):
+        """Сериализовать строки .values() быстрым сериализатором."""
+        with measure_serialization(self.request):
+            return self.values_serializer_class(self.request).serialize(
+                rows
+            )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_values(page))
+        return Response(self.serialize_values(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(self.get_object()))
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(catalogue_http_cache, name="dispatch")
+class CategoryViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для категорий."""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    values_serializer_class = CategoryValuesSerializer
     pagination_class = CustomPagination
+    keyset_ordering = ("name", "id")
+
+    def get_serializer_class(self):
+        """Получить сериализатор."""
+        if self.action == "tree":
+            return CategoryTreeSerializer
+        return CategorySerializer
+
+    @action(methods=["GET"], detail=False)
+    def tree(self, request):
+        """Вывести все категории с вложенными подкатегориями."""
+        return Response(
+            get_category_tree(request, self.get_serializer_class())
+        )
 
 
-class SubcategoryViewSet(viewsets.ReadOnlyModelViewSet):
+@method_decorator(catalogue_http_cache, name="dispatch")
+class SubcategoryViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для подкатегорий."""
     queryset = Subcategory.objects.select_related("category")
     serializer_class = SubcategorySerializer
+    values_serializer_class = SubcategoryValuesSerializer
     pagination_class = CustomPagination
+    keyset_ordering = ("name", "id")
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет для продуктов."""
-    queryset = Product.objects.select_related("subcategory").prefetch_related(
-        "subcategory__category"
+@method_decorator(catalogue_http_cache, name="dispatch")
+class ProductViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
+    """Вьюсет для продуктов.
+
+    Читает денормализованную витрину одним запросом без создания
+    экземпляров моделей.
+    """
+    queryset = ProductListing.objects.values(
+        *ProductListingSerializer.Meta.fields
     )
-    serializer_class = ProductSerializer
+    serializer_class = ProductListingSerializer
+    values_serializer_class = ProductValuesSerializer
     pagination_class = CustomPagination
+    keyset_ordering = ("name", "product_id")
+    facet_limit = SEARCH_FACET_LIMIT
+    facets_counted = False
+
+    @action(methods=["GET"], detail=False)
+    def search(self, request):
+        """Найти продукты и посчитать их количество по категориям.
+
+        Фильтры: q - поисковая строка, category и subcategory - id,
+        price_min и price_max - диапазон цены. Счетчики категорий не
+        учитывают фильтры по категории и подкатегории, счетчики
+        подкатегорий - фильтр по подкатегории. Если счетчики посчитаны
+        только по первым facet_limit найденным продуктам,
+        facets_truncated равен True.
+        """
+        queryset, facet_querysets = self.get_search_querysets(request)
+        facets = {
+            name: list(facet_queryset)
+            for name, facet_queryset in facet_querysets.items()
+        }
+        page = self.paginate_queryset(queryset)
+        return self.get_search_response(page, facets)
+
+    def get_search_response(self, page, facets):
+        """Построить ответ поиска со страницей продуктов и счетчиками."""
+        response = self.get_paginated_response(self.serialize_values(page))
+        response.data["facets"] = facets
+        response.data["facets_truncated"] = (
+            not self.facets_counted
+            and sum(row["count"] for row in facets["categories"])
+            >= self.facet_limit
+        )
+        return response
+
+    def get_search_querysets(self, request):
+        """Построить querysets найденных продуктов и их счетчиков.
 
+        Возвращает queryset продуктов и словарь querysets счетчиков по
+        категориям и подкатегориям. Без поисковой строки и фильтра цены
+        счетчики читаются из SubcategoryListingCount, иначе
+        группируются не больше facet_limit найденных продуктов.
+        """
+        params = ProductSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
 
-class ShoppingCartViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+        queryset = self.get_queryset()
+        self.facets_counted = (
+            SubcategoryListingCount.is_maintained()
+            and not params.get("q")
+            and "price_min" not in params
+            and "price_max" not in params
+        )
+        if params.get("q"):
+            queryset = get_search_backend().filter(queryset, params["q"])
+        if "price_min" in params:
+            queryset = queryset.filter(price__gte=params["price_min"])
+        if "price_max" in params:
+            queryset = queryset.filter(price__lte=params["price_max"])
+
+        category_queryset = queryset
+        if "category" in params:
+            queryset = queryset.filter(category_id=params["category"])
+        subcategory_queryset = queryset
+        if "subcategory" in params:
+            queryset = queryset.filter(subcategory_id=params["subcategory"])
+
+        if self.facets_counted:
+            return queryset, {
+                "categories": SubcategoryListingCount.get_category_counts(),
+                "subcategories": (
+                    SubcategoryListingCount.get_subcategory_counts(
+                        params.get("category")
+                    )
+                ),
+            }
+        return queryset, {
+            "categories": self.get_facet_queryset(
+                category_queryset,
+                "category"
+            ),
+            "subcategories": self.get_facet_queryset(
+                subcategory_queryset,
+                "subcategory"
+            ),
+        }
+
+    def get_facet_queryset(self, queryset, field):
+        """Посчитать найденные продукты по полю field.
+
+        Группируются только первые facet_limit найденных продуктов,
+        поэтому время запроса не зависит от размера витрины.
+        """
+        matches = queryset.order_by().values("pk")[:self.facet_limit]
+        return ProductListing.objects.filter(pk__in=matches).values(
+            f"{field}_id", f"{field}_name"
+        ).annotate(count=Count("pk")).order_by(f"{field}_name")
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        renderer_classes=(NDJSONRenderer, CSVRenderer)
+    )
+    def export(self, request):
+        """Выгрузить весь каталог продуктов потоком в NDJSON или CSV.
+
+        Формат выбирается заголовком Accept или параметром format,
+        updated_since оставляет только продукты, измененные начиная с
+        этого момента. Продукты читаются из базы порциями, поэтому
+        расход памяти не зависит от размера каталога. Если клиент
+        принимает gzip, ответ сжимается на лету.
+        """
+        params = ProductExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        renderer = request.accepted_renderer
+        content = iter_chunks(
+            iter_lines(
+                iter_products(
+                    params.validated_data.get("updated_since"),
+                    chunk_size=EXPORT_CHUNK_SIZE
+                ),
+                renderer.catalogue_format,
+                PRODUCT_EXPORT_FIELDS
+            )
+        )
+        gzipped = GZIP_PATTERN.search(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if gzipped:
+            content = compress_sequence(content)
+        response = StreamingHttpResponse(
+            content,
+            content_type=f"{renderer.media_type}; charset=utf-8"
+        )
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+        response.headers["Content-Disposition"] = (
+            f'attachment; filename="products.{renderer.format}"'
+        )
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class ShoppingCartViewSet(SerializeMixin, mixins.ListModelMixin,
+                          viewsets.GenericViewSet):
     """Вьюсет для продуктовой корзины."""
     queryset = ShoppingCartProduct.objects.all()
     permission_classes = (IsOwnerOrAdmin,)
     pagination_class = CustomPagination
+    keyset_ordering = ("product_id", "id")
 
     def get_serializer_class(self):
         """Получить сериализатор."""
         if self.action == "show_total_info":
             return ListShoppingCartSerializer
+        if self.action in ("add_product", "remove_product"):
+            return ShoppingCartActionSerializer
+        if self.action == "batch":
+            return ShoppingCartOperationSerializer
         return ShoppingCartProductSerializer
 
     def get_queryset(self):
-        """Отфильтровать queryset по текущему пользователю."""
+        """Отфильтровать queryset по текущему пользователю.
+
+        Продукт присоединяется одним JOIN, а стоимость строки считается
+        в базе данных.
+        """
         user = self.request.user
-        return ShoppingCartProduct.objects.select_related(
-            "shopping_cart__user"
-        ).prefetch_related("product").filter(
+        return ShoppingCartProduct.objects.select_related("product").filter(
             shopping_cart__user=user
+        ).annotate(line_total=F("product__price") * F("amount"))
+
+    def invalidate_shopping_cart(self):
+        """Отметить изменение корзины пользователя.
+
+        Дата изменения корзины обновляется сразу, до изменения ее
+        продуктов, а кэш корзины сбрасывается после фиксации транзакции.
+        """
+        user_id = self.request.user.id
+        ShoppingCart.touch(user_id)
+        transaction.on_commit(lambda: bump_shopping_cart_version(user_id))
+
+    def list(self, request, *args, **kwargs):
+        """Вывести состав корзины из кэша или с проверкой ETag."""
+        return get_cached_shopping_cart_response(
+            request,
+            self.get_list_response
         )
 
+    def get_list_response(self):
+        """Построить ответ с составом корзины."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.serialize(page, many=True)
+            )
+        return Response(self.serialize(queryset, many=True))
+
     @action(methods=["GET"], detail=False)
     def show_total_info(self, request):
         """Вывести общую стоимость и количество продуктов в корзине."""
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(user=user).first()
-        if not shopping_cart:
+        return get_cached_shopping_cart_response(
+            request,
+            self.get_total_info_response
+        )
+
+    def get_total_info_response(self):
+        """Посчитать итоги корзины по ценам из индекса каталога."""
+        return self.make_total_info_response(
+            catalogue_index.get_totals(self.get_totals_queryset())
+        )
+
+    def get_totals_queryset(self):
+        """Получить строки корзины пользователя для индекса каталога.
+
+        Каждая строка - тройка (id продукта, количество, ревизия
+        каталога). Цены берутся из индекса, поэтому запрос не
+        присоединяет продукты, а ревизия читается подзапросом в том же
+        запросе, чтобы индекс дочитал изменения до нее.
+        """
+        return ShoppingCartProduct.objects.filter(
+            shopping_cart__user=self.request.user
+        ).order_by().annotate(
+            catalogue_revision=CatalogueRevision.get_subquery()
+        ).values_list("product_id", "amount", "catalogue_revision")
+
+    def make_total_info_response(self, totals):
+        """Построить ответ с итогами корзины."""
+        if totals["total_amount"] is None:
             return Response(
                 "Продуктовая корзина пуста.",
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        serializer = self.get_serializer_class()
-        serializer = serializer(
-            instance=shopping_cart,
-            context={"request": request}
-        )
-        return Response(serializer.data)
+        return Response(self.serialize(instance=totals))
 
     @action(methods=["POST"], detail=False)
     def add_product(self, request):
-        """Добавить продукт в корзину или увеличить его количество."""
-        serializer = ShoppingCartProductSerializer(data=request.data)
+        """Добавить продукт в корзину или увеличить его количество.
+
+        Существование продукта проверяется самой записью: строка
+        вставляется или увеличивается одним upsert ShoppingCartProduct.add,
+        поэтому одновременные добавления не теряют друг друга, а предел
+        MAX_AMOUNT_PRODUCT проверяется базой данных. Причина отказа
+        выясняется дополнительными запросами, только если upsert не
+        изменил строку.
+        """
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        return self.perform_add_product(
+            serializer.validated_data["product"],
+            serializer.validated_data["amount"]
+        )
 
-        product_id = request.data.get("product")
-        product = Product.objects.filter(id=product_id).first()
-        if not product:
-            return (
-                Response(
+    @transaction.atomic
+    def perform_add_product(self, product_id, amount):
+        """Добавить продукт в корзину пользователя в одной транзакции."""
+        user = self.request.user
+        self.invalidate_shopping_cart()
+        if not ShoppingCartProduct.add(user.id, product_id, amount):
+            current_amount = ShoppingCartProduct.objects.filter(
+                shopping_cart__user=user,
+                product_id=product_id
+            ).values_list("amount", flat=True).first()
+            if current_amount is not None:
+                return Response(
+                    "Ошибка! "
+                    "Максимальное количество продукта - "
+                    f"{MAX_AMOUNT_PRODUCT} шт. "
+                    f"В корзине - {current_amount}.",
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if Product.objects.filter(id=product_id).exists():
+                ShoppingCart.objects.get_or_create(user=user)
+            if not ShoppingCartProduct.add(user.id, product_id, amount):
+                return Response(
                     "Такого продукта нет.",
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            )
-
-        user = request.user
-        shopping_cart, created = ShoppingCart.objects.get_or_create(user=user)
-
-        shopping_cart_product, created = (
-            ShoppingCartProduct.objects.get_or_create(
-                shopping_cart=shopping_cart,
-                product=product,
-            )
-        )
-
-        amount = request.data.get("amount")
-        if shopping_cart_product.amount + amount > MAX_AMOUNT_PRODUCT:
-            return Response(
-                "Ошибка! "
-                f"Максимальное количество продукта - {MAX_AMOUNT_PRODUCT} шт. "
-                f"В корзине - {shopping_cart_product.amount}.",
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        shopping_cart_product.amount += amount
-        shopping_cart_product.save()
+        product_name = Product.objects.values_list(
+            "name",
+            flat=True
+        ).get(id=product_id)
         return Response(
-            f"Продукт {product.name} добавлен в корзину "
+            f"Продукт {product_name} добавлен в корзину "
             f"в количестве {amount} шт.",
             status=status.HTTP_200_OK
         )
 
     @action(methods=["POST"], detail=False)
     def remove_product(self, request):
-        """Удалить продукт из корзины или уменьшить его количество."""
-        serializer = ShoppingCartProductSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        """Удалить продукт из корзины или уменьшить его количество.
 
-        user = request.user
-        shopping_cart = ShoppingCart.objects.filter(user=user).first()
-        if not shopping_cart:
-            return Response(
-                "Продуктовая корзина пуста.",
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        Количество уменьшается условным UPDATE с F-выражением, который не
+        опускает его ниже нуля; строка, которая обнулилась бы, удаляется.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return self.perform_remove_product(
+            serializer.validated_data["product"],
+            serializer.validated_data["amount"]
+        )
 
-        product_id = request.data.get("product")
-        product = Product.objects.filter(id=product_id).first()
-        if not product:
+    @transaction.atomic
+    def perform_remove_product(self, product_id, amount):
+        """Убрать продукт из корзины пользователя в одной транзакции."""
+        user = self.request.user
+        shopping_cart_products = ShoppingCartProduct.objects.filter(
+            shopping_cart__user=user,
+            product_id=product_id
+        )
+        product_name = Product.objects.filter(id=product_id).values_list(
+            "name",
+            flat=True
+        ).first()
+        if product_name is None:
             return Response(
                 "Такого продукта нет.",
                 status=status.HTTP_400_BAD_REQUEST
             )
-        shopping_cart_product = ShoppingCartProduct.objects.filter(
-            shopping_cart=shopping_cart,
-            product=product
-        ).first()
-        if not shopping_cart_product:
+        self.invalidate_shopping_cart()
+
+        if shopping_cart_products.filter(amount__gt=amount).update(
+            amount=F("amount") - amount
+        ):
+            remaining = shopping_cart_products.values_list(
+                "amount",
+                flat=True
+            ).get()
             return Response(
-                "Такого продукта в продуктовой корзине нет.",
-                status=status.HTTP_400_BAD_REQUEST
+                f"Продукт {product_name} удален из корзины. "
+                f"Осталось {remaining} шт.",
+                status=status.HTTP_200_OK
             )
 
-        amount = request.data.get("amount")
-        if shopping_cart_product.amount - amount < 0:
+        deleted, _ = shopping_cart_products.filter(amount=amount).delete()
+        if deleted:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        current_amount = shopping_cart_products.values_list(
+            "amount",
+            flat=True
+        ).first()
+        if current_amount is not None:
             return Response(
                 f"В продуктовой корзине количество товара меньше, "
                 "чем Вы хотите убрать! "
-                f"В ней {shopping_cart_product.amount} шт. данного продукта.",
-                status=status.HTTP_400_BAD_REQUEST)
-        if shopping_cart_product.amount - amount == 0:
-            shopping_cart_product.delete()
+                f"В ней {current_amount} шт. данного продукта.",
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ShoppingCart.objects.filter(user=user).exists():
             return Response(
-                f"Продукт {product.name} удален из корзины.",
-                status=status.HTTP_204_NO_CONTENT
+                "Продуктовая корзина пуста.",
+                status=status.HTTP_400_BAD_REQUEST
             )
-
-        shopping_cart_product.amount -= amount
-        shopping_cart_product.save()
-
         return Response(
-            f"Продукт {product.name} удален из корзины. "
-            f"Осталось {shopping_cart_product.amount} шт.",
-            status=status.HTTP_200_OK
+            "Такого продукта в продуктовой корзине нет.",
+            status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(methods=["POST"], detail=False)
+    def batch(self, request):
+        """Применить к корзине список операций add, remove и set.
+
+        Операции проверяются и применяются в памяти, после чего корзина
+        записывается одним upsert и одним удалением в транзакции.
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data
+        product_ids = {operation["product"] for operation in operations}
+
+        with transaction.atomic():
+            products = Product.objects.only("id").in_bulk(product_ids)
+            missing_ids = sorted(product_ids - products.keys())
+            if missing_ids:
+                return Response(
+                    f"Продуктов с id {missing_ids} нет.",
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            shopping_cart, created = ShoppingCart.objects.get_or_create(
+                user=request.user
+            )
+            amounts = dict(
+                ShoppingCartProduct.objects.select_for_update().filter(
+                    shopping_cart=shopping_cart,
+                    product_id__in=product_ids
+                ).values_list("product_id", "amount")
+            )
+            existing_ids = set(amounts)
+
+            for operation in operations:
+                product_id = operation["product"]
+                amount = amounts.get(product_id, 0)
+                if operation["op"] == ShoppingCartOperationSerializer.ADD:
+                    amount += operation["amount"]
+                elif operation["op"] == ShoppingCartOperationSerializer.REMOVE:
+                    amount -= operation["amount"]
+                else:
+                    amount = operation["amount"]
+
+                if amount < 0:
+                    return Response(
+                        "В продуктовой корзине количество товара с id "
+                        f"{product_id} меньше, чем Вы хотите убрать! "
+                        f"В ней {amounts.get(product_id, 0)} шт.",
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if amount > MAX_AMOUNT_PRODUCT:
+                    return Response(
+                        "Ошибка! "
+                        "Максимальное количество продукта - "
+                        f"{MAX_AMOUNT_PRODUCT} шт. "
+                        f"Продукта с id {product_id} в корзине - "
+                        f"{amounts.get(product_id, 0)}.",
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                amounts[product_id] = amount
+
+            self.invalidate_shopping_cart()
+            ShoppingCartProduct.objects.bulk_create(
+                [
+                    ShoppingCartProduct(
+                        shopping_cart=shopping_cart,
+                        product_id=product_id,
+                        amount=amount
+                    )
+                    for product_id, amount in amounts.items() if amount
+                ],
+                update_conflicts=True,
+                unique_fields=("shopping_cart", "product"),
+                update_fields=("amount",)
+            )
+            removed_ids = [
+                product_id for product_id, amount in amounts.items()
+                if not amount and product_id in existing_ids
+            ]
+            if removed_ids:
+                ShoppingCartProduct.objects.filter(
+                    shopping_cart=shopping_cart,
+                    product_id__in=removed_ids
+                ).delete()
+
+        with measure_serialization(request):
+            data = ShoppingCartProductSerializer(
+                self.get_queryset(),
+                many=True
+            ).data
+        return Response(data, status=status.HTTP_200_OK)
+
     @action(methods=["POST"], detail=False)
     def clear_shopping_cart(self, request):
         """Очистить продуктовую корзину."""
-        shopping_cart_product = self.get_queryset()
+        return self.perform_clear_shopping_cart()
 
-        if not shopping_cart_product:
+    @transaction.atomic
+    def perform_clear_shopping_cart(self):
+        """Очистить корзину пользователя в одной транзакции."""
+        deleted, _ = ShoppingCartProduct.objects.filter(
+            shopping_cart__user=self.request.user
+        ).delete()
+
+        if not deleted:
             return Response(
                 "Продуктовая корзина пуста.",
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        shopping_cart_product.delete()
-        return Response(
-            "Продуктовая корзина очищена.",
-            status=status.HTTP_204_NO_CONTENT
-        )
+        self.invalidate_shopping_cart()
+        return Response(status=status.HTTP_204_NO_CONTENT)
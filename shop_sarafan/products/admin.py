@@ -58,7 +58,7 @@ class ProductInline(TabularInline):
 @register(ShoppingCart)
 class ShoppingCartAdmin(ModelAdmin):
     """Административный класс для модели ShoppingCart."""
-    list_display = ("user",)
+    list_display = ("user", "updated_at")
     ordering = ("user",)
     search_fields = ("user__username",)
     inlines = [ProductInline]
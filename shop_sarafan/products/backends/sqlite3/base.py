@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с настраиваемым режимом начала транзакций.
+
+    В режиме IMMEDIATE транзакция сразу берет блокировку записи, поэтому
+    одновременные транзакции ждут ее в пределах busy_timeout, а не
+    завершаются ошибкой "database is locked" при переходе от чтения к
+    записи.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {settings.SQLITE_TRANSACTION_MODE}")
@@ -0,0 +1,41 @@
+import time
+
+from django.db import transaction
+
+from products.models import ShoppingCart, ShoppingCartProduct
+
+
+def get_expired_carts(cutoff):
+    """Получить корзины, которые не изменялись с момента cutoff."""
+    return ShoppingCart.objects.filter(updated_at__lt=cutoff)
+
+
+def get_expired_lines(cutoff):
+    """Получить продукты корзин, которые не изменялись с момента cutoff."""
+    return ShoppingCartProduct.objects.filter(
+        shopping_cart__updated_at__lt=cutoff
+    )
+
+
+def delete_in_batches(queryset, batch_size, pause=0):
+    """Удалить записи queryset пакетами, выдавая число удаленных в пакете.
+
+    Каждый пакет выбирается по первичным ключам и удаляется в своей
+    короткой транзакции, поэтому блокировка записи не удерживается
+    дольше одного пакета. Условие queryset проверяется повторно внутри
+    транзакции: запись, которая за это время перестала ему
+    соответствовать, например корзина, измененная пользователем,
+    остается. Между пакетами делается пауза pause секунд, чтобы
+    запросы пользователей не ждали блокировку.
+    """
+    queryset = queryset.order_by()
+    label = queryset.model._meta.label
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            _, deleted = queryset.filter(pk__in=ids).delete()
+        yield deleted.get(label, 0)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,305 @@
+import csv
+import gzip
+import json
+import sys
+from decimal import Decimal, InvalidOperation
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+
+from products.models import MIN_PRICE, Category, Product, Subcategory
+
+CATALOGUE_FIELDS = ("type", "slug", "name", "parent", "price", "image")
+CATALOGUE_FORMATS = ("csv", "jsonl")
+CATALOGUE_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+PRODUCT_EXPORT_FIELDS = (
+    "id",
+    "name",
+    "slug",
+    "category",
+    "subcategory",
+    "price",
+    "image",
+    "updated_at",
+)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def get_format(path, catalogue_format=None):
+    """Определить формат файла каталога по параметру или расширению."""
+    if catalogue_format:
+        return catalogue_format
+    name = path.removesuffix(".gz")
+    for extension, value in CATALOGUE_EXTENSIONS.items():
+        if name.endswith(extension):
+            return value
+    raise ValueError(
+        f"Не удалось определить формат файла {path}, укажите его явно."
+    )
+
+
+def open_catalogue(path, mode="r"):
+    """Открыть файл каталога как текстовый поток.
+
+    Путь "-" означает стандартный ввод или вывод, файлы с расширением
+    .gz читаются и пишутся со сжатием.
+    """
+    if path == "-":
+        stream = sys.stdin if mode == "r" else sys.stdout
+        stream.flush()
+        return open(
+            stream.fileno(),
+            mode,
+            encoding="utf-8",
+            newline="",
+            closefd=False
+        )
+    if path.endswith(".gz"):
+        return gzip.open(path, f"{mode}t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def read_records(file, catalogue_format):
+    """Читать записи каталога из потока по одной."""
+    if catalogue_format == "csv":
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_records(chunk_size=2000):
+    """Получить все записи каталога: категории, подкатегории и продукты.
+
+    Родительские записи идут раньше дочерних, поэтому результат можно
+    загрузить обратно за один проход.
+    """
+    categories = Category.objects.order_by("pk").values_list(
+        "slug", "name", "image"
+    )
+    for slug, name, image in categories.iterator(chunk_size=chunk_size):
+        yield {"type": "category", "slug": slug, "name": name,
+               "image": image}
+    subcategories = Subcategory.objects.order_by("pk").values_list(
+        "slug", "name", "category__slug", "image"
+    )
+    for slug, name, parent, image in subcategories.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {"type": "subcategory", "slug": slug, "name": name,
+               "parent": parent, "image": image}
+    products = Product.objects.order_by("pk").values_list(
+        "slug", "name", "subcategory__slug", "price", "image"
+    )
+    for slug, name, parent, price, image in products.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {"type": "product", "slug": slug, "name": name,
+               "parent": parent, "price": str(price), "image": image}
+
+
+def iter_products(updated_since=None, chunk_size=2000):
+    """Получить продукты с названиями категории и подкатегории.
+
+    С updated_since выбираются только продукты, которые сами или чьи
+    подкатегория и категория изменились начиная с этого момента.
+    """
+    queryset = Product.objects.order_by("pk")
+    if updated_since is not None:
+        queryset = queryset.filter(
+            Q(updated_at__gte=updated_since)
+            | Q(subcategory__updated_at__gte=updated_since)
+            | Q(subcategory__category__updated_at__gte=updated_since)
+        )
+    rows = queryset.values_list(
+        "id",
+        "name",
+        "slug",
+        "subcategory__category__name",
+        "subcategory__name",
+        "price",
+        "image",
+        "updated_at"
+    )
+    url = default_storage.url
+    for (
+        pk, name, slug, category, subcategory, price, image, updated_at
+    ) in rows.iterator(chunk_size=chunk_size):
+        yield {
+            "id": pk,
+            "name": name,
+            "slug": slug,
+            "category": category,
+            "subcategory": subcategory,
+            "price": str(price),
+            "image": url(image) if image else "",
+            "updated_at": updated_at.isoformat(),
+        }
+
+
+class Echo:
+    """Псевдофайл, который возвращает записанную строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_lines(records, catalogue_format, fields=CATALOGUE_FIELDS):
+    """Преобразовать записи в строки CSV или JSONL по одной."""
+    if catalogue_format == "csv":
+        writer = csv.DictWriter(Echo(), fields)
+        yield writer.writeheader()
+        for record in records:
+            yield writer.writerow(record)
+        return
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def iter_chunks(lines, size=STREAM_CHUNK_SIZE):
+    """Склеить строки в блоки байтов для потоковой отдачи."""
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield "".join(buffer).encode()
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def write_records(file, records, catalogue_format):
+    """Записать записи каталога в поток и вернуть их количество."""
+    count = 0
+
+    def counted(records):
+        nonlocal count
+        for count, record in enumerate(records, 1):
+            yield record
+
+    file.writelines(iter_lines(counted(records), catalogue_format))
+    return count
+
+
+class CatalogueImporter:
+    """Пакетная загрузка каталога с обновлением существующих записей.
+
+    Слаги родительских записей разрешаются в id через словари в памяти,
+    которые заполняются из базы один раз и пополняются после каждой
+    пакетной вставки. Записи накапливаются по моделям и сохраняются
+    через bulk_create(update_conflicts=True) по слагу, каждый пакет в
+    своей транзакции.
+    """
+    update_fields = {
+        Category: ("name", "image", "updated_at"),
+        Subcategory: ("name", "image", "category", "updated_at"),
+        Product: ("name", "image", "subcategory", "price", "updated_at"),
+    }
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.ids = {
+            Category: dict(Category.objects.values_list("slug", "id")),
+            Subcategory: dict(Subcategory.objects.values_list("slug", "id")),
+        }
+        self.pending = {Category: {}, Subcategory: {}, Product: {}}
+        self.counts = {Category: 0, Subcategory: 0, Product: 0}
+
+    @property
+    def total(self):
+        """Количество сохраненных записей."""
+        return sum(self.counts.values())
+
+    def get_parent_id(self, model, slug):
+        """Получить id родительской записи по слагу.
+
+        Если родитель еще ждет сохранения в текущем пакете,
+        пакет сохраняется досрочно.
+        """
+        if not slug:
+            raise ValueError("Не указан родитель (parent).")
+        if slug not in self.ids[model] and slug in self.pending[model]:
+            self.flush(model)
+        try:
+            return self.ids[model][slug]
+        except KeyError:
+            raise ValueError(
+                f"{model._meta.verbose_name.capitalize()} "
+                f"со слагом {slug} не найдена."
+            ) from None
+
+    def build(self, record):
+        """Создать несохраненный объект модели по записи каталога."""
+        record_type = record.get("type")
+        slug = record.get("slug")
+        if not slug or not record.get("name"):
+            raise ValueError("Не указаны slug или name.")
+        fields = {
+            "slug": slug,
+            "name": record["name"],
+            "image": record.get("image") or "",
+        }
+        if record_type == "category":
+            return Category(**fields)
+        if record_type == "subcategory":
+            return Subcategory(
+                category_id=self.get_parent_id(Category, record.get("parent")),
+                **fields
+            )
+        if record_type == "product":
+            try:
+                price = Decimal(record.get("price"))
+            except (InvalidOperation, TypeError):
+                raise ValueError(
+                    f"Некорректная цена: {record.get('price')}."
+                ) from None
+            if price < Decimal(str(MIN_PRICE)):
+                raise ValueError(f"Цена меньше {MIN_PRICE}.")
+            return Product(
+                subcategory_id=self.get_parent_id(
+                    Subcategory,
+                    record.get("parent")
+                ),
+                price=price,
+                **fields
+            )
+        raise ValueError(f"Неизвестный тип записи: {record_type}.")
+
+    def add(self, record):
+        """Добавить запись в пакет и сохранить пакет, если он заполнен."""
+        instance = self.build(record)
+        model = type(instance)
+        self.pending[model][instance.slug] = instance
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model):
+        """Сохранить накопленный пакет записей одной модели."""
+        instances = list(self.pending[model].values())
+        if not instances:
+            return
+        with transaction.atomic():
+            model.objects.bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=("slug",),
+                update_fields=self.update_fields[model]
+            )
+        self.pending[model] = {}
+        self.counts[model] += len(instances)
+        if model in self.ids:
+            self.ids[model].update(
+                model.objects.filter(
+                    slug__in=[instance.slug for instance in instances]
+                ).values_list("slug", "id")
+            )
+
+    def finish(self):
+        """Сохранить все оставшиеся пакеты, начиная с родительских."""
+        for model in self.pending:
+            self.flush(model)
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Применить к новому соединению с SQLite прагмы из SQLITE_PRAGMAS.
+
+    Прагмы выполняются напрямую в соединении sqlite3, чтобы не попадать
+    в метрики запросов к базе данных.
+    """
+    if connection.vendor != "sqlite":
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
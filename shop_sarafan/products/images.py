@@ -0,0 +1,252 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.dispatch import Signal
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS_DIR = "products/images/variants"
+IMAGE_VARIANT_WIDTHS = tuple(sorted(
+    getattr(settings, "IMAGE_VARIANT_WIDTHS", (320, 640, 1280))
+))
+IMAGE_VARIANT_FORMATS = getattr(
+    settings, "IMAGE_VARIANT_FORMATS", ("avif", "webp", "jpeg")
+)
+IMAGE_VARIANT_QUALITY = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+IMAGE_VARIANT_WORKERS = getattr(settings, "IMAGE_VARIANT_WORKERS", 2)
+IMAGE_VARIANT_LOCK_KEY = "image_variants:{label}:{pk}"
+IMAGE_VARIANT_LOCK_TIMEOUT = 60 * 5
+LEGACY_IMAGE_SIZES = ("large", "medium", "small")
+
+FORMATS = {
+    "avif": ("AVIF", "image/avif", "avif"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+
+image_variants_ready = Signal()
+
+
+@lru_cache
+def get_formats():
+    """Получить форматы вариантов, которые поддерживает установленный Pillow.
+
+    JPEG поддерживается всегда и остается запасным вариантом для
+    браузеров без AVIF и WebP.
+    """
+    return tuple(
+        key for key in IMAGE_VARIANT_FORMATS
+        if key == "jpeg" or features.check(key)
+    )
+
+
+def is_actual(name, variants):
+    """Проверить, что варианты построены для текущего оригинала."""
+    return not name or bool(variants) and variants.get("original") == name
+
+
+def get_widths(width):
+    """Получить ширины вариантов без увеличения исходного изображения."""
+    widths = [value for value in IMAGE_VARIANT_WIDTHS if value < width]
+    if width <= IMAGE_VARIANT_WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+
+def encode(image, width, key):
+    """Уменьшить изображение до заданной ширины и закодировать его."""
+    pil_format = FORMATS[key][0]
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    if pil_format == "JPEG" and resized.mode != "RGB":
+        background = Image.new("RGB", resized.size, "white")
+        if resized.mode in ("RGBA", "LA"):
+            background.paste(resized, mask=resized.getchannel("A"))
+        else:
+            background.paste(resized.convert("RGB"))
+        resized = background
+    buffer = BytesIO()
+    resized.save(
+        buffer,
+        pil_format,
+        quality=IMAGE_VARIANT_QUALITY,
+        optimize=pil_format == "JPEG"
+    )
+    return buffer.getvalue()
+
+
+def get_legacy_sizes(urls):
+    """Сопоставить размерам large, medium и small URL-адреса вариантов.
+
+    urls - адреса вариантов одного формата по возрастанию ширины.
+    """
+    return {
+        "large": urls[-1],
+        "medium": urls[len(urls) // 2],
+        "small": urls[0],
+    }
+
+
+def build_variants(field_file):
+    """Сгенерировать варианты изображения и вернуть их описание.
+
+    Имена файлов содержат хеш содержимого оригинала, поэтому
+    варианты неизменяемы и могут кэшироваться клиентами бессрочно,
+    а повторная загрузка того же файла не создает новых вариантов.
+    Строки srcset собираются здесь же, чтобы не строить URL-адреса
+    при каждой сериализации. Запасным src служит самый широкий
+    вариант в последнем формате, варианты этого же формата отдаются
+    в прежних ключах large, medium и small.
+    """
+    with field_file.open("rb") as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert(
+            "RGBA" if "transparency" in image.info else "RGB"
+        )
+    widths = get_widths(image.width)
+    sources = []
+    for key in get_formats():
+        extension = FORMATS[key][2]
+        srcset = []
+        urls = []
+        for width in widths:
+            name = (
+                f"{IMAGE_VARIANTS_DIR}/{digest[:2]}/"
+                f"{digest}-{width}w.{extension}"
+            )
+            if not default_storage.exists(name):
+                name = default_storage.save(
+                    name,
+                    ContentFile(encode(image, width, key))
+                )
+            urls.append(default_storage.url(name))
+            srcset.append(f"{urls[-1]} {width}w")
+        sources.append(
+            {"type": FORMATS[key][1], "srcset": ", ".join(srcset)}
+        )
+    return {
+        "original": field_file.name,
+        "hash": digest,
+        "src": default_storage.url(name),
+        "width": widths[-1],
+        "height": max(1, round(image.height * widths[-1] / image.width)),
+        "sources": sources,
+        "sizes": get_legacy_sizes(urls),
+    }
+
+
+def generate_variants(model, pk, force=False):
+    """Построить и сохранить варианты изображения объекта.
+
+    Сохранение выполняется только если оригинал не сменился за время
+    обработки. После сохранения отправляется сигнал
+    image_variants_ready, по которому обновляются витрина и кэши.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not instance.image:
+        return None
+    name = instance.image.name
+    if not force and is_actual(name, instance.image_variants):
+        return instance.image_variants
+    variants = build_variants(instance.image)
+    updated = model.objects.filter(pk=pk, image=name).update(
+        image_variants=variants
+    )
+    if updated:
+        image_variants_ready.send(
+            sender=model,
+            instance_id=pk,
+            variants=variants
+        )
+    return variants
+
+
+@lru_cache
+def get_executor():
+    """Получить пул фоновых потоков для генерации вариантов."""
+    return ThreadPoolExecutor(
+        max_workers=IMAGE_VARIANT_WORKERS,
+        thread_name_prefix="image-variants"
+    )
+
+
+def run_generate_variants(model, pk, lock_key):
+    """Выполнить генерацию в фоновом потоке."""
+    try:
+        generate_variants(model, pk)
+    except Exception:
+        logger.exception(
+            "Не удалось построить варианты изображения %s %s",
+            model._meta.label,
+            pk
+        )
+    else:
+        cache.delete(lock_key)
+    finally:
+        connection.close()
+
+
+def schedule_variants(model, pk):
+    """Поставить генерацию вариантов в очередь фонового пула.
+
+    Блокировка в кэше не дает нескольким запросам построить варианты
+    одного изображения одновременно, а после ошибки откладывает
+    повторную попытку до истечения ее срока.
+    """
+    lock_key = IMAGE_VARIANT_LOCK_KEY.format(
+        label=model._meta.label_lower,
+        pk=pk
+    )
+    if not cache.add(lock_key, True, timeout=IMAGE_VARIANT_LOCK_TIMEOUT):
+        return
+    get_executor().submit(run_generate_variants, model, pk, lock_key)
+
+
+def get_image_set(model, pk, name, variants):
+    """Получить описание изображения в виде, пригодном для srcset.
+
+    Для совместимости с прежним API описание содержит и ключи large,
+    medium и small. Если варианты еще не построены или устарели, их
+    генерация ставится в очередь, а до ее завершения возвращается
+    оригинал, а в прежних ключах - файлы, перенесенные миграцией из
+    отдельных полей размеров, если они есть.
+    """
+    if not name:
+        return None
+    if not is_actual(name, variants):
+        schedule_variants(model, pk)
+        url = default_storage.url(name)
+        legacy = (variants or {}).get("legacy", {})
+        return {
+            "src": url,
+            "sources": [],
+            **{
+                size: default_storage.url(legacy[size])
+                if legacy.get(size) else url
+                for size in LEGACY_IMAGE_SIZES
+            },
+        }
+    return {
+        "src": variants["src"],
+        "width": variants["width"],
+        "height": variants["height"],
+        "sources": variants["sources"],
+        **(
+            variants.get("sizes")
+            or dict.fromkeys(LEGACY_IMAGE_SIZES, variants["src"])
+        ),
+    }
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from products.carts import (delete_in_batches, get_expired_carts,
+                            get_expired_lines)
+
+SHOPPING_CART_TTL_DAYS = getattr(settings, "SHOPPING_CART_TTL_DAYS", 30)
+
+
+class Command(BaseCommand):
+    """Команда для удаления брошенных продуктовых корзин."""
+    help = (
+        "Удалить корзины, которые не изменялись дольше заданного срока, "
+        "вместе с их продуктами. Удаление идет небольшими пакетами, "
+        "чтобы не мешать работе с корзинами."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=float,
+            default=SHOPPING_CART_TTL_DAYS,
+            help="Срок хранения неизменяемой корзины в днях."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество строк, удаляемых одним запросом."
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Пауза между пакетами в секундах."
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать брошенные корзины, ничего не удаляя."
+        )
+
+    def delete(self, queryset, options):
+        """Удалить записи пакетами и вернуть их количество."""
+        total = 0
+        for deleted in delete_in_batches(
+            queryset,
+            options["batch_size"],
+            options["pause"]
+        ):
+            total += deleted
+            if options["verbosity"] > 1:
+                self.stderr.write(
+                    f"{queryset.model._meta.verbose_name_plural}: "
+                    f"удалено {total}"
+                )
+        return total
+
+    def handle(self, *args, **options):
+        if options["ttl"] <= 0 or options["batch_size"] <= 0:
+            raise CommandError(
+                "Срок хранения и размер пакета должны быть больше нуля."
+            )
+
+        cutoff = timezone.now() - timedelta(days=options["ttl"])
+        if options["dry_run"]:
+            self.stdout.write(
+                f"Брошенных корзин: {get_expired_carts(cutoff).count()}, "
+                f"продуктов в них: {get_expired_lines(cutoff).count()}."
+            )
+            return
+
+        started = perf_counter()
+        lines = self.delete(get_expired_lines(cutoff), options)
+        carts = self.delete(get_expired_carts(cutoff), options)
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Удалено корзин: {carts}, продуктов в корзинах: {lines} "
+                f"за {elapsed:.1f} с."
+            )
+        )
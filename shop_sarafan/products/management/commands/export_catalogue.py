@@ -0,0 +1,57 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalogue import (CATALOGUE_FORMATS, get_format, iter_records,
+                                open_catalogue, write_records)
+
+
+class Command(BaseCommand):
+    """Команда для выгрузки каталога в CSV или JSONL."""
+    help = (
+        "Выгрузить категории, подкатегории и продукты в CSV или JSONL. "
+        "Записи читаются из базы порциями и пишутся потоково, "
+        "результат можно загрузить обратно командой import_catalogue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Путь к файлу (.csv, .jsonl, .gz) или - для stdout."
+        )
+        parser.add_argument(
+            "--format",
+            choices=CATALOGUE_FORMATS,
+            help="Формат файла, по умолчанию определяется по расширению."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Количество строк, читаемых из базы за один раз."
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        try:
+            catalogue_format = get_format(
+                path,
+                options["format"] or ("jsonl" if path == "-" else None)
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        started = perf_counter()
+        with open_catalogue(path, "w") as file:
+            count = write_records(
+                file,
+                iter_records(chunk_size=options["chunk_size"]),
+                catalogue_format
+            )
+        elapsed = perf_counter() - started
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"Выгружено {count} записей за {elapsed:.1f} с."
+            )
+        )
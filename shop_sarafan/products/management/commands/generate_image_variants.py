@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.images import (IMAGE_VARIANT_WORKERS, generate_variants,
+                             is_actual)
+from products.models import Category, Product, Subcategory
+
+MODELS = {
+    "category": Category,
+    "subcategory": Subcategory,
+    "product": Product,
+}
+
+
+class Command(BaseCommand):
+    """Команда для пакетного построения вариантов изображений."""
+    help = (
+        "Построить размерные варианты и версии WebP/AVIF для изображений "
+        "категорий, подкатегорий и продуктов, у которых их еще нет."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=tuple(MODELS),
+            action="append",
+            help="Обработать только указанные модели."
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=IMAGE_VARIANT_WORKERS,
+            help="Количество потоков для генерации."
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить варианты и для актуальных изображений."
+        )
+
+    def generate(self, model, pk, force):
+        """Построить варианты одного изображения в рабочем потоке."""
+        try:
+            return generate_variants(model, pk, force=force)
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        force = options["force"]
+        generated = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for key in options["model"] or MODELS:
+                model = MODELS[key]
+                rows = model.objects.exclude(image="").values_list(
+                    "pk",
+                    "image",
+                    "image_variants"
+                )
+                futures = {
+                    executor.submit(self.generate, model, pk, force): (
+                        f"{model._meta.verbose_name} {pk}"
+                    )
+                    for pk, name, variants in rows.iterator()
+                    if force or not is_actual(name, variants)
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as error:
+                        failed += 1
+                        self.stderr.write(f"{futures[future]}: {error}")
+                    else:
+                        generated += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Построены варианты для {generated} изображений, "
+                f"ошибок: {failed}."
+            )
+        )
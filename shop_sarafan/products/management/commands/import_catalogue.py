@@ -0,0 +1,121 @@
+import csv
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from products.catalogue import (CATALOGUE_FORMATS, CatalogueImporter,
+                                get_format, open_catalogue, read_records)
+from products.models import CatalogueRevision, ProductListing
+from products.search import get_search_backend
+
+PROGRESS_INTERVAL = 1.0
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    """Команда для пакетной загрузки каталога из CSV или JSONL."""
+    help = (
+        "Загрузить категории, подкатегории и продукты из CSV или JSONL. "
+        "Существующие записи обновляются по слагу. Файл читается "
+        "потоково, записи сохраняются пакетами. После загрузки "
+        "пересобираются витрина и поисковый индекс, а ревизия каталога "
+        "в базе данных увеличивается, поэтому работающие процессы "
+        "сбрасывают ETag, дерево категорий и кэш корзин и дочитывают "
+        "индекс каталога при следующем запросе без перезапуска."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="Путь к файлу каталога (.csv, .jsonl, .gz) или - для stdin."
+        )
+        parser.add_argument(
+            "--format",
+            choices=CATALOGUE_FORMATS,
+            help="Формат файла, по умолчанию определяется по расширению."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Количество записей в одной пакетной вставке."
+        )
+
+    def report_progress(self, importer, line, started):
+        """Вывести количество обработанных строк и скорость загрузки."""
+        elapsed = perf_counter() - started
+        self.stderr.write(
+            f"Строк: {line}, сохранено: {importer.total}, "
+            f"{line / elapsed:.0f} строк/с"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            catalogue_format = get_format(path, options["format"])
+        except ValueError as error:
+            raise CommandError(error)
+
+        importer = CatalogueImporter(batch_size=options["batch_size"])
+        errors = 0
+        line = 0
+        started = reported = perf_counter()
+        try:
+            with open_catalogue(path) as file:
+                for line, record in enumerate(
+                    read_records(file, catalogue_format), 1
+                ):
+                    try:
+                        importer.add(record)
+                    except ValueError as error:
+                        errors += 1
+                        if errors <= MAX_REPORTED_ERRORS:
+                            self.stderr.write(f"Строка {line}: {error}")
+                    if (
+                        options["verbosity"] > 0
+                        and perf_counter() - reported >= PROGRESS_INTERVAL
+                    ):
+                        self.report_progress(importer, line, started)
+                        reported = perf_counter()
+                importer.finish()
+        except (OSError, ValueError, csv.Error, DatabaseError) as error:
+            hint = (
+                ". Сохраненные пакеты остались в базе данных, после "
+                "исправления загрузите файл снова или выполните "
+                "rebuild_product_listing."
+                if importer.total else ""
+            )
+            raise CommandError(
+                f"Загрузка остановлена после строки {line}: {error}{hint}"
+            )
+        if importer.total:
+            self.rebuild()
+
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено за {elapsed:.1f} с: "
+                + ", ".join(
+                    f"{model._meta.verbose_name_plural.lower()} {count}"
+                    for model, count in importer.counts.items()
+                )
+                + f". Пропущено строк с ошибками: {errors}."
+            )
+        )
+        self.stdout.write(
+            f"Ревизия каталога: {CatalogueRevision.get_current()[0]}."
+        )
+
+    def rebuild(self):
+        """Обновить витрину, поисковый индекс и кэши после загрузки.
+
+        Пакетная вставка не отправляет сигналы post_save, поэтому
+        производные данные пересобираются один раз в конце успешной
+        загрузки. Кэши других
+        процессов и индекс каталога обновляются по ревизии каталога,
+        которую триггеры базы данных увеличили при вставке.
+        """
+        with transaction.atomic():
+            ProductListing.rebuild()
+            get_search_backend().rebuild()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import ProductListing
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """Команда для пересборки витрины продуктов и поискового индекса."""
+    help = "Пересобрать витрину продуктов и поисковый индекс."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = ProductListing.rebuild()
+            get_search_backend().rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Витрина пересобрана, изменено строк: {count}."
+            )
+        )
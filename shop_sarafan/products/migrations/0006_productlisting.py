@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_product_listing(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductListing = apps.get_model("products", "ProductListing")
+    products = Product.objects.select_related("subcategory__category")
+    ProductListing.objects.bulk_create(
+        ProductListing(
+            product=product,
+            name=product.name,
+            slug=product.slug,
+            category_name=product.subcategory.category.name,
+            subcategory_name=product.subcategory.name,
+            price=product.price,
+            image_large=product.image_large.url,
+            image_medium=product.image_medium.url,
+            image_small=product.image_small.url,
+        )
+        for product in products.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0005_alter_shoppingcartproduct_options_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductListing",
+            fields=[
+                ("product", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="listing", serialize=False, to="products.product", verbose_name="Продукт")),
+                ("name", models.CharField(max_length=200, verbose_name="Название")),
+                ("slug", models.SlugField(max_length=200, verbose_name="Слаг")),
+                ("category_name", models.CharField(max_length=200, verbose_name="Название категории")),
+                ("subcategory_name", models.CharField(max_length=200, verbose_name="Название подкатегории")),
+                ("price", models.DecimalField(decimal_places=2, max_digits=10, verbose_name="Цена")),
+                ("image_large", models.CharField(max_length=255, verbose_name="Большое изображение")),
+                ("image_medium", models.CharField(max_length=255, verbose_name="Среднее изображение")),
+                ("image_small", models.CharField(max_length=255, verbose_name="Маленькое изображение")),
+            ],
+            options={
+                "verbose_name": "продукт на витрине",
+                "verbose_name_plural": "Витрина продуктов",
+                "ordering": ("name",),
+            },
+        ),
+        migrations.AlterField(
+            model_name="shoppingcartproduct",
+            name="shopping_cart",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="shopping_cart_products", to="products.shoppingcart", verbose_name="Продуктовая корзина"),
+        ),
+        migrations.RunPython(
+            fill_product_listing,
+            migrations.RunPython.noop
+        ),
+    ]
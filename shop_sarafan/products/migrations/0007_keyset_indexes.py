@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0006_productlisting"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["name", "id"], name="category_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["name", "product"], name="listing_name_product_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subcategory",
+            index=models.Index(fields=["name", "id"], name="subcategory_name_id_idx"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0007_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="shoppingcartproduct",
+            constraint=models.CheckConstraint(check=models.Q(("amount__lte", 32000)), name="shopping_cart_product_amount_lte_max"),
+        ),
+    ]
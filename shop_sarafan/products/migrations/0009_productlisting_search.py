@@ -0,0 +1,83 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = "products_product_fts"
+
+
+def fill_listing_relations(apps, schema_editor):
+    ProductListing = apps.get_model("products", "ProductListing")
+    listings = ProductListing.objects.select_related("product__subcategory")
+    for listing in listings.iterator():
+        listing.subcategory_id = listing.product.subcategory_id
+        listing.category_id = listing.product.subcategory.category_id
+        listing.save(update_fields=("category", "subcategory"))
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(name, slug)"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, slug) "
+        "SELECT id, name, slug FROM products_product"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0008_shoppingcartproduct_amount_constraint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productlisting",
+            name="category",
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="listings", to="products.category", verbose_name="Категория"),
+        ),
+        migrations.AddField(
+            model_name="productlisting",
+            name="subcategory",
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="listings", to="products.subcategory", verbose_name="Подкатегория"),
+        ),
+        migrations.RunPython(
+            fill_listing_relations,
+            migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name="productlisting",
+            name="category",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="listings", to="products.category", verbose_name="Категория"),
+        ),
+        migrations.AlterField(
+            model_name="productlisting",
+            name="subcategory",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="listings", to="products.subcategory", verbose_name="Подкатегория"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["category", "price"], name="listing_category_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["subcategory", "price"], name="listing_subcategory_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["price"], name="listing_price_idx"),
+        ),
+        migrations.RunPython(
+            create_search_index,
+            drop_search_index
+        ),
+    ]
@@ -0,0 +1,176 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:48
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+BATCH_SIZE = 1000
+SIZES = ("large", "medium", "small")
+
+
+def copy_original_image(apps, schema_editor):
+    """Сделать большое изображение оригиналом, сохранив все три файла.
+
+    Файлы среднего и маленького размера не удаляются: их имена
+    сохраняются в image_variants["legacy"] и отдаются в ключах medium
+    и small поля images, пока не построены новые варианты.
+    """
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(image=F("image_large"))
+    products = []
+    for product in Product.objects.exclude(
+        image_large="",
+        image_medium="",
+        image_small=""
+    ).only(
+        "image_large",
+        "image_medium",
+        "image_small"
+    ).iterator(chunk_size=BATCH_SIZE):
+        product.image_variants = {
+            "legacy": {
+                size: getattr(product, f"image_{size}").name
+                for size in SIZES
+            },
+        }
+        products.append(product)
+        if len(products) >= BATCH_SIZE:
+            Product.objects.bulk_update(products, ("image_variants",))
+            products = []
+    Product.objects.bulk_update(products, ("image_variants",))
+
+
+def copy_sized_images(apps, schema_editor):
+    """Вернуть файлы размеров из legacy, а без них - оригинал."""
+    Product = apps.get_model("products", "Product")
+    products = []
+    for product in Product.objects.only(
+        "image",
+        "image_variants"
+    ).iterator(chunk_size=BATCH_SIZE):
+        legacy = (product.image_variants or {}).get("legacy", {})
+        for size in SIZES:
+            setattr(
+                product,
+                f"image_{size}",
+                legacy.get(size) or product.image.name
+            )
+        products.append(product)
+        if len(products) >= BATCH_SIZE:
+            Product.objects.bulk_update(
+                products,
+                [f"image_{size}" for size in SIZES]
+            )
+            products = []
+    Product.objects.bulk_update(
+        products,
+        [f"image_{size}" for size in SIZES]
+    )
+
+
+def fill_listing_image(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    ProductListing = apps.get_model("products", "ProductListing")
+    products = Product.objects.filter(pk=OuterRef("product_id"))
+    ProductListing.objects.update(
+        image=Subquery(products.values("image")[:1]),
+        image_variants=Subquery(products.values("image_variants")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="Варианты изображения"),
+        ),
+        migrations.AddField(
+            model_name="subcategory",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="Варианты изображения"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name="Варианты изображения"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="image",
+            field=models.ImageField(default="", upload_to="products/images/products/original", verbose_name="Изображение"),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_original_image, copy_sized_images),
+        migrations.AlterField(
+            model_name="product",
+            name="image_large",
+            field=models.ImageField(default="", upload_to="products/images/products/large", verbose_name="Большое изображение"),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="image_medium",
+            field=models.ImageField(default="", upload_to="products/images/products/medium", verbose_name="Среднее изображение"),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="image_small",
+            field=models.ImageField(default="", upload_to="products/images/products/small", verbose_name="Маленькое изображение"),
+        ),
+        migrations.RemoveField(
+            model_name="product",
+            name="image_large",
+        ),
+        migrations.RemoveField(
+            model_name="product",
+            name="image_medium",
+        ),
+        migrations.RemoveField(
+            model_name="product",
+            name="image_small",
+        ),
+        migrations.AddField(
+            model_name="productlisting",
+            name="image",
+            field=models.CharField(default="", max_length=255, verbose_name="Изображение"),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="productlisting",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, verbose_name="Варианты изображения"),
+        ),
+        migrations.RunPython(fill_listing_image, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="productlisting",
+            name="image_large",
+            field=models.CharField(default="", max_length=255, verbose_name="Большое изображение"),
+        ),
+        migrations.AlterField(
+            model_name="productlisting",
+            name="image_medium",
+            field=models.CharField(default="", max_length=255, verbose_name="Среднее изображение"),
+        ),
+        migrations.AlterField(
+            model_name="productlisting",
+            name="image_small",
+            field=models.CharField(default="", max_length=255, verbose_name="Маленькое изображение"),
+        ),
+        migrations.RemoveField(
+            model_name="productlisting",
+            name="image_large",
+        ),
+        migrations.RemoveField(
+            model_name="productlisting",
+            name="image_medium",
+        ),
+        migrations.RemoveField(
+            model_name="productlisting",
+            name="image_small",
+        ),
+    ]
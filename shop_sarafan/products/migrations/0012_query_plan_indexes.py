@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0011_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="shoppingcartproduct",
+            constraint=models.UniqueConstraint(fields=("shopping_cart", "product"), name="shopping_cart_product_unique"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="shoppingcartproduct",
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name="shoppingcartproduct",
+            name="shopping_cart",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="shopping_cart_products", to="products.shoppingcart", verbose_name="Продуктовая корзина"),
+        ),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(fields=["updated_at"], name="category_updated_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["updated_at"], name="product_updated_at_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["category", "name", "product"], name="listing_category_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productlisting",
+            index=models.Index(fields=["subcategory", "name", "product"], name="listing_subcategory_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subcategory",
+            index=models.Index(fields=["updated_at"], name="subcategory_updated_at_idx"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_query_plan_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name="Дата изменения"),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="shoppingcart",
+            index=models.Index(fields=["updated_at"], name="shopping_cart_updated_at_idx"),
+        ),
+    ]
@@ -0,0 +1,164 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+REVISION_TABLE = "products_cataloguerevision"
+CHANGE_TABLE = "products_cataloguechange"
+REVISION_ID = 1
+LOGGED_TABLES = {
+    "products_category": "category",
+    "products_subcategory": "subcategory",
+    "products_product": "product",
+}
+COUNTED_TABLES = ("products_productlisting",)
+SQLITE_EVENTS = {"insert": "NEW", "update": "NEW", "delete": "OLD"}
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def get_bump_sql(now):
+    """Увеличить счетчик изменений, создав его строку при необходимости."""
+    return (
+        f"INSERT INTO {REVISION_TABLE} (id, revision, changed_at) "
+        f"VALUES ({REVISION_ID}, 1, {now}) "
+        "ON CONFLICT (id) DO UPDATE SET "
+        f"revision = {REVISION_TABLE}.revision + 1, "
+        "changed_at = excluded.changed_at"
+    )
+
+
+def get_log_sql(model, object_id):
+    """Записать в журнал текущую ревизию объекта."""
+    return (
+        f"INSERT INTO {CHANGE_TABLE} "
+        "(model, object_id, revision, changed_at) "
+        f"SELECT {model}, {object_id}, revision, changed_at "
+        f"FROM {REVISION_TABLE} WHERE id = {REVISION_ID} "
+        "ON CONFLICT (model, object_id) DO UPDATE SET "
+        "revision = excluded.revision, changed_at = excluded.changed_at"
+    )
+
+
+def create_sqlite_triggers(schema_editor):
+    for table in (*LOGGED_TABLES, *COUNTED_TABLES):
+        for event, row in SQLITE_EVENTS.items():
+            statements = [get_bump_sql(SQLITE_NOW)]
+            if table in LOGGED_TABLES:
+                statements.append(
+                    get_log_sql(f"'{LOGGED_TABLES[table]}'", f"{row}.id")
+                )
+            schema_editor.execute(
+                f"CREATE TRIGGER {table}_{event}_revision "
+                f"AFTER {event.upper()} ON {table} BEGIN "
+                + "".join(f"{statement}; " for statement in statements)
+                + "END"
+            )
+
+
+def drop_sqlite_triggers(schema_editor):
+    for table in (*LOGGED_TABLES, *COUNTED_TABLES):
+        for event in SQLITE_EVENTS:
+            schema_editor.execute(
+                f"DROP TRIGGER IF EXISTS {table}_{event}_revision"
+            )
+
+
+def create_postgresql_triggers(schema_editor):
+    # Счетчик увеличивается один раз на оператор. Блокировка его строки
+    # держится до конца транзакции, поэтому ревизии фиксируются в
+    # порядке возрастания и дочитывание по ревизии ничего не теряет.
+    schema_editor.execute(
+        "CREATE FUNCTION products_bump_catalogue_revision() "
+        "RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        f"{get_bump_sql('clock_timestamp()')}; "
+        "RETURN NULL; END $$"
+    )
+    schema_editor.execute(
+        "CREATE FUNCTION products_log_catalogue_change() "
+        "RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        + get_log_sql(
+            "TG_ARGV[0]",
+            "CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END"
+        )
+        + "; RETURN NULL; END $$"
+    )
+    for table in (*LOGGED_TABLES, *COUNTED_TABLES):
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_revision "
+            f"BEFORE INSERT OR UPDATE OR DELETE ON {table} "
+            "FOR EACH STATEMENT "
+            "EXECUTE FUNCTION products_bump_catalogue_revision()"
+        )
+    for table, model in LOGGED_TABLES.items():
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_change "
+            f"AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            "FOR EACH ROW "
+            f"EXECUTE FUNCTION products_log_catalogue_change('{model}')"
+        )
+
+
+def drop_postgresql_triggers(schema_editor):
+    schema_editor.execute(
+        "DROP FUNCTION IF EXISTS products_bump_catalogue_revision() CASCADE"
+    )
+    schema_editor.execute(
+        "DROP FUNCTION IF EXISTS products_log_catalogue_change() CASCADE"
+    )
+
+
+def create_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        create_sqlite_triggers(schema_editor)
+    elif vendor == "postgresql":
+        create_postgresql_triggers(schema_editor)
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        drop_sqlite_triggers(schema_editor)
+    elif vendor == "postgresql":
+        drop_postgresql_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_shoppingcart_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogueRevision",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("revision", models.BigIntegerField(default=0, verbose_name="Ревизия")),
+                ("changed_at", models.DateTimeField(verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "ревизия каталога",
+                "verbose_name_plural": "Ревизии каталога",
+            },
+        ),
+        migrations.CreateModel(
+            name="CatalogueChange",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model", models.CharField(max_length=20, verbose_name="Модель")),
+                ("object_id", models.BigIntegerField(verbose_name="Id объекта")),
+                ("revision", models.BigIntegerField(verbose_name="Ревизия")),
+                ("changed_at", models.DateTimeField(verbose_name="Дата изменения")),
+            ],
+            options={
+                "verbose_name": "изменение каталога",
+                "verbose_name_plural": "Журнал изменений каталога",
+                "indexes": [models.Index(fields=["revision"], name="catalogue_change_revision_idx")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cataloguechange",
+            constraint=models.UniqueConstraint(fields=("model", "object_id"), name="catalogue_change_object_unique"),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
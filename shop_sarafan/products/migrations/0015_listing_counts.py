@@ -0,0 +1,127 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LISTING_TABLE = "products_productlisting"
+COUNT_TABLE = "products_subcategorylistingcount"
+
+
+def get_increment_sql(subcategory_id):
+    """Увеличить счетчик подкатегории, создав его строку при необходимости."""
+    return (
+        f"INSERT INTO {COUNT_TABLE} (subcategory_id, products_count) "
+        f"VALUES ({subcategory_id}, 1) "
+        "ON CONFLICT (subcategory_id) DO UPDATE SET "
+        f"products_count = {COUNT_TABLE}.products_count + 1"
+    )
+
+
+def get_decrement_sql(subcategory_id):
+    """Уменьшить счетчик подкатегории."""
+    return (
+        f"UPDATE {COUNT_TABLE} SET products_count = products_count - 1 "
+        f"WHERE subcategory_id = {subcategory_id}"
+    )
+
+
+def create_sqlite_triggers(schema_editor):
+    schema_editor.execute(
+        f"CREATE TRIGGER {LISTING_TABLE}_insert_count "
+        f"AFTER INSERT ON {LISTING_TABLE} BEGIN "
+        f"{get_increment_sql('NEW.subcategory_id')}; END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {LISTING_TABLE}_delete_count "
+        f"AFTER DELETE ON {LISTING_TABLE} BEGIN "
+        f"{get_decrement_sql('OLD.subcategory_id')}; END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {LISTING_TABLE}_update_count "
+        f"AFTER UPDATE OF subcategory_id ON {LISTING_TABLE} "
+        "WHEN OLD.subcategory_id != NEW.subcategory_id BEGIN "
+        f"{get_decrement_sql('OLD.subcategory_id')}; "
+        f"{get_increment_sql('NEW.subcategory_id')}; END"
+    )
+
+
+def drop_sqlite_triggers(schema_editor):
+    for event in ("insert", "delete", "update"):
+        schema_editor.execute(
+            f"DROP TRIGGER IF EXISTS {LISTING_TABLE}_{event}_count"
+        )
+
+
+def create_postgresql_triggers(schema_editor):
+    schema_editor.execute(
+        "CREATE FUNCTION products_count_listing() "
+        "RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+        "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+        f"{get_decrement_sql('OLD.subcategory_id')}; END IF; "
+        "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+        f"{get_increment_sql('NEW.subcategory_id')}; END IF; "
+        "RETURN NULL; END $$"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {LISTING_TABLE}_count "
+        f"AFTER INSERT OR DELETE ON {LISTING_TABLE} "
+        "FOR EACH ROW EXECUTE FUNCTION products_count_listing()"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER {LISTING_TABLE}_update_count "
+        f"AFTER UPDATE OF subcategory_id ON {LISTING_TABLE} "
+        "FOR EACH ROW "
+        "WHEN (OLD.subcategory_id IS DISTINCT FROM NEW.subcategory_id) "
+        "EXECUTE FUNCTION products_count_listing()"
+    )
+
+
+def drop_postgresql_triggers(schema_editor):
+    schema_editor.execute(
+        "DROP FUNCTION IF EXISTS products_count_listing() CASCADE"
+    )
+
+
+def create_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        create_sqlite_triggers(schema_editor)
+    elif vendor == "postgresql":
+        create_postgresql_triggers(schema_editor)
+    else:
+        return
+    schema_editor.execute(
+        f"INSERT INTO {COUNT_TABLE} (subcategory_id, products_count) "
+        f"SELECT subcategory_id, COUNT(*) FROM {LISTING_TABLE} "
+        "GROUP BY subcategory_id"
+    )
+
+
+def drop_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        drop_sqlite_triggers(schema_editor)
+    elif vendor == "postgresql":
+        drop_postgresql_triggers(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0014_catalogue_revision"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubcategoryListingCount",
+            fields=[
+                ("subcategory", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="listing_count", serialize=False, to="products.subcategory", verbose_name="Подкатегория")),
+                ("products_count", models.PositiveIntegerField(default=0, verbose_name="Количество продуктов")),
+            ],
+            options={
+                "verbose_name": "счетчик витрины",
+                "verbose_name_plural": "Счетчики витрины",
+            },
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -1,6 +1,10 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -9,6 +13,13 @@ MAX_LEN_TITLE = 200
 MIN_PRICE = 1.0
 MIN_AMOUNT_PRODUCT = 1
 MAX_AMOUNT_PRODUCT = 32000
+SHOPPING_CART_TOUCH_INTERVAL = timedelta(hours=1)
+CATALOGUE_REVISION_ID = 1
+LISTING_COUNT_VENDORS = ("sqlite", "postgresql")
+LISTING_DISTINCT_OPERATORS = {
+    "sqlite": "IS NOT",
+    "postgresql": "IS DISTINCT FROM",
+}
 
 
 class Category(models.Model):
@@ -23,12 +34,26 @@ class Category(models.Model):
         "Изображение",
         upload_to="products/images/categories"
     )
+    image_variants = models.JSONField(
+        "Варианты изображения",
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     class Meta:
         """Конфигурация модели категории."""
         verbose_name = "категория"
         verbose_name_plural = "Категории"
         ordering = ("name",)
+        indexes = (
+            models.Index(fields=("name", "id"), name="category_name_id_idx"),
+            models.Index(
+                fields=("updated_at",),
+                name="category_updated_at_idx"
+            ),
+        )
 
     def __str__(self):
         """Строковое представление объекта категории."""
@@ -47,18 +72,35 @@ class Subcategory(models.Model):
         "Изображение",
         upload_to="products/images/subcategories"
     )
+    image_variants = models.JSONField(
+        "Варианты изображения",
+        default=dict,
+        blank=True,
+        editable=False
+    )
     category = models.ForeignKey(
         Category,
         on_delete=models.CASCADE,
         related_name="subcategories",
         verbose_name="Категория"
     )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     class Meta:
         """Конфигурация модели подкатегории."""
         verbose_name = "подкатегория"
         verbose_name_plural = "Подкатегории"
         ordering = ("name",)
+        indexes = (
+            models.Index(
+                fields=("name", "id"),
+                name="subcategory_name_id_idx"
+            ),
+            models.Index(
+                fields=("updated_at",),
+                name="subcategory_updated_at_idx"
+            ),
+        )
 
     def __str__(self):
         """Строковое представление объекта подкатегории."""
@@ -79,17 +121,15 @@ class Product(models.Model):
         related_name="products",
         verbose_name="Подкатегория"
     )
-    image_large = models.ImageField(
-        "Большое изображение",
-        upload_to="products/images/products/large"
-    )
-    image_medium = models.ImageField(
-        "Среднее изображение",
-        upload_to="products/images/products/medium"
+    image = models.ImageField(
+        "Изображение",
+        upload_to="products/images/products/original"
     )
-    image_small = models.ImageField(
-        "Маленькое изображение",
-        upload_to="products/images/products/small"
+    image_variants = models.JSONField(
+        "Варианты изображения",
+        default=dict,
+        blank=True,
+        editable=False
     )
     price = models.DecimalField(
         "Цена",
@@ -97,27 +137,357 @@ class Product(models.Model):
         decimal_places=2,
         validators=[MinValueValidator(MIN_PRICE)]
     )
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     class Meta:
         """Конфигурация модели продукта."""
         verbose_name = "продукт"
         verbose_name_plural = "Продукты"
         ordering = ("name",)
+        indexes = (
+            models.Index(
+                fields=("updated_at",),
+                name="product_updated_at_idx"
+            ),
+        )
 
     def __str__(self):
         """Строковое представление объекта продукта."""
         return self.name
 
 
+class ProductListing(models.Model):
+    """Денормализованная витрина продуктов для чтения без объединений."""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="listing",
+        verbose_name="Продукт"
+    )
+    name = models.CharField("Название", max_length=MAX_LEN_TITLE)
+    slug = models.SlugField("Слаг", max_length=MAX_LEN_SLUG)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="listings",
+        verbose_name="Категория",
+        db_index=False
+    )
+    category_name = models.CharField(
+        "Название категории",
+        max_length=MAX_LEN_TITLE
+    )
+    subcategory = models.ForeignKey(
+        Subcategory,
+        on_delete=models.CASCADE,
+        related_name="listings",
+        verbose_name="Подкатегория",
+        db_index=False
+    )
+    subcategory_name = models.CharField(
+        "Название подкатегории",
+        max_length=MAX_LEN_TITLE
+    )
+    price = models.DecimalField("Цена", max_digits=10, decimal_places=2)
+    image = models.CharField("Изображение", max_length=255)
+    image_variants = models.JSONField(
+        "Варианты изображения",
+        default=dict,
+        blank=True
+    )
+
+    class Meta:
+        """Конфигурация витрины продуктов."""
+        verbose_name = "продукт на витрине"
+        verbose_name_plural = "Витрина продуктов"
+        ordering = ("name",)
+        indexes = (
+            models.Index(
+                fields=("name", "product"),
+                name="listing_name_product_idx"
+            ),
+            models.Index(
+                fields=("category", "price"),
+                name="listing_category_price_idx"
+            ),
+            models.Index(
+                fields=("category", "name", "product"),
+                name="listing_category_name_idx"
+            ),
+            models.Index(
+                fields=("subcategory", "price"),
+                name="listing_subcategory_price_idx"
+            ),
+            models.Index(
+                fields=("subcategory", "name", "product"),
+                name="listing_subcategory_name_idx"
+            ),
+            models.Index(fields=("price",), name="listing_price_idx"),
+        )
+
+    def __str__(self):
+        """Строковое представление продукта на витрине."""
+        return self.name
+
+    @staticmethod
+    def get_defaults(product):
+        """Получить значения полей витрины для продукта."""
+        return {
+            "name": product.name,
+            "slug": product.slug,
+            "category_id": product.subcategory.category_id,
+            "category_name": product.subcategory.category.name,
+            "subcategory_id": product.subcategory_id,
+            "subcategory_name": product.subcategory.name,
+            "price": product.price,
+            "image": product.image.name,
+            "image_variants": product.image_variants,
+        }
+
+    @classmethod
+    def rebuild(cls):
+        """Пересобрать витрину продуктов и вернуть число измененных строк.
+
+        Строки копируются одним запросом INSERT ... SELECT, без создания
+        объектов моделей. На SQLite и PostgreSQL запрос обновляет только
+        изменившиеся строки через ON CONFLICT, поэтому повторная
+        пересборка неизменного каталога почти ничего не пишет. На
+        остальных СУБД витрина очищается и заполняется заново.
+        """
+        listing = cls._meta.db_table
+        columns = (
+            "name",
+            "slug",
+            "category_id",
+            "category_name",
+            "subcategory_id",
+            "subcategory_name",
+            "price",
+            "image",
+            "image_variants",
+        )
+        select = (
+            "SELECT product.id, product.name, product.slug, "
+            "category.id, category.name, subcategory.id, "
+            "subcategory.name, product.price, product.image, "
+            "product.image_variants "
+            f"FROM {Product._meta.db_table} product "
+            f"JOIN {Subcategory._meta.db_table} subcategory "
+            "ON subcategory.id = product.subcategory_id "
+            f"JOIN {Category._meta.db_table} category "
+            "ON category.id = subcategory.category_id"
+        )
+        insert = f"INSERT INTO {listing} (product_id, {', '.join(columns)}) "
+        distinct = LISTING_DISTINCT_OPERATORS.get(connection.vendor)
+        with connection.cursor() as cursor:
+            if distinct is None:
+                cursor.execute(f"DELETE FROM {listing}")
+                cursor.execute(insert + select)
+                return cursor.rowcount
+            cursor.execute(
+                f"DELETE FROM {listing} WHERE product_id NOT IN "
+                f"(SELECT id FROM {Product._meta.db_table})"
+            )
+            # WHERE перед ON CONFLICT нужен SQLite, чтобы отличить его
+            # от условия ON последнего JOIN.
+            cursor.execute(
+                insert + select + " WHERE 1 = 1 "
+                "ON CONFLICT (product_id) DO UPDATE SET "
+                + ", ".join(f"{column} = excluded.{column}"
+                            for column in columns)
+                + " WHERE "
+                + " OR ".join(
+                    f"{listing}.{column} {distinct} excluded.{column}"
+                    for column in columns
+                )
+            )
+            return cursor.rowcount
+
+
+class SubcategoryListingCount(models.Model):
+    """Число продуктов подкатегории на витрине.
+
+    Поддерживается триггерами базы данных при любом изменении витрины
+    (SQLite и PostgreSQL), поэтому счетчики каталога по категориям и
+    подкатегориям читаются без группировки всей витрины.
+    """
+    subcategory = models.OneToOneField(
+        Subcategory,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="listing_count",
+        verbose_name="Подкатегория"
+    )
+    products_count = models.PositiveIntegerField(
+        "Количество продуктов",
+        default=0
+    )
+
+    class Meta:
+        """Конфигурация счетчиков витрины."""
+        verbose_name = "счетчик витрины"
+        verbose_name_plural = "Счетчики витрины"
+
+    def __str__(self):
+        """Строковое представление счетчика витрины."""
+        return f"{self.subcategory_id}: {self.products_count}"
+
+    @staticmethod
+    def is_maintained():
+        """Проверить, ведут ли счетчики триггеры текущей СУБД."""
+        return connection.vendor in LISTING_COUNT_VENDORS
+
+    @classmethod
+    def get_category_counts(cls):
+        """Получить количество продуктов по категориям."""
+        return cls.objects.filter(products_count__gt=0).values(
+            category_id=models.F("subcategory__category_id"),
+            category_name=models.F("subcategory__category__name")
+        ).annotate(
+            count=models.Sum("products_count")
+        ).order_by("category_name")
+
+    @classmethod
+    def get_subcategory_counts(cls, category_id=None):
+        """Получить количество продуктов по подкатегориям категории."""
+        queryset = cls.objects.filter(products_count__gt=0)
+        if category_id is not None:
+            queryset = queryset.filter(subcategory__category_id=category_id)
+        return queryset.values(
+            "subcategory_id",
+            subcategory_name=models.F("subcategory__name"),
+            count=models.F("products_count")
+        ).order_by("subcategory_name")
+
+
+class CatalogueRevision(models.Model):
+    """Счетчик изменений каталога в строке CATALOGUE_REVISION_ID.
+
+    Увеличивается триггерами базы данных при любом изменении категорий,
+    подкатегорий, продуктов и витрины, в том числе через QuerySet.update,
+    пакетную загрузку и сырой SQL из любого процесса. Строка создается
+    первым изменением. Триггеры создаются миграцией для SQLite и
+    PostgreSQL.
+    """
+    revision = models.BigIntegerField("Ревизия", default=0)
+    changed_at = models.DateTimeField("Дата изменения")
+
+    class Meta:
+        """Конфигурация счетчика изменений каталога."""
+        verbose_name = "ревизия каталога"
+        verbose_name_plural = "Ревизии каталога"
+
+    def __str__(self):
+        """Строковое представление ревизии каталога."""
+        return f"{self.revision}"
+
+    @classmethod
+    def get_queryset(cls):
+        """Получить queryset номера и времени последнего изменения."""
+        return cls.objects.filter(pk=CATALOGUE_REVISION_ID).values_list(
+            "revision",
+            "changed_at"
+        )
+
+    @classmethod
+    def get_current(cls):
+        """Получить номер и время последнего изменения каталога.
+
+        До первого изменения возвращает (0, None).
+        """
+        return cls.get_queryset().first() or (0, None)
+
+    @classmethod
+    async def aget_current(cls):
+        """Асинхронный вариант get_current."""
+        return await cls.get_queryset().afirst() or (0, None)
+
+    @classmethod
+    def get_subquery(cls):
+        """Получить подзапрос номера ревизии для аннотации.
+
+        Пока каталог не менялся и строки счетчика нет, ревизия равна 0.
+        """
+        return Coalesce(
+            models.Subquery(cls.get_queryset().values("revision")[:1]),
+            0
+        )
+
+
+class CatalogueChange(models.Model):
+    """Журнал изменений категорий, подкатегорий и продуктов.
+
+    Для каждого объекта хранит одну строку с ревизией его последнего
+    изменения или удаления. Заполняется теми же триггерами, что и
+    CatalogueRevision, поэтому изменения после известной ревизии
+    можно дочитать запросом по индексу.
+    """
+    CATEGORY = "category"
+    SUBCATEGORY = "subcategory"
+    PRODUCT = "product"
+
+    model = models.CharField("Модель", max_length=20)
+    object_id = models.BigIntegerField("Id объекта")
+    revision = models.BigIntegerField("Ревизия")
+    changed_at = models.DateTimeField("Дата изменения")
+
+    class Meta:
+        """Конфигурация журнала изменений каталога."""
+        verbose_name = "изменение каталога"
+        verbose_name_plural = "Журнал изменений каталога"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("model", "object_id"),
+                name="catalogue_change_object_unique"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("revision",),
+                name="catalogue_change_revision_idx"
+            ),
+        )
+
+    def __str__(self):
+        """Строковое представление изменения каталога."""
+        return f"{self.model} {self.object_id}: {self.revision}"
+
+
 class ShoppingCart(models.Model):
     """Модель продуктовой корзины."""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
 
     class Meta:
         """Конфигурация модели продуктовой корзины."""
         verbose_name = "продуктовая корзина"
         verbose_name_plural = "Продуктовые корзины"
         ordering = ("user",)
+        indexes = (
+            models.Index(
+                fields=("updated_at",),
+                name="shopping_cart_updated_at_idx"
+            ),
+        )
+
+    @classmethod
+    def get_stale(cls, user_id):
+        """Получить корзину пользователя, если ее дата изменения устарела.
+
+        Дата изменения корзины нужна только для удаления брошенных
+        корзин, поэтому обновляется не чаще раза в
+        SHOPPING_CART_TOUCH_INTERVAL, а не при каждом изменении.
+        """
+        return cls.objects.filter(
+            user_id=user_id,
+            updated_at__lt=timezone.now() - SHOPPING_CART_TOUCH_INTERVAL
+        )
+
+    @classmethod
+    def touch(cls, user_id):
+        """Отметить изменение корзины пользователя."""
+        cls.get_stale(user_id).update(updated_at=timezone.now())
 
     def __str__(self):
         """Строковое представление продуктовой корзины."""
@@ -130,7 +500,8 @@ class ShoppingCartProduct(models.Model):
         ShoppingCart,
         on_delete=models.CASCADE,
         related_name="shopping_cart_products",
-        verbose_name="Продуктовая корзина"
+        verbose_name="Продуктовая корзина",
+        db_index=False
     )
     product = models.ForeignKey(
         Product,
@@ -149,11 +520,46 @@ class ShoppingCartProduct(models.Model):
 
     class Meta:
         """Конфигурация для связующей таблицы."""
-        unique_together = ("shopping_cart", "product")
+        constraints = (
+            models.UniqueConstraint(
+                fields=("shopping_cart", "product"),
+                name="shopping_cart_product_unique"
+            ),
+            models.CheckConstraint(
+                check=models.Q(amount__lte=MAX_AMOUNT_PRODUCT),
+                name="shopping_cart_product_amount_lte_max"
+            ),
+        )
         verbose_name = "Продукт в корзине"
         verbose_name_plural = "Продукты в корзинах"
         ordering = ("product",)
 
+    @classmethod
+    def add(cls, user_id, product_id, amount):
+        """Добавить продукт в корзину пользователя одним upsert.
+
+        Строка вставляется запросом INSERT ... SELECT из корзины
+        пользователя и продукта, а количество существующей строки
+        увеличивается через ON CONFLICT, только если не превысит
+        MAX_AMOUNT_PRODUCT (SQLite и PostgreSQL). Возвращает False,
+        если строка не изменилась: нет корзины, продукта или количество
+        превысило бы предел.
+        """
+        table = cls._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (shopping_cart_id, product_id, amount) "
+                "SELECT shopping_cart.id, product.id, %s "
+                f"FROM {ShoppingCart._meta.db_table} shopping_cart "
+                f"JOIN {Product._meta.db_table} product ON product.id = %s "
+                "WHERE shopping_cart.user_id = %s "
+                "ON CONFLICT (shopping_cart_id, product_id) DO UPDATE SET "
+                f"amount = {table}.amount + excluded.amount "
+                f"WHERE {table}.amount <= %s - excluded.amount",
+                (amount, product_id, user_id, MAX_AMOUNT_PRODUCT)
+            )
+            return cursor.rowcount > 0
+
     def __str__(self):
         """Строковое представление продуктов в продуктовой корзине."""
         return f"{self.product.name} - {self.amount} шт."
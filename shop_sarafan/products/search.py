@@ -0,0 +1,100 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class DatabaseSearchBackend:
+    """Поиск продуктов по вхождению подстроки, работает на любой СУБД."""
+
+    def filter(self, queryset, query):
+        """Отфильтровать витрину продуктов по поисковой строке."""
+        for token in SEARCH_TOKEN_PATTERN.findall(query):
+            queryset = queryset.filter(
+                Q(name__icontains=token) | Q(slug__icontains=token)
+            )
+        return queryset
+
+    def index(self, product):
+        """Добавить продукт в поисковый индекс или обновить его."""
+
+    def remove(self, product_id):
+        """Удалить продукт из поискового индекса."""
+
+    def rebuild(self):
+        """Пересобрать поисковый индекс целиком."""
+
+
+class SQLiteFTSSearchBackend(DatabaseSearchBackend):
+    """Полнотекстовый поиск продуктов по виртуальной таблице SQLite FTS5.
+
+    Таблица создается миграцией, rowid в ней совпадает с id продукта.
+    """
+    table = "products_product_fts"
+
+    @staticmethod
+    def get_match_expression(query):
+        """Собрать выражение MATCH: все слова запроса как префиксы."""
+        return " ".join(
+            f'"{token}"*' for token in SEARCH_TOKEN_PATTERN.findall(query)
+        )
+
+    def filter(self, queryset, query):
+        expression = self.get_match_expression(query)
+        if not expression:
+            return queryset
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {self.table} "
+                f"WHERE {self.table} MATCH %s",
+                (expression,)
+            )
+        )
+
+    def index(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                (product.pk,)
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, slug) "
+                "VALUES (%s, %s, %s)",
+                (product.pk, product.name, product.slug)
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                (product_id,)
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, name, slug) "
+                "SELECT id, name, slug FROM products_product"
+            )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Получить поисковый бэкенд продуктов.
+
+    Задается настройкой PRODUCT_SEARCH_BACKEND, по умолчанию FTS5 для SQLite
+    и поиск по вхождению подстроки для остальных СУБД.
+    """
+    backend_path = getattr(settings, "PRODUCT_SEARCH_BACKEND", None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == "sqlite":
+        return SQLiteFTSSearchBackend()
+    return DatabaseSearchBackend()
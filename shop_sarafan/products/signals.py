@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.images import image_variants_ready
+from products.models import Category, Product, ProductListing, Subcategory
+from products.search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def sync_product_listing(sender, instance, **kwargs):
+    """Обновить продукт на витрине и в поисковом индексе."""
+    ProductListing.objects.update_or_create(
+        product=instance,
+        defaults=ProductListing.get_defaults(instance)
+    )
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs):
+    """Удалить продукт из поискового индекса."""
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Subcategory)
+def sync_subcategory_listing(sender, instance, **kwargs):
+    """Обновить названия подкатегории и категории на витрине."""
+    ProductListing.objects.filter(subcategory=instance).update(
+        subcategory_name=instance.name,
+        category_id=instance.category_id,
+        category_name=instance.category.name
+    )
+
+
+@receiver(post_save, sender=Category)
+def sync_category_listing(sender, instance, **kwargs):
+    """Обновить название категории на витрине."""
+    ProductListing.objects.filter(category=instance).update(
+        category_name=instance.name
+    )
+
+
+@receiver(image_variants_ready, sender=Product)
+def sync_listing_image_variants(sender, instance_id, variants, **kwargs):
+    """Обновить варианты изображения продукта на витрине."""
+    ProductListing.objects.filter(
+        product_id=instance_id,
+        image=variants["original"]
+    ).update(image_variants=variants)
@@ -4,9 +4,12 @@ from django.urls import include, path
 from drf_spectacular.views import (SpectacularAPIView, SpectacularRedocView,
                                    SpectacularSwaggerView)
 
+from api_shop.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("api_shop.urls")),
+    path("metrics/", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
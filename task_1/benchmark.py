@@ -0,0 +1,82 @@
+"""Сравнение эталонной и прямой реализаций построения последовательности.
+
+Запуск:
+    python benchmark.py
+    python benchmark.py --counts 1000000 10000000
+"""
+import argparse
+import os
+import tempfile
+from time import perf_counter
+from typing import Any
+
+from task_1 import (get_sequence, get_sequence_from_gen, sequence_gen,
+                    write_sequence, write_sequence_parallel)
+
+DEFAULT_COUNTS = (10 ** 6, 10 ** 7, 10 ** 8)
+
+
+def measure(func, *args) -> tuple[float, Any]:
+    """Замерить время выполнения функции.
+
+        Параметры:
+            func: измеряемая функция;
+            args: аргументы функции.
+
+        Возвращаемые значения:
+            (tuple[float, Any]): время в секундах и результат функции.
+    """
+    started = perf_counter()
+    result = func(*args)
+    return perf_counter() - started, result
+
+
+def main() -> None:
+    """Запустить сравнение реализаций и вывести таблицу результатов."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--counts",
+        type=int,
+        nargs="+",
+        default=DEFAULT_COUNTS,
+        help="количества элементов последовательности"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="количество процессов для параллельной записи"
+    )
+    args = parser.parse_args()
+
+    print(f"{'count':>12} {'generator, s':>14} {'closed form, s':>16} "
+          f"{'speedup':>9} {'streaming, s':>14} "
+          f"{'parallel, s':>13}")
+    for count in args.counts:
+        reference_time, reference = measure(
+            get_sequence_from_gen, sequence_gen(), count
+        )
+        fast_time, fast = measure(get_sequence, 0, count)
+        if reference != fast:
+            raise AssertionError(f"Результаты не совпадают при count={count}")
+        del reference
+        with open(os.devnull, "wb") as devnull:
+            stream_time, _ = measure(write_sequence, devnull, 0, count)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sequence.txt")
+            parallel_time, _ = measure(
+                write_sequence_parallel, path, 0, count, args.workers
+            )
+            with open(path, "rb") as file:
+                if file.read() != fast.encode():
+                    raise AssertionError(
+                        f"Параллельный вывод не совпадает при count={count}"
+                    )
+        del fast
+        print(f"{count:>12} {reference_time:>14.3f} {fast_time:>16.3f} "
+              f"{reference_time / fast_time:>8.1f}x {stream_time:>14.3f} "
+              f"{parallel_time:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
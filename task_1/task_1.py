@@ -1,4 +1,11 @@
-from typing import Iterator
+import argparse
+import mmap
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from math import isqrt
+from typing import BinaryIO, Iterator, Optional, Sequence
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
 
 def sequence_gen() -> Iterator[int]:
@@ -19,8 +26,13 @@ def sequence_gen() -> Iterator[int]:
         num += 1
 
 
-def get_sequence(sequence_gen: Iterator[int], count_elements: int) -> str:
-    """Получить последовательность чисел в виде строки.
+def get_sequence_from_gen(
+    sequence_gen: Iterator[int],
+    count_elements: int
+) -> str:
+    """Получить последовательность чисел в виде строки через генератор.
+
+    Эталонная реализация: каждый элемент запрашивается у генератора.
 
         Параметры:
             sequence_gen (Iterator[int]): целое число бесконечной
@@ -36,12 +48,401 @@ def get_sequence(sequence_gen: Iterator[int], count_elements: int) -> str:
     return "".join(sequence_list)
 
 
-count_elements = input(
-    "Введите количество элементов последовательности "
-    "(целое положительное число): "
-)
-if not count_elements.isdigit():
-    raise ValueError("Ошибка ввода числа!")
+def get_run_start(num: int) -> int:
+    """Получить индекс первого вхождения числа в последовательность.
+
+    Перед числом num стоят все числа от 1 до num - 1, то есть
+    треугольное число T(num - 1) элементов.
+
+        Параметры:
+            num (int): целое положительное число последовательности.
+
+        Возвращаемые значения:
+            (int): индекс (с нуля) первого вхождения num.
+    """
+    return (num - 1) * num // 2
+
+
+def get_number_at(index: int) -> int:
+    """Получить элемент последовательности по его индексу.
+
+    Элемент с индексом index равен наибольшему num, для которого
+    T(num - 1) <= index, и вычисляется через целочисленный квадратный корень.
+
+        Параметры:
+            index (int): индекс элемента (с нуля).
+
+        Возвращаемые значения:
+            (int): значение элемента последовательности.
+    """
+    if index < 0:
+        raise ValueError("Индекс не может быть отрицательным!")
+    return (isqrt(8 * index + 1) + 1) // 2
+
+
+def iter_runs(start: int, stop: int) -> Iterator[tuple[int, int]]:
+    """Перебрать серии одинаковых чисел в срезе последовательности.
+
+        Параметры:
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним.
+
+        Возвращаемые значения:
+            (Iterator[tuple[int, int]]): число и количество его повторов
+                внутри среза.
+    """
+    if start < 0 or stop < start:
+        raise ValueError("Некорректные границы среза!")
+    if start == stop:
+        return
+
+    num: int = get_number_at(start)
+    index: int = start
+
+    while index < stop:
+        run_stop: int = min(get_run_start(num + 1), stop)
+        yield num, run_stop - index
+        index = run_stop
+        num += 1
+
+
+def get_byte_offset(index: int) -> int:
+    """Получить длину в байтах первых index элементов последовательности.
+
+    Длина считается по группам чисел с одинаковым количеством цифр
+    через суммы арифметических прогрессий, без перебора элементов.
+
+        Параметры:
+            index (int): количество элементов от начала последовательности.
+
+        Возвращаемые значения:
+            (int): смещение элемента index в выводе, в байтах.
+    """
+    if index <= 0:
+        return 0
+
+    num: int = get_number_at(index)
+    offset: int = (index - get_run_start(num)) * len(str(num))
+    digits: int = 1
+    low: int = 1
+
+    while low < num:
+        high: int = min(low * 10, num)
+        offset += digits * (get_run_start(high) - get_run_start(low))
+        low *= 10
+        digits += 1
+
+    return offset
+
+
+def get_sequence(start: int, stop: int) -> str:
+    """Получить срез последовательности чисел в виде строки.
+
+    Элементы не перебираются по одному: значение первого элемента
+    вычисляется напрямую, а затем каждое число выводится целым блоком
+    str(num) * count.
+
+        Параметры:
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним.
+
+        Возвращаемые значения:
+            (str): строка элементов последовательности с start по stop.
+    """
+    return "".join(str(num) * count for num, count in iter_runs(start, stop))
+
+
+def iter_sequence_chunks(
+    start: int,
+    stop: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Перебрать срез последовательности блоками байтов.
+
+    Все блоки, кроме последнего, имеют размер ровно chunk_size, поэтому
+    расход памяти не зависит от длины последовательности.
+
+        Параметры:
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            chunk_size (int): размер блока в байтах.
+
+        Возвращаемые значения:
+            (Iterator[bytes]): блоки вывода последовательности.
+    """
+    if chunk_size < 1:
+        raise ValueError("Размер блока должен быть положительным!")
+
+    buffer = bytearray()
+    for num, count in iter_runs(start, stop):
+        digits: bytes = str(num).encode()
+        while count:
+            free: int = chunk_size - len(buffer)
+            repeats: int = min(count, -(-free // len(digits)))
+            buffer += digits * repeats
+            count -= repeats
+            while len(buffer) >= chunk_size:
+                yield bytes(buffer[:chunk_size])
+                del buffer[:chunk_size]
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def write_sequence(
+    stream: BinaryIO,
+    start: int,
+    stop: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Записать срез последовательности в бинарный поток.
+
+        Параметры:
+            stream (BinaryIO): поток для записи, например sys.stdout.buffer;
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            chunk_size (int): размер блока записи в байтах.
+
+        Возвращаемые значения:
+            (int): количество записанных байтов.
+    """
+    written: int = 0
+    for chunk in iter_sequence_chunks(start, stop, chunk_size):
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def write_sequence_mmap(
+    path: str,
+    start: int,
+    stop: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Записать срез последовательности в файл через отображение в память.
+
+    Размер вывода известен заранее, поэтому файл сразу создается нужной
+    длины, а блоки копируются прямо в отображенные страницы.
+
+        Параметры:
+            path (str): путь к файлу вывода;
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            chunk_size (int): размер блока записи в байтах.
+
+        Возвращаемые значения:
+            (int): количество записанных байтов.
+    """
+    size: int = get_byte_offset(stop) - get_byte_offset(start)
+
+    with open(path, "w+b") as file:
+        file.truncate(size)
+        if not size:
+            return 0
+        with mmap.mmap(file.fileno(), size) as mapped:
+            position: int = 0
+            for chunk in iter_sequence_chunks(start, stop, chunk_size):
+                mapped[position:position + len(chunk)] = chunk
+                position += len(chunk)
+            mapped.flush()
+
+    return size
+
+
+def get_shards(
+    start: int,
+    stop: int,
+    count_shards: int
+) -> list[tuple[int, int]]:
+    """Разбить срез последовательности на части для параллельной записи.
+
+        Параметры:
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            count_shards (int): желаемое количество частей.
+
+        Возвращаемые значения:
+            (list[tuple[int, int]]): границы непустых частей среза.
+    """
+    step: int = -(-(stop - start) // max(count_shards, 1)) or 1
+    return [
+        (shard_start, min(shard_start + step, stop))
+        for shard_start in range(start, stop, step)
+    ]
+
+
+def write_shard(
+    path: str,
+    start: int,
+    stop: int,
+    offset: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Записать часть последовательности в файл с заданного смещения.
+
+    Выполняется в отдельном процессе: файл уже создан нужной длины,
+    поэтому части пишутся независимо друг от друга.
+
+        Параметры:
+            path (str): путь к файлу вывода;
+            start (int): индекс первого элемента части (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            offset (int): смещение начала части в файле, в байтах;
+            chunk_size (int): размер блока записи в байтах.
+
+        Возвращаемые значения:
+            (int): количество записанных байтов.
+    """
+    with open(path, "r+b") as file:
+        file.seek(offset)
+        return write_sequence(file, start, stop, chunk_size)
+
+
+def write_sequence_parallel(
+    path: str,
+    start: int,
+    stop: int,
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> int:
+    """Записать срез последовательности в файл несколькими процессами.
+
+    Смещение каждой части вычисляется напрямую через get_byte_offset,
+    поэтому части строятся и записываются в заранее выделенный файл
+    параллельно, а результат совпадает с последовательной записью.
+
+        Параметры:
+            path (str): путь к файлу вывода;
+            start (int): индекс первого элемента среза (с нуля);
+            stop (int): индекс элемента, следующего за последним;
+            workers (int): количество процессов;
+            chunk_size (int): размер блока записи в байтах.
+
+        Возвращаемые значения:
+            (int): количество записанных байтов.
+    """
+    if workers < 1:
+        raise ValueError("Количество процессов должно быть положительным!")
+
+    base_offset: int = get_byte_offset(start)
+    with open(path, "wb") as file:
+        file.truncate(get_byte_offset(stop) - base_offset)
+
+    shards: list[tuple[int, int]] = get_shards(start, stop, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                write_shard,
+                path,
+                shard_start,
+                shard_stop,
+                get_byte_offset(shard_start) - base_offset,
+                chunk_size
+            )
+            for shard_start, shard_stop in shards
+        ]
+        return sum(future.result() for future in futures)
+
+
+def non_negative_int(value: str) -> int:
+    """Преобразовать аргумент командной строки в целое неотрицательное число.
+
+        Параметры:
+            value (str): значение аргумента.
+
+        Возвращаемые значения:
+            (int): число.
+    """
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError("Ошибка ввода числа!")
+    return int(value)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Разобрать аргументы командной строки.
+
+        Параметры:
+            argv (Optional[Sequence[str]]): аргументы, по умолчанию sys.argv.
+
+        Возвращаемые значения:
+            (argparse.Namespace): разобранные аргументы.
+    """
+    parser = argparse.ArgumentParser(
+        description="Вывести n первых элементов последовательности "
+                    "122333444455555..."
+    )
+    parser.add_argument(
+        "--count",
+        type=non_negative_int,
+        help="количество элементов последовательности; "
+             "если не указано, запрашивается интерактивно"
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="файл вывода, по умолчанию '-' (стандартный вывод)"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=non_negative_int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="размер блока записи в байтах, по умолчанию 1 МиБ"
+    )
+    parser.add_argument(
+        "--workers",
+        type=non_negative_int,
+        default=1,
+        help="количество процессов для параллельной записи в файл"
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="писать в файл вывода через отображение в память"
+    )
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        parser.error("Размер блока должен быть положительным!")
+    if args.mmap and args.output == "-":
+        parser.error("Режим --mmap требует указать файл в --output.")
+    if args.workers < 1:
+        parser.error("Количество процессов должно быть положительным!")
+    if args.workers > 1 and (args.output == "-" or args.mmap):
+        parser.error(
+            "Режим --workers требует указать файл в --output "
+            "и несовместим с --mmap."
+        )
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Точка входа командной строки."""
+    args = parse_args(argv)
+
+    count_elements: Optional[int] = args.count
+    if count_elements is None:
+        value: str = input(
+            "Введите количество элементов последовательности "
+            "(целое положительное число): "
+        )
+        if not value.isdigit():
+            raise ValueError("Ошибка ввода числа!")
+        count_elements = int(value)
+
+    if args.output == "-":
+        write_sequence(sys.stdout.buffer, 0, count_elements, args.chunk_size)
+        sys.stdout.buffer.write(b"\n")
+        sys.stdout.buffer.flush()
+    elif args.workers > 1:
+        write_sequence_parallel(
+            args.output, 0, count_elements, args.workers, args.chunk_size
+        )
+    elif args.mmap:
+        write_sequence_mmap(args.output, 0, count_elements, args.chunk_size)
+    else:
+        with open(args.output, "wb") as file:
+            write_sequence(file, 0, count_elements, args.chunk_size)
+
 
-sequence: Iterator[int] = sequence_gen()
-print(get_sequence(sequence, int(count_elements)))
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Проверка прямых реализаций по эталонному генератору последовательности.
+
+Запуск:
+    python -m pytest test_task_1.py
+    python -m unittest test_task_1
+"""
+import io
+import os
+import tempfile
+import unittest
+from itertools import accumulate, islice
+
+from task_1 import (get_byte_offset, get_run_start, get_sequence,
+                    get_sequence_from_gen, iter_sequence_chunks,
+                    sequence_gen, write_sequence, write_sequence_mmap,
+                    write_sequence_parallel)
+
+# Последовательность до числа 1001: в нее попадают переходы от одной
+# цифры к двум, трем и четырем.
+COUNT_ELEMENTS = get_run_start(1002)
+RUN_BOUNDARIES = (
+    get_run_start(9),
+    get_run_start(10),
+    get_run_start(99) + 50,
+    get_run_start(100),
+    get_run_start(1000),
+)
+
+
+class SequenceTestCase(unittest.TestCase):
+    """Сравнение со строкой, построенной эталонным генератором."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.elements = list(islice(sequence_gen(), COUNT_ELEMENTS))
+        cls.reference = get_sequence_from_gen(sequence_gen(), COUNT_ELEMENTS)
+        cls.offsets = [0, *accumulate(len(str(num)) for num in cls.elements)]
+
+    def get_reference(self, start, stop):
+        """Получить эталонный срез последовательности в байтах."""
+        return self.reference[
+            self.offsets[start]:self.offsets[stop]
+        ].encode()
+
+    def get_slices(self):
+        """Получить срезы, начинающиеся и кончающиеся внутри серий."""
+        return [
+            (0, 0),
+            (0, 1),
+            (0, 100),
+            (3, 4),
+            (7, 53),
+            *((boundary - 5, boundary + 5) for boundary in RUN_BOUNDARIES),
+            (get_run_start(99) + 50, get_run_start(1000) + 7),
+            (get_run_start(1000) + 1, COUNT_ELEMENTS),
+        ]
+
+    def test_byte_offset(self):
+        for index in range(get_run_start(120)):
+            self.assertEqual(get_byte_offset(index), self.offsets[index])
+        for boundary in RUN_BOUNDARIES:
+            for index in range(boundary - 3, boundary + 4):
+                self.assertEqual(
+                    get_byte_offset(index),
+                    self.offsets[index]
+                )
+        self.assertEqual(
+            get_byte_offset(COUNT_ELEMENTS),
+            len(self.reference)
+        )
+
+    def test_sequence(self):
+        for start, stop in self.get_slices():
+            with self.subTest(start=start, stop=stop):
+                self.assertEqual(
+                    get_sequence(start, stop).encode(),
+                    self.get_reference(start, stop)
+                )
+
+    def test_chunks(self):
+        start, stop = get_run_start(99) + 50, get_run_start(100) + 3
+        expected = self.get_reference(start, stop)
+        for chunk_size in (1, 2, 3, 7, 1024, len(expected) + 1):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(iter_sequence_chunks(start, stop, chunk_size))
+                self.assertEqual(b"".join(chunks), expected)
+                self.assertTrue(
+                    all(len(chunk) == chunk_size for chunk in chunks[:-1])
+                )
+
+    def test_write_sequence(self):
+        for start, stop in self.get_slices():
+            with self.subTest(start=start, stop=stop):
+                stream = io.BytesIO()
+                written = write_sequence(stream, start, stop, chunk_size=5)
+                self.assertEqual(
+                    stream.getvalue(),
+                    self.get_reference(start, stop)
+                )
+                self.assertEqual(written, len(stream.getvalue()))
+
+    def test_write_sequence_mmap(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sequence.txt")
+            for start, stop in self.get_slices():
+                with self.subTest(start=start, stop=stop):
+                    written = write_sequence_mmap(path, start, stop, 7)
+                    with open(path, "rb") as file:
+                        output = file.read()
+                    self.assertEqual(output, self.get_reference(start, stop))
+                    self.assertEqual(written, len(output))
+
+    def test_write_sequence_parallel(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sequence.txt")
+            for workers in (1, 2, 3, 7):
+                for start, stop in self.get_slices():
+                    for chunk_size in (3, 1024):
+                        with self.subTest(
+                            workers=workers,
+                            start=start,
+                            stop=stop,
+                            chunk_size=chunk_size
+                        ):
+                            written = write_sequence_parallel(
+                                path, start, stop, workers, chunk_size
+                            )
+                            with open(path, "rb") as file:
+                                output = file.read()
+                            self.assertEqual(
+                                output,
+                                self.get_reference(start, stop)
+                            )
+                            self.assertEqual(written, len(output))
+
+    def test_write_sequence_parallel_workers(self):
+        with self.assertRaises(ValueError):
+            write_sequence_parallel(os.devnull, 0, 10, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()